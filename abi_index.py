@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    ARC-56 method index
+
+    Parsing an ABI signature or type string costs tens of microseconds, and
+    the tools did it on every call (selectors, argument encodings, return
+    decoding). The index is built once per ARC-56 file and holds for each
+    method:
+
+        name, signature, selector (4 bytes), sdk.abi.Method
+        args (the ARC-56 ones), arg_names, arg_types, arg_codecs (ABIType, None for txn/reference args)
+        returns, return_codec (None for void)
+        actions, on_complete (allowed OnComplete values of a call), readonly, desc
+
+    plus {selector: name}. It's cached in shelve.db ('abi_index', keyed by
+    the sha256 of the file), so it's rebuilt only when the file changes.
+    Only plain data is cached (signatures, selectors, type strings): the
+    Method and ABIType objects are made again when it's loaded, an upgrade
+    of algosdk can't make the cache unreadable.
+    Encoding a call is then table lookups: `encode_call(entry, args)`.
+    Like the ABI, a method with more than 15 arguments has the ones after
+    the 14th packed in one tuple (an app call has at most 16 app args, the
+    selector is the first).
+
+    `codec(type string)` is the cached ABIType of any type string, for the
+    code that only knows the types (ie resources.py).
+----------------------------------------------------------------------------------------------------
+'''
+
+import json
+import shelve
+import hashlib
+import functools
+
+import sdk
+
+from   fingerprint import signature
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Changes of the index layout invalidate the cached ones
+INDEX_VERSION       = 2
+
+## Fields of an index entry made from the others, not cached
+OBJECT_FIELDS       = ('method', 'arg_codecs', 'return_codec')
+
+## Args of a call in their own app arg (16 app args with the selector)
+## With more, the args after the 14th are packed in the 15th app arg
+max_app_args        = 15
+
+## ARC-56 action -> OnComplete value
+ON_COMPLETE         = {
+    'NoOp'              : 0,
+    'OptIn'             : 1,
+    'CloseOut'          : 2,
+    'ClearState'        : 3,
+    'UpdateApplication' : 4,
+    'DeleteApplication' : 5,
+}
+
+## Prefix of the log holding the ABI return value
+RETURN_PREFIX       = bytes.fromhex('151f7c75')
+
+## Indexes already loaded by this process {sha256: index}
+_indexes            = {}
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Building
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    ABIType of a type string, None for transaction and reference types
+"""
+@functools.lru_cache(maxsize=None)
+def codec(type_string):
+    try:
+        return sdk.abi.ABIType.from_string(type_string)
+    except Exception:
+        return None
+
+
+"""
+    Index of an ARC-56 spec (dict)
+"""
+def build(spec):
+    methods = {}
+    selectors = {}
+    for m in spec['methods']:
+        method = sdk.abi.Method.from_signature(signature(m))
+        arg_types = [a['type'] for a in m['args']]
+        returns = m['returns']['type']
+        entry = {
+            'name'          : m['name'],
+            'signature'     : signature(m),
+            'selector'      : method.get_selector(),
+            'method'        : method,
+            'args'          : m['args'],
+            'arg_names'     : [a.get('name') for a in m['args']],
+            'arg_types'     : arg_types,
+            'arg_codecs'    : [codec(t) for t in arg_types],
+            'returns'       : returns,
+            'return_codec'  : None if returns == 'void' else codec(returns),
+            'actions'       : m.get('actions', {'call': ['NoOp'], 'create': []}),
+            'readonly'      : m.get('readonly', False),
+            'desc'          : m.get('desc'),
+        }
+        entry['on_complete'] = sorted(ON_COMPLETE[a] for a in entry['actions'].get('call', []))
+        methods[m['name']] = entry
+        selectors[entry['selector']] = m['name']
+    return {'version': INDEX_VERSION, 'methods': methods, 'selectors': selectors}
+
+
+"""
+    Index of the ARC-56 file `path`, from the cache if the file did not change
+"""
+def load(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    sha = hashlib.sha256(data).hexdigest()
+    if sha in _indexes:
+        return _indexes[sha]
+
+    try:
+        with shelve.open("shelve.db") as db:
+            cached = db.get('abi_index', {}).get(str(path))
+    except Exception:
+        ## Written by an other version: built again
+        cached = None
+    if cached != None and cached[0] == sha and cached[1].get('version') == INDEX_VERSION:
+        index = _objects(cached[1])
+    else:
+        index = build(json.loads(data))
+        ## One index per file: the old one of a changed file is replaced
+        with shelve.open("shelve.db") as db:
+            try:
+                indexes = db.get('abi_index', {})
+            except Exception:
+                indexes = {}
+            indexes[str(path)] = (sha, _plain(index))
+            db['abi_index'] = indexes
+    _indexes[sha] = index
+    return index
+
+
+"""
+    Index without the Method and ABIType objects (to be cached)
+"""
+def _plain(index):
+    methods = {name: {k: v for k, v in entry.items() if k not in OBJECT_FIELDS} for name, entry in index['methods'].items()}
+    return {**index, 'methods': methods}
+
+
+"""
+    Index with the Method and ABIType objects made again from the plain one
+"""
+def _objects(index):
+    for entry in index['methods'].values():
+        entry['method'] = sdk.abi.Method.from_signature(entry['signature'])
+        entry['arg_codecs'] = [codec(t) for t in entry['arg_types']]
+        entry['return_codec'] = None if entry['returns'] == 'void' else codec(entry['returns'])
+    return index
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Encoding and decoding
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Application args of a call: selector + encoded args
+    The args after the 14th are encoded together as one tuple
+    Transaction/reference args can't be encoded here (ValueError)
+"""
+def encode_call(entry, args):
+    for name, arg_codec in zip(entry['arg_names'], entry['arg_codecs']):
+        if arg_codec == None:
+            raise ValueError(f"argument {name} of {entry['name']} is a transaction or a reference")
+    codecs = entry['arg_codecs'][:len(args)]
+    if len(args) <= max_app_args:
+        return [entry['selector']] + [c.encode(v) for c, v in zip(codecs, args)]
+    last = max_app_args - 1
+    packed = sdk.abi.TupleType(codecs[last:]).encode(list(args[last:]))
+    return [entry['selector']] + [c.encode(v) for c, v in zip(codecs[:last], args[:last])] + [packed]
+
+
+"""
+    Method name and decoded args of application args (None if not in the index)
+"""
+def decode_call(index, app_args):
+    name = index['selectors'].get(bytes(app_args[0][:4])) if app_args else None
+    if name == None:
+        return None, None
+    entry = index['methods'][name]
+    codecs = entry['arg_codecs']
+    if len(codecs) > max_app_args and None not in codecs:
+        ## The args after the 14th are in the last app arg, as one tuple
+        last = max_app_args - 1
+        values = app_args[1:last + 1]
+        args = [c.decode(a) for c, a in zip(codecs[:last], values)]
+        if len(app_args) > last + 1:
+            args += sdk.abi.TupleType(codecs[last:]).decode(app_args[last + 1])
+        return name, args
+    args = [c.decode(a) if c != None else a for c, a in zip(codecs, app_args[1:])]
+    return name, args
+
+
+"""
+    Decoded return value of a call from its last log (None if there is none)
+"""
+def decode_return(entry, log):
+    if entry['return_codec'] == None or not log or not log.startswith(RETURN_PREFIX):
+        return None
+    return entry['return_codec'].decode(log[4:])
@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Thin client of daemon.py
+
+    Sends a command to the running daemon and prints its output.
+    It only imports the standard library so it starts in a few milliseconds.
+
+        algoctl.py deploy
+        algoctl.py call set_b 999
+        algoctl.py call get_version on_complete:1
+        algoctl.py state
+
+    See daemon.py for the list of commands.
+----------------------------------------------------------------------------------------------------
+'''
+
+import sys
+import json
+import socket
+
+## Same values of daemon.py (not imported: it would load the SDK)
+socket_file         = '.daemon.sock'
+END_MARK            = '\0EXIT '
+
+
+def main(argv):
+    if len(argv) < 1:
+        print("Usage: algoctl.py <command> [args]")
+        exit(1)
+
+    try:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.connect(socket_file)
+    except OSError:
+        print("❌ Daemon not running. Start it with daemon.py")
+        exit(4002)
+
+    with s:
+        s.sendall((json.dumps({'cmd': argv[0], 'args': argv[1:]}) + '\n').encode())
+        code = 1
+        for line in s.makefile('r', encoding='utf-8'):
+            if line.startswith(END_MARK):
+                code = int(line[len(END_MARK):])
+                break
+            sys.stdout.write(line)
+    exit(code)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,388 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Benchmark: opcode cost and box I/O of the sample contracts
+
+    For each contract in sample_contracts/ (test files are skipped):
+    1. compile it (compile.py) and create a fresh app on LocalNet, funded for
+       its boxes by the LocalNet dispenser
+    2. call each ABI method, in the order of the ARC-56 spec, first through
+       simulate (with execution trace) then for real, so the following methods
+       find the boxes/state written by the previous ones
+    3. from the simulate trace get:
+         cost       opcode budget consumed by the app call
+         headroom   700 (budget of a single app call) - cost, negative means
+                    the method needs opcode budget pooling
+         box_r      bytes read from boxes (box_get, box_extract)
+         box_w      bytes of the box values written (as reported by algod)
+         box_ops    number of box reads + writes + deletes
+
+    Method arguments are sample values of their ABI type (ie 1 for uint64,
+    'bench' for string), they can be set in bench_contracts_args.json:
+        {"BoxContract": {"box_map_set": [7, "seven"]}}
+    Methods with transaction/asset arguments are skipped, and so are the
+    create only ones (no `call` action). A method is called with its first
+    allowed OnComplete (NoOp if allowed). The CloseOut methods are run after
+    the others and the DeleteApplication ones last, only simulated: they
+    don't close out or delete the app under the other methods.
+
+    The results are saved as a baseline in bench_contracts.json (--save), and
+    checked against it (--check): any method whose cost or box I/O grew more
+    than --tolerance percent, or that does not work anymore, is a regression
+    (exit code 3001).
+
+    Usage:
+        bench_contracts.py [contract.py ...] [--save | --check] [--tolerance 0]
+        bench_contracts.py --no-compile [ContractName ...] [--save | --check] [--tolerance 0]
+
+    With --no-compile the artifacts already in this directory are used (the
+    arguments are contract names, default all the *.arc56.json files)
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import json
+import base64
+import argparse
+from   pathlib import Path
+
+import sdk
+from   compile import compile_contract, CompileError
+from   fingerprint import signature
+from   abi_index import ON_COMPLETE
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Contract sources benchmarked by default
+SOURCES             = 'sample_contracts/*.py'
+
+## Baseline results and optional method arguments
+baseline_file       = 'bench_contracts.json'
+args_file           = 'bench_contracts_args.json'
+
+## Opcode budget of a single app call
+call_budget         = 700
+
+## Extra budget given to simulate, so expensive methods run to the end
+simulate_budget     = 320_000
+
+## Micro algos sent to each app account (box MBR)
+app_funding         = 20_000_000
+
+## Opcodes reading box contents
+BOX_READ_OPS        = ('box_get', 'box_extract')
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Helper functions
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Sample value of an ABI type (recursive for arrays and tuples)
+"""
+def sample_value(abi_type, sender):
+    match abi_type:
+        case sdk.abi.UintType() | sdk.abi.UfixedType() | sdk.abi.ByteType():
+            return 1
+        case sdk.abi.BoolType():
+            return True
+        case sdk.abi.StringType():
+            return 'bench'
+        case sdk.abi.AddressType():
+            return sender
+        case sdk.abi.ArrayStaticType():
+            return [sample_value(abi_type.child_type, sender)] * abi_type.static_length
+        case sdk.abi.ArrayDynamicType() if isinstance(abi_type.child_type, sdk.abi.ByteType):
+            return b'\x01' * 32
+        case sdk.abi.ArrayDynamicType():
+            return [sample_value(abi_type.child_type, sender)] * 2
+        case sdk.abi.TupleType():
+            return [sample_value(t, sender) for t in abi_type.child_types]
+    raise ValueError(f"no sample value for {abi_type}")
+
+
+"""
+    Arguments of an ARC-56 method, None if it can't be called with sample values
+"""
+def method_args(method, sender, app_id, given):
+    if method['name'] in given:
+        return given[method['name']]
+    args = []
+    for arg in method['args']:
+        match arg['type']:
+            case 'account':
+                args.append(sender)
+            case 'application':
+                args.append(app_id)
+            case 'asset' | 'txn' | 'pay' | 'axfer' | 'appl' | 'keyreg' | 'acfg' | 'afrz':
+                return None
+            case _:
+                args.append(sample_value(sdk.abi.ABIType.from_string(arg['type']), sender))
+    return args
+
+
+"""
+    OnComplete value of the calls of a method: NoOp if allowed, else the
+    first allowed one. None for the create only methods
+"""
+def method_on_complete(method):
+    call = method.get('actions', {}).get('call', ['NoOp'])
+    if not call:
+        return None
+    return min(ON_COMPLETE[a] for a in call)
+
+
+"""
+    Compile the TEAL of a contract, returns (program bytes, {pc: opcode})
+"""
+def compile_with_opcodes(algod, teal):
+    res = algod.compile(teal, source_map=True)
+    source_map = sdk.SourceMap(res['sourcemap'])
+    lines = teal.splitlines()
+    opcodes = {}
+    for pc in source_map.pc_to_line:
+        words = lines[source_map.get_line_for_pc(pc)].split()
+        if words:
+            opcodes[pc] = words[0]
+    return base64.b64decode(res['result']), opcodes
+
+
+"""
+    Create a new app of `contract_name` and fund its account
+"""
+def create_app(algorand_client, dispenser, contract_name, spec):
+    algod = algorand_client.client.algod
+    with open(contract_name+'.approval.teal') as f:
+        approval, opcodes = compile_with_opcodes(algod, f.read())
+    with open(contract_name+'.clear.teal') as f:
+        clear, _ = compile_with_opcodes(algod, f.read())
+    schema = spec['state']['schema']
+    res = algorand_client.send.app_create(
+        sdk.AppCreateParams(
+            sender=dispenser.address,
+            signer=dispenser.signer,
+            approval_program=approval,
+            clear_state_program=clear,
+            schema={
+                'global_ints': schema['global']['ints'],
+                'global_byte_slices': schema['global']['bytes'],
+                'local_ints': schema['local']['ints'],
+                'local_byte_slices': schema['local']['bytes'],
+            },
+            extra_program_pages=(len(approval) + len(clear) - 1) // 2048,
+        )
+    )
+    app_id = res.app_id
+    algorand_client.send.payment(
+        sdk.PaymentParams(
+            sender=dispenser.address,
+            signer=dispenser.signer,
+            receiver=sdk.get_application_address(app_id),
+            amount=sdk.AlgoAmount(micro_algo=app_funding),
+        )
+    )
+    return app_id, opcodes
+
+
+"""
+    Cost and box I/O of the app call in a simulate response
+"""
+def trace_stats(response, opcodes):
+    result = response['txn-groups'][0]['txn-results'][0]
+    stats = {'cost': result.get('app-budget-consumed', 0), 'box_r': 0, 'box_w': 0, 'box_ops': 0}
+    stats['headroom'] = call_budget - stats['cost']
+    for step in result.get('exec-trace', {}).get('approval-program-trace', []):
+        if opcodes.get(step['pc']) in BOX_READ_OPS:
+            stats['box_ops'] += 1
+            for item in step.get('stack-additions', []):
+                if item.get('type') == 1:
+                    stats['box_r'] += len(base64.b64decode(item.get('bytes', '')))
+        for change in step.get('state-changes', []):
+            if change.get('app-state-type') != 'b':
+                continue
+            stats['box_ops'] += 1
+            if change.get('operation') == 'w':
+                stats['box_w'] += len(base64.b64decode(change.get('new-value', {}).get('bytes', '')))
+    return stats
+
+
+"""
+    Simulate and then send one method call (only simulate if not `send`),
+    returns its stats
+"""
+def bench_method(algorand_client, dispenser, app_id, opcodes, method, args, on_complete=0, send=True):
+    params = sdk.AppCallMethodCallParams(
+        sender=dispenser.address,
+        signer=dispenser.signer,
+        app_id=app_id,
+        method=sdk.abi.Method.from_signature(signature(method)),
+        args=args,
+        on_complete=sdk.transaction.OnComplete(on_complete),
+    )
+    txns = algorand_client.new_group().add_app_call_method_call(params).build_transactions().transactions
+    request = sdk.SimulateRequest(
+        txn_groups=[sdk.SimulateRequestTransactionGroup(txns=[sdk.transaction.SignedTransaction(t, None) for t in txns])],
+        allow_empty_signatures=True,
+        allow_unnamed_resources=True,
+        extra_opcode_budget=simulate_budget,
+        exec_trace_config=sdk.SimulateTraceConfig(enable=True, stack_change=True, state_change=True),
+    )
+    response = algorand_client.client.algod.simulate_transactions(request)
+    failure = response['txn-groups'][0].get('failure-message')
+    if failure:
+        return {'status': 'error', 'error': failure}
+    stats = trace_stats(response, opcodes)
+
+    ## Send it for real: the next methods see its effects
+    if send:
+        algorand_client.send.app_call_method_call(params, send_params=sdk.SendParams(populate_app_call_resources=True))
+    return {'status': 'ok', **stats}
+
+
+"""
+    Benchmark all the methods of a contract, returns {method: stats}
+"""
+def bench_contract(algorand_client, dispenser, contract_name, given):
+    with open(contract_name+'.arc56.json') as f:
+        spec = json.load(f)
+    app_id, opcodes = create_app(algorand_client, dispenser, contract_name, spec)
+    ## Shown in the order of the spec
+    results = {method['name']: None for method in spec['methods']}
+    ## CloseOut after the others, DeleteApplication last (stable sort)
+    last = {ON_COMPLETE['CloseOut']: 1, ON_COMPLETE['DeleteApplication']: 2}
+    methods = [(method, method_on_complete(method)) for method in spec['methods']]
+    for method, on_complete in sorted(methods, key=lambda m: last.get(m[1], 0)):
+        if on_complete == None:
+            results[method['name']] = {'status': 'skipped', 'reason': 'create only'}
+            continue
+        args = method_args(method, dispenser.address, app_id, given.get(contract_name, {}))
+        if args == None:
+            results[method['name']] = {'status': 'skipped', 'reason': 'transaction/asset arguments'}
+            continue
+        try:
+            ## The app must stay for the other methods
+            send = on_complete != ON_COMPLETE['DeleteApplication']
+            results[method['name']] = bench_method(algorand_client, dispenser, app_id, opcodes, method, args, on_complete, send)
+        except Exception as e:
+            results[method['name']] = {'status': 'error', 'error': str(e).splitlines()[0]}
+    return results
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Report and baseline
+----------------------------------------------------------------------------------------------------
+'''
+
+def show(results):
+    print(f"{'contract / method':<36} {'cost':>7} {'headroom':>9} {'box_r':>7} {'box_w':>7} {'box_ops':>8}")
+    for contract_name, methods in results.items():
+        print(f"🔹 {contract_name}")
+        for name, r in methods.items():
+            if r['status'] == 'ok':
+                flag = '🟧' if r['headroom'] < 0 else '  '
+                print(f"{flag} {name:<33} {r['cost']:>7} {r['headroom']:>9} {r['box_r']:>7} {r['box_w']:>7} {r['box_ops']:>8}")
+            elif r['status'] == 'skipped':
+                print(f"   {name:<33} skipped ({r.get('reason', 'transaction/asset arguments')})")
+            else:
+                print(f"❌ {name:<33} {r['error'][:80]}")
+
+
+"""
+    Regressions of `results` against `baseline`, as a list of messages
+"""
+def compare(results, baseline, tolerance):
+    regressions = []
+    for contract_name, methods in baseline.items():
+        for name, old in methods.items():
+            if old['status'] != 'ok':
+                continue
+            new = results.get(contract_name, {}).get(name)
+            if new == None:
+                continue
+            if new['status'] != 'ok':
+                regressions.append(f"{contract_name}.{name}: was working, now {new['status']}")
+                continue
+            for key in ('cost', 'box_r', 'box_w'):
+                if new[key] > old[key] * (1 + tolerance / 100):
+                    regressions.append(f"{contract_name}.{name}: {key} {old[key]} -> {new[key]}")
+    return regressions
+
+
+"""________________________________________________________________________
+
+   MAIN
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description="Opcode cost and box I/O of the sample contracts")
+    parser.add_argument('sources', nargs='*', help="contract sources (default: sample_contracts/*.py), contract names with --no-compile")
+    parser.add_argument('--no-compile', action='store_true', help="use the already compiled artifacts")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--save', action='store_true', help=f"save the results as the baseline ({baseline_file})")
+    group.add_argument('--check', action='store_true', help="compare the results with the baseline")
+    parser.add_argument('--tolerance', type=float, default=0, help="percent of growth allowed by --check")
+    opts = parser.parse_args()
+
+    if opts.no_compile:
+        sources = opts.sources or sorted(str(p).replace('.arc56.json', '') for p in Path('./').glob('*.arc56.json'))
+    else:
+        sources = opts.sources or sorted(str(p) for p in Path('./').glob(SOURCES) if not p.name.startswith('test'))
+    given = {}
+    if os.path.exists(args_file):
+        with open(args_file) as f:
+            given = json.load(f)
+
+    algorand_client = sdk.AlgorandClient.default_localnet()
+    try:
+        dispenser = algorand_client.account.localnet_dispenser()
+    except Exception as e:
+        print("💩 ", e)
+        print("❌ LocalNet not reachable (algokit localnet start) ! Quitting")
+        exit(3002)
+
+    results = {}
+    for source in sources:
+        if opts.no_compile:
+            contract_name = source
+        else:
+            print(f"🔧 Compiling {source}...")
+            try:
+                contract_name = compile_contract(source)
+            except CompileError as e:
+                print(f"❌ {e}, skipped")
+                continue
+        if not os.path.exists(contract_name+'.arc56.json'):
+            print(f"❌ No artifacts for {source}, skipped")
+            continue
+        print(f"🕓 Benchmarking {contract_name}...")
+        results[contract_name] = bench_contract(algorand_client, dispenser, contract_name, given)
+
+    print()
+    show(results)
+
+    if opts.save:
+        with open(baseline_file, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\n💾 Baseline saved to {baseline_file}")
+    elif opts.check:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, opts.tolerance)
+        if regressions:
+            print("\n❌ Regressions:")
+            for r in regressions:
+                print("   ", r)
+            exit(3001)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
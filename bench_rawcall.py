@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Benchmark: raw ABI calls vs the typed client path
+
+    Builds and signs the same app call (set_b(uint64)uint64 with a box
+    reference) `count` times in one process:
+
+        typed       AppClient params + composer build + signatures (what the
+                    typed clients do for each call)
+        algosdk     ApplicationCallTxn + sign + msgpack encode
+        raw         CallTemplate.pack + sign (see rawcall.py)
+
+    and prints the calls per second and the microseconds per call.
+    No network is needed: a random account and fake suggested params are used.
+
+    Usage:
+        bench_rawcall.py [count]
+----------------------------------------------------------------------------------------------------
+'''
+
+import sys
+import json
+import time
+import base64
+import timeit
+
+import sdk
+
+import rawcall
+
+## Minimal ARC-56 spec of the benchmarked method
+SPEC = {
+    'arcs': [], 'name': 'Bench', 'desc': None,
+    'structs': {}, 'bareActions': {'call': [], 'create': []},
+    'methods': [{
+        'name': 'set_b', 'args': [{'type': 'uint64', 'name': 'b'}], 'returns': {'type': 'uint64'},
+        'actions': {'call': ['NoOp'], 'create': []}, 'readonly': False,
+    }],
+    'networks': {}, 'state': {'schema': {'global': {'ints': 0, 'bytes': 0}, 'local': {'ints': 0, 'bytes': 0}},
+                              'keys': {'global': {}, 'local': {}, 'box': {}}, 'maps': {'global': {}, 'local': {}, 'box': {}}},
+    'source': None, 'byteCode': None, 'compilerInfo': None, 'events': [], 'templateVariables': {},
+}
+
+APP_ID              = 1_000
+BOX                 = b'st_box'
+
+
+def _typed(count, sp, private_key, address):
+    algod_client = sdk.AlgodClient('a' * 64, 'http://localhost:1')
+    algorand_client = sdk.AlgorandClient.from_clients(algod_client)
+    algorand_client.set_suggested_params_cache(sp, time.time() + 3600)
+    algorand_client.account.set_signer_from_account(sdk.SigningAccount(private_key=private_key))
+    app = sdk.AppClient(sdk.AppClientParams(
+        app_spec=sdk.Arc56Contract.from_json(json.dumps(SPEC)),
+        app_id=APP_ID, algorand=algorand_client, default_sender=address,
+    ))
+    for n in range(count):
+        params = app.params.call(sdk.AppClientMethodCallParams(method='set_b', args=[1], note=n.to_bytes(8, 'big'), box_references=[BOX]))
+        built = algorand_client.new_group().add_app_call_method_call(params).build()
+        built.atc.gather_signatures()
+
+
+def _algosdk(count, sp, private_key, address):
+    method = sdk.abi.Method.from_signature('set_b(uint64)uint64')
+    for n in range(count):
+        app_args = [method.get_selector(), method.args[0].type.encode(1)]
+        txn = sdk.transaction.ApplicationCallTxn(address, sp, APP_ID, on_complete=0, app_args=app_args, boxes=[(0, BOX)], note=n.to_bytes(8, 'big'))
+        base64.b64decode(sdk.encoding.msgpack_encode(txn.sign(private_key)))
+
+
+def _raw(count, sp, private_key, address):
+    template = rawcall.CallTemplate(rawcall.method_entry('set_b(uint64)uint64'), APP_ID, address, sp, boxes=[BOX])
+    key = rawcall.signing_key(private_key)
+    for n in range(count):
+        rawcall.sign(key, template.pack([1], sp.first, sp.last, n.to_bytes(8, 'big')))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    private_key, address = sdk.account.generate_account()
+    sp = sdk.transaction.SuggestedParams(
+        fee=1_000, first=1, last=1_001,
+        gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", gen="testnet-v1.0",
+        flat_fee=True, min_fee=1_000
+    )
+
+    print(f"🕓 Building and signing {count} calls per path")
+    print(f"{'path':<10}{'calls/s':>12}{'µs/call':>12}")
+    rates = {}
+    for name, fn in (('typed', _typed), ('algosdk', _algosdk), ('raw', _raw)):
+        start_time = timeit.default_timer()
+        fn(count, sp, private_key, address)
+        elapsed = timeit.default_timer() - start_time
+        rates[name] = count / elapsed
+        print(f"{name:<10}{rates[name]:>12.0f}{elapsed / count * 1e6:>12.1f}")
+    print(f"🏁 raw is {rates['raw'] / rates['typed']:.1f}x the typed path, {rates['raw'] / rates['algosdk']:.1f}x algosdk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Benchmark: memory of the send results vs compact records
+
+    Builds `count` send results of a method call group (a payment + the app
+    call, like `deposit(pay)`) shaped like the ones of algokit: transaction
+    wrappers, algod confirmation dicts, ABI returns. Then measures with
+    tracemalloc the memory held by:
+
+        results     the whole SendAppTransactionResult objects
+        records     one TxRecord of the app call per result (see records.py)
+        all         one TxRecord of each transaction per result
+
+    No network is needed: a random account and fake suggested params are used.
+
+    Usage:
+        bench_records.py [count]
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import gc
+import sys
+import base64
+import tracemalloc
+
+import sdk
+
+import records
+
+from   algokit_utils.models.transaction import TransactionWrapper
+from   algokit_utils.applications.abi import ABIReturn
+from   algosdk.atomic_transaction_composer import ABIResult
+
+APP_ID              = 1_000
+METHOD              = 'deposit(pay)uint64'
+
+
+"""
+    Confirmation dict of `txn` as returned by algod (pending transaction info)
+"""
+def _confirmation(stxn, rnd, logs=None):
+    info = {
+        'confirmed-round'   : rnd,
+        'pool-error'        : '',
+        'txn'               : stxn.dictify(),
+    }
+    ## algod returns base64 strings, not bytes
+    info['txn'] = {'sig': base64.b64encode(info['txn']['sig']).decode(),
+                   'txn': {k: base64.b64encode(v).decode() if isinstance(v, bytes) else v for k, v in info['txn']['txn'].items()}}
+    info['txn']['txn']['snd'] = stxn.transaction.sender
+    if 'rcv' in info['txn']['txn']:
+        info['txn']['txn']['rcv'] = stxn.transaction.receiver
+    if logs:
+        info['logs'] = [base64.b64encode(log).decode() for log in logs]
+        info['global-state-delta'] = [{'key': 'dG90YWw=', 'value': {'action': 2, 'uint': rnd}}]
+    return info
+
+
+"""
+    A send result of `deposit(pay)uint64` number `n`
+"""
+def _result(n, sp, private_key, address, method):
+    note = os.urandom(8) + n.to_bytes(8, 'big')
+    pay = sdk.transaction.PaymentTxn(address, sp, sdk.get_application_address(APP_ID), 100_000, note=note)
+    call = sdk.transaction.ApplicationCallTxn(address, sp, APP_ID, on_complete=0, app_args=[method.get_selector()], boxes=[(0, address.encode()[:32])], note=note)
+    sdk.transaction.assign_group_id([pay, call])
+    stxns = [pay.sign(private_key), call.sign(private_key)]
+    value = n * 100_000
+    raw_value = value.to_bytes(8, 'big')
+    confirmations = [_confirmation(stxns[0], sp.first + n), _confirmation(stxns[1], sp.first + n, [bytes.fromhex('151f7c75') + raw_value])]
+    tx_ids = [t.get_txid() for t in stxns]
+    abi_return = ABIReturn(ABIResult(tx_id=tx_ids[1], raw_value=raw_value, return_value=value, decode_error=None, tx_info=confirmations[1], method=method))
+    return sdk.SendAppTransactionResult(
+        transaction=TransactionWrapper(call),
+        confirmation=confirmations[1],
+        group_id=base64.b64encode(call.group).decode(),
+        tx_id=tx_ids[1],
+        tx_ids=tx_ids,
+        transactions=[TransactionWrapper(pay), TransactionWrapper(call)],
+        confirmations=confirmations,
+        returns=[abi_return],
+        abi_return=value,
+    )
+
+
+"""
+    Memory (bytes) still allocated after keeping `keep(result)` of `count` results
+"""
+def _measure(count, keep, *args):
+    gc.collect()
+    tracemalloc.start()
+    kept = [keep(_result(n, *args)) for n in range(count)]
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    private_key, address = sdk.account.generate_account()
+    sp = sdk.transaction.SuggestedParams(
+        fee=1_000, first=1, last=1_001,
+        gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", gen="testnet-v1.0",
+        flat_fee=True, min_fee=1_000
+    )
+    method = sdk.abi.Method.from_signature(METHOD)
+    args = (sp, private_key, address, method)
+    ## Warm up: first use imports and caches are not counted
+    _measure(10, records.records, *args)
+
+    print(f"🕓 Keeping {count} send results of {METHOD}")
+    print(f"{'kept':<10}{'MB':>10}{'bytes/call':>12}")
+    sizes = {}
+    for name, keep in (('results', lambda r: r), ('records', records.record), ('all', records.records)):
+        sizes[name] = _measure(count, keep, *args)
+        print(f"{name:<10}{sizes[name] / 1e6:>10.2f}{sizes[name] / count:>12.0f}")
+    print(f"🏁 records take {sizes['records'] / sizes['results'] * 100:.1f}% of the memory of the results")
+
+
+if __name__ == "__main__":
+    main()
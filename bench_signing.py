@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Benchmark: signing rate per core
+
+    Signs the same amount of payments and app calls with 1, 2, 4 ... cpu_count
+    processes using the same code of `presign.py` and prints the rate.
+    No network is needed: a random account and fake suggested params are used.
+
+    Usage:
+        bench_signing.py [count]
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import sys
+import timeit
+
+import sdk
+
+import presign
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    private_key, address = sdk.account.generate_account()
+    sp = sdk.transaction.SuggestedParams(
+        fee=1_000, first=1, last=1_001,
+        gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", gen="testnet-v1.0",
+        flat_fee=True
+    )
+    specs = {
+        'pay' : {'kind':'pay', 'sender':address, 'nonce':os.urandom(8), 'receiver':address, 'amount':1_000},
+        'call': {'kind':'call', 'sender':address, 'nonce':os.urandom(8), 'app_id':1_000,
+                 'method':'set_b(uint64)uint64', 'args':[1], 'boxes':[b'st_box']},
+    }
+
+    workers = 1
+    counts = []
+    while workers < os.cpu_count():
+        counts.append(workers)
+        workers *= 2
+    counts.append(os.cpu_count())
+
+    print(f"🕓 Signing {count} transactions per run")
+    print(f"{'kind':<6}{'procs':>6}{'tx/s':>12}{'tx/s/core':>12}")
+    for kind, spec in specs.items():
+        for workers in counts:
+            start_time = timeit.default_timer()
+            for _ in presign.sign_all(private_key, sp, spec, count, workers=workers):
+                pass
+            elapsed = timeit.default_timer() - start_time
+            print(f"{kind:<6}{workers:>6}{count/elapsed:>12.0f}{count/elapsed/workers:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
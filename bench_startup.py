@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Benchmark: start-up (import) time
+
+    Runs each case in a fresh interpreter `runs` times and prints the median
+    wall time. With --profile the `-X importtime` output of every case is
+    parsed and the slowest modules (cumulative time) are listed.
+
+    Usage:
+        bench_startup.py [--runs 10] [--profile]
+----------------------------------------------------------------------------------------------------
+'''
+
+import sys
+import argparse
+import statistics
+import subprocess
+import timeit
+
+
+## Name -> python code run by the interpreter
+CASES = {
+    'python only'                   : "pass",
+    'eager imports (before)'        : "import algokit_utils.algorand, algokit_utils, algosdk.v2client.algod",
+    'sdk facade, no SDK use'        : "import sdk, shelve",
+    'sdk.AlgodClient'               : "import sdk; sdk.AlgodClient",
+    'sdk.abi + sdk.transaction'     : "import sdk; sdk.abi; sdk.transaction",
+    'sdk.AlgorandClient'            : "import sdk; sdk.AlgorandClient",
+}
+
+
+"""
+    Median wall time (seconds) of `runs` interpreters running `code`
+"""
+def measure(code, runs):
+    times = []
+    for _ in range(runs):
+        start_time = timeit.default_timer()
+        subprocess.run([sys.executable, '-c', code], check=True)
+        times.append(timeit.default_timer() - start_time)
+    return statistics.median(times)
+
+
+"""
+    Slowest modules imported by `code` as [(cumulative us, module)]
+"""
+def profile(code, top=10):
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True)
+    rows = []
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), module.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start-up time benchmark")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--profile', action='store_true', help="list the slowest imports of each case")
+    opts = parser.parse_args()
+
+    base = None
+    print(f"{'case':<32}{'median ms':>12}{'over python':>14}")
+    for name, code in CASES.items():
+        t = measure(code, opts.runs)
+        base = t if base == None else base
+        print(f"{name:<32}{t*1000:>12.1f}{(t-base)*1000:>14.1f}")
+        if opts.profile and name != 'python only':
+            for cumulative_us, module in profile(code):
+                print(f"    {cumulative_us/1000:>9.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
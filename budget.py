@@ -0,0 +1,261 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Opcode budget planner
+
+    Each app call in a group adds 700 to the opcode budget shared by the
+    group. Methods that need more than that (ie test_box_ref or set_boxes of
+    sample_contracts/boxes.py) fail when sent alone.
+
+    Before the first send of a method the call is simulated (with enough
+    extra budget to run to the end) to get the budget it really consumes,
+    then the minimal number of "padding" calls is computed: NoOp calls to a
+    tiny app that just approves, placed in the same group. The padding calls
+    have no fee, the method call pays for them (fee pooling).
+
+    The plan (number of padding calls) is cached per app, program version,
+    method and argument shape (types and lengths of the arguments), in memory
+    and in shelve.db ('budget_plans'): repeated calls skip the simulate step.
+    A plan that turns out too small (send fails) is forgotten.
+    The calls are sent from many threads at the same time: the plans are
+    read from shelve.db once, used in memory under a lock, and written back
+    at exit (`flush`), never on the send path.
+
+    The padding app is created once per network, its id is kept in shelve.db
+    ('budget_pad_app' = {algod address: app id}).
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import math
+import atexit
+import shelve
+import threading
+import dataclasses
+
+import sdk
+
+import fingerprint
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Opcode budget added by each app call
+call_budget         = 700
+
+## Fee of each padding call (paid by the method call)
+min_fee             = 1_000
+
+## Extra budget given to simulate to measure expensive methods
+simulate_budget     = 320_000
+
+## Max transactions in a group
+max_group_size      = 16
+
+## Program of the padding app: approve anything
+PAD_TEAL            = "#pragma version 10\npushint 1\nreturn\n"
+
+## {plan key: padding calls}, loaded from shelve.db on first use
+_plans              = None
+
+## Plans changed since they were written to shelve.db
+_dirty              = False
+
+## {algod address: padding app id}
+_pad_apps           = {}
+
+## Guards the plans, the padding apps and the writes to shelve.db
+_lock               = threading.Lock()
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Plan cache
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Shape of a list of method arguments: types and lengths, not values
+    (the budget of a loop over a string depends on its length, not on its content)
+"""
+def shape(args):
+    result = []
+    for arg in args:
+        match arg:
+            case bool() | int():
+                result.append('i')
+            case str() | bytes():
+                result.append(f"b{len(arg)}")
+            case list() | tuple():
+                result.append(f"[{shape(arg)}]")
+            case _:
+                ## Transactions arguments
+                result.append(type(arg).__name__)
+    return ','.join(result)
+
+
+"""
+    Key of the plan of a method call
+    The approval program fingerprint stored by deploy.py (if any) makes the
+    plans of an old version of the app unused after an update
+"""
+def plan_key(app_id, method, args):
+    return f"{app_id}:{fingerprint.version(app_id)}:{method}:{shape(args)}"
+
+
+"""
+    The plans, loaded from shelve.db the first time (call it holding `_lock`)
+"""
+def _load_plans():
+    global _plans
+    if _plans == None:
+        with shelve.open("shelve.db") as db:
+            _plans = db.get('budget_plans', {})
+        atexit.register(flush)
+    return _plans
+
+
+"""
+    Write the changed plans to shelve.db (done at exit)
+"""
+def flush():
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        with shelve.open("shelve.db") as db:
+            db['budget_plans'] = dict(_plans)
+        _dirty = False
+
+
+"""
+    Forget the plan of a call (ie: it was not enough)
+"""
+def forget(key):
+    global _dirty
+    with _lock:
+        if _load_plans().pop(key, None) != None:
+            _dirty = True
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Planning
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Padding calls needed by the group of `params` (AppCallMethodCallParams)
+    measured by simulating it
+"""
+def simulate_pads(algorand_client, params):
+    res = algorand_client.new_group().add_app_call_method_call(params).simulate(
+        allow_unnamed_resources=True,
+        skip_signatures=True,
+        extra_opcode_budget=simulate_budget,
+    )
+    group = res.simulate_response['txn-groups'][0]
+    consumed = group.get('app-budget-consumed', 0)
+    app_calls = sum(1 for r in group['txn-results'] if r['txn-result']['txn']['txn']['type'] == 'appl')
+    pads = max(0, math.ceil((consumed - app_calls * call_budget) / call_budget))
+    if len(group['txn-results']) + pads > max_group_size:
+        raise ValueError(f"the call needs {consumed} opcodes, more than a group can have")
+    return pads
+
+
+"""
+    AppCallMethodCallParams of a call made with the (generated) app client:
+    `cacp` are the CommonAppCallParams values
+"""
+def call_params(app_client, method, cacp, args):
+    return app_client.app_client.params.call(
+        sdk.AppClientMethodCallParams(method=method, args=list(args), **cacp)
+    )
+
+
+"""
+    Number of padding calls for `params`, from the cache or simulating
+"""
+def plan(algorand_client, key, params):
+    global _dirty
+    with _lock:
+        pads = _load_plans().get(key)
+    if pads != None:
+        return pads
+    ## Simulate without the lock: the other calls don't wait for it
+    pads = simulate_pads(algorand_client, params)
+    with _lock:
+        _plans[key] = pads
+        _dirty = True
+    return pads
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Sending
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Id of the padding app on the network of `algorand_client`, created if needed
+    Under the lock: calls sent at the same time create only one app
+"""
+def pad_app_id(algorand_client, sender):
+    with _lock:
+        return _pad_app_id(algorand_client, sender)
+
+
+def _pad_app_id(algorand_client, sender):
+    algod = algorand_client.client.algod
+    if algod.algod_address in _pad_apps:
+        return _pad_apps[algod.algod_address]
+
+    with shelve.open("shelve.db") as db:
+        pad_apps = db.get('budget_pad_app', {})
+    app_id = pad_apps.get(algod.algod_address)
+    if app_id != None:
+        try:
+            algod.application_info(app_id)
+        except Exception:
+            app_id = None
+    if app_id == None:
+        program = algorand_client.app.compile_teal(PAD_TEAL).compiled_base64_to_bytes
+        res = algorand_client.send.app_create(
+            sdk.AppCreateParams(sender=sender, approval_program=program, clear_state_program=program)
+        )
+        app_id = res.app_id
+        pad_apps[algod.algod_address] = app_id
+        with shelve.open("shelve.db") as db:
+            db['budget_pad_app'] = pad_apps
+    _pad_apps[algod.algod_address] = app_id
+    return app_id
+
+
+"""
+    Send `params` (AppCallMethodCallParams) after `pads` padding calls, in one group
+    The method call pays the fees of the padding calls
+    Returns the result of the method call, as a single send would
+    `populate` False when the references of `params` are already set (resources.py)
+"""
+def send_padded(algorand_client, params, pads, populate=True):
+    pad_app = pad_app_id(algorand_client, params.sender)
+    extra_fee = (params.extra_fee.micro_algo if params.extra_fee else 0) + pads * min_fee
+    group = algorand_client.new_group()
+    for _ in range(pads):
+        group.add_app_call(
+            sdk.AppCallParams(
+                sender=params.sender,
+                signer=params.signer,
+                app_id=pad_app,
+                static_fee=sdk.AlgoAmount(micro_algo=0),
+                ## Identical padding calls would have the same txid
+                note=os.urandom(8),
+            )
+        )
+    group.add_app_call_method_call(dataclasses.replace(params, extra_fee=sdk.AlgoAmount(micro_algo=extra_fee)))
+    res = group.send(sdk.SendParams(populate_app_call_resources=populate))
+    return sdk.SendAppTransactionResult.from_composer_result(res, is_abi=True)
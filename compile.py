@@ -1,17 +1,53 @@
 import os
+import re
 import sys
 import shelve
 from   pathlib import Path
 
 
-contract = sys.argv[1]
-os.system(f"algokit compile python {contract} --output-arc56")
-directory = Path('./')
-contract_name = list(directory.glob('*.arc56.json'))
-contract_name = list(map(lambda x: str(x), contract_name))
-contract_name = contract_name[0].replace('.arc56.json','')
-os.system(f"algokitgen-py -a {contract_name}.arc56.json -o {contract_name}_client.py")
+class CompileError(Exception):
+    pass
 
 
-with shelve.open("shelve.db") as db:
-    db['contract_name'] = contract_name
\ No newline at end of file
+"""
+    Names of the ARC4 contracts declared in a contract source
+"""
+def _contract_classes(contract):
+    with open(contract) as f:
+        return re.findall(r'^class\s+(\w+)\s*\(.*ARC4Contract.*\)\s*:', f.read(), re.MULTILINE)
+
+
+"""
+    Compile a contract and generate its client
+    Returns the contract name: the contract of the source whose arc56 file
+    was written by this compile (the last one if there are many)
+    Raises CompileError if the compile or the client generation fails
+"""
+def compile_contract(contract):
+    before = {str(p): p.stat().st_mtime for p in Path('./').glob('*.arc56.json')}
+    if os.system(f"algokit compile python {contract} --output-arc56") != 0:
+        raise CompileError(f"algokit compile of {contract} failed")
+
+    ## An artifact left by a previous compile must not be taken for this one
+    written = [str(p).replace('.arc56.json', '') for p in Path('./').glob('*.arc56.json') if before.get(str(p)) != p.stat().st_mtime]
+    candidates = [c for c in _contract_classes(contract) if c in written] or sorted(written)
+    if not candidates:
+        raise CompileError(f"no arc56 file written by the compile of {contract}")
+    ## Many contracts in one source: the last one declared
+    contract_name = candidates[-1]
+
+    if os.system(f"algokitgen-py -a {contract_name}.arc56.json -o {contract_name}_client.py") != 0:
+        raise CompileError(f"client generation of {contract_name} failed")
+    return contract_name
+
+
+if __name__ == "__main__":
+    contract = sys.argv[1]
+    try:
+        contract_name = compile_contract(contract)
+    except CompileError as e:
+        print(f"❌ {e}")
+        exit(3601)
+
+    with shelve.open("shelve.db") as db:
+        db['contract_name'] = contract_name
@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Shared confirmation watcher
+
+    Waiting for each transaction with its own pending-info polling costs one
+    request per transaction and per poll. The Watcher follows the new blocks
+    once instead (`status/wait-for-block-after`), gets the txids of each block
+    (`blocks/{round}/txids`) and resolves the futures of all the outstanding
+    txids found in it: the load on the node is O(rounds), not O(transactions).
+
+        w = confirm.watcher(algod_client)
+        future = w.watch(txid, last_valid)      -> Future of the confirmed round
+        rounds = w.wait(txids, last_valid)      -> {txid: round}
+
+    A txid not found before its `last_valid` round fails with Expired. The
+    thread following the blocks stops when nothing is outstanding. Only the
+    top level txids are in the blocks: watch the first txid of a group.
+----------------------------------------------------------------------------------------------------
+'''
+
+import time
+import threading
+from   concurrent.futures import Future
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Rounds waited for a txid without last valid round
+default_wait_rounds = 1_000
+
+## Rounds looked at again when the watcher starts (transactions confirmed
+## just before they were watched)
+lookback_rounds     = 2
+
+## Consecutive errors of the node before all the outstanding txids fail
+max_errors          = 10
+
+## Seconds between two tries after an error
+error_pause         = 1.0
+
+## One watcher per algod client
+_watchers           = {}
+_registry_lock      = threading.Lock()
+
+
+class Expired(Exception):
+    pass
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Watcher
+----------------------------------------------------------------------------------------------------
+'''
+
+class Watcher:
+    def __init__(self, algod_client):
+        self.algod = algod_client
+        self.lock = threading.Lock()
+        self.pending = {}           ## txid -> (future, last valid round)
+        self.thread = None
+        self.next_round = None      ## next round to look at
+        self.blocks = 0             ## blocks looked at (for stats)
+
+    """
+        Future of the round `txid` is confirmed in
+        Fails with Expired after its `last_valid` round
+    """
+    def watch(self, txid, last_valid=None):
+        future = Future()
+        with self.lock:
+            if txid in self.pending:
+                return self.pending[txid][0]
+            self.pending[txid] = (future, last_valid)
+            if self.thread == None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        return future
+
+    """
+        Wait for all the `txids`, returns {txid: confirmed round}
+        Raises the error (Expired...) of the first one that failed
+    """
+    def wait(self, txids, last_valid=None, timeout=None):
+        futures = {txid: self.watch(txid, last_valid) for txid in txids}
+        return {txid: f.result(timeout) for txid, f in futures.items()}
+
+    def outstanding(self):
+        with self.lock:
+            return len(self.pending)
+
+    ## ---------------------------------------------------------------- blocks
+
+    """
+        Resolve the futures of the txids of block `rnd`, expire the old ones
+    """
+    def _block(self, rnd, txids):
+        done = []
+        with self.lock:
+            for txid in txids:
+                if txid in self.pending:
+                    done.append((self.pending.pop(txid)[0], rnd))
+            for txid, (future, last_valid) in list(self.pending.items()):
+                if last_valid != None and rnd >= last_valid:
+                    del self.pending[txid]
+                    done.append((future, Expired(f"{txid} not confirmed before round {last_valid}")))
+        self.blocks += 1
+        for future, result in done:
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    """
+        Fail all the outstanding txids
+    """
+    def _fail_all(self, error):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for future, _ in pending.values():
+            future.set_exception(error)
+
+    def _run(self):
+        errors = 0
+        while True:
+            with self.lock:
+                if not self.pending:
+                    ## Idle: start again from the last round next time
+                    self.thread = None
+                    self.next_round = None
+                    return
+            try:
+                if self.next_round == None:
+                    ## The transactions may already be in the last blocks
+                    last_round = self.algod.status()['last-round']
+                    self.next_round = max(1, last_round - lookback_rounds)
+                else:
+                    last_round = self.algod.status_after_block(self.next_round - 1)['last-round']
+                while self.next_round <= last_round:
+                    txids = self.algod.get_block_txids(self.next_round)['blockTxids'] or []
+                    self._block(self.next_round, txids)
+                    self.next_round += 1
+                errors = 0
+            except Exception as e:
+                errors += 1
+                if errors >= max_errors:
+                    self._fail_all(e)
+                    self.next_round = None
+                    errors = 0
+                    continue
+                time.sleep(error_pause)
+            ## Txids without last valid round wait `default_wait_rounds`
+            with self.lock:
+                for txid, (future, last_valid) in self.pending.items():
+                    if last_valid == None:
+                        self.pending[txid] = (future, self.next_round + default_wait_rounds)
+
+
+"""
+    The Watcher of `algod_client`, created the first time
+"""
+def watcher(algod_client):
+    with _registry_lock:
+        if id(algod_client) not in _watchers:
+            _watchers[id(algod_client)] = Watcher(algod_client)
+        return _watchers[id(algod_client)]
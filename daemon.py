@@ -0,0 +1,251 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Resident daemon
+
+    Every program of this set is a separate Python process that imports the
+    SDK, reads shelve.db, looks for the artifacts, builds the AlgorandClient
+    and checks the account before doing anything useful.
+    This daemon does all of that once and keeps it warm, then serves commands
+    sent by the thin client `algoctl.py` over a Unix socket.
+
+    Start it (in its own terminal) from the folder of shelve.db:
+
+        daemon.py
+
+    Commands (see algoctl.py):
+        ping                                    is the daemon alive?
+        state                                   account and app details (as interactive.py)
+        methods                                 contract methods (as interactive.py)
+        call <method> [args] [on_complete:N]    send a transaction (as interactive.py)
+        compile <contract.py>                   run compile.py
+        deploy                                  run deploy.py
+        interact                                run interact.py
+        shelview                                run shelview.py
+        clean <key>                             run clean.py
+        reload                                  read shelve.db and the artifacts again
+        stop                                    stop the daemon
+
+    Programs are run in the daemon process: the SDK and the connection are
+    already there. After compile/deploy/clean the warm state is rebuilt on
+    the next command that needs it.
+    set_network.py and generate_account.py ask questions: run them directly.
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import io
+import re
+import sys
+import json
+import runpy
+import socket
+import importlib
+import traceback
+import socketserver
+from   contextlib import redirect_stdout, redirect_stderr
+
+import interactive
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Socket file, next to shelve.db
+socket_file         = '.daemon.sock'
+
+## Marks the end of the output of a command, followed by the exit code
+END_MARK            = '\0EXIT '
+
+## Programs that can be run by the daemon, the ones that change shelve.db
+## or the artifacts make the warm state stale
+PROGRAMS            = {
+    'compile'   : ('compile.py', True),
+    'deploy'    : ('deploy.py', True),
+    'clean'     : ('clean.py', True),
+    'interact'  : ('interact.py', False),
+    'shelview'  : ('shelview.py', False),
+}
+
+## True when interactive._init() must run before the next call
+stale               = True
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Commands
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    (Re)build the warm state: shelve values, client module, ABI, AlgorandClient, signer
+    A client module generated again by compile.py must be imported again
+"""
+def _warm_up():
+    global stale
+    for name in _generated_clients():
+        del sys.modules[name]
+    importlib.invalidate_caches()
+    interactive._init()
+    interactive._parse_methods()
+    stale = False
+
+
+"""
+    Names of the loaded client modules generated by compile.py: the
+    `*_client.py` files of the working directory, not the SDK modules with
+    the same suffix (httpx._client, algokit_utils...app_client), whose
+    classes must stay the same for isinstance checks
+"""
+def _generated_clients():
+    cwd = os.path.realpath(os.getcwd())
+    names = []
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None)
+        if name.endswith('_client') and path and os.path.dirname(os.path.realpath(path)) == cwd:
+            names.append(name)
+    return names
+
+
+def _ensure_warm():
+    if stale:
+        _warm_up()
+
+
+"""
+    Run one of the programs as if it was started from the command line
+"""
+def _run_program(name, args):
+    global stale
+    script, changes_state = PROGRAMS[name]
+    saved_argv = sys.argv
+    sys.argv = [script] + args
+    try:
+        runpy.run_path(script, run_name='__main__')
+        return 0
+    finally:
+        sys.argv = saved_argv
+        if changes_state:
+            stale = True
+
+
+"""
+    Send a transaction as interactive.py does
+    `args` are the words typed at the interactive.py prompt
+"""
+def _call(args):
+    _ensure_warm()
+    sel = re.sub(r'\s+', ' ', ' '.join(args)).split(' ')
+    sc_method = sel[0]
+    method_args = list(filter(lambda a : False if ':' in a else True, sel[1:]))
+    txn_args = list(filter (lambda a : True if ':' in a else False, sel[1:]))
+    if not interactive._check_sel(sc_method, method_args, txn_args):
+        return 1
+    res = interactive.dotx(sc_method, method_args, txn_args)
+    if not res:
+        return 1
+    interactive._tx_output(res)
+    return 0
+
+
+"""
+    Execute one command, the output goes to stdout
+    Returns the exit code
+"""
+def execute(cmd, args):
+    global stale
+    match cmd:
+        case 'ping':
+            print("🟢 pong")
+        case 'reload':
+            _warm_up()
+            print("🟢 reloaded")
+        case 'state':
+            _ensure_warm()
+            interactive._account_info()
+            interactive._show_app_details()
+        case 'methods':
+            _ensure_warm()
+            interactive._show_methods()
+        case 'call':
+            return _call(args)
+        case _ if cmd in PROGRAMS:
+            return _run_program(cmd, args)
+        case _:
+            print(f"🔺 {cmd} is not a valid command")
+            return 1
+    return 0
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Server
+----------------------------------------------------------------------------------------------------
+'''
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        cmd = request.get('cmd', '')
+        out = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+
+        if cmd == 'stop':
+            out.write(f"🏁 Daemon stopped\n{END_MARK}0\n")
+            self.server.running = False
+            return
+
+        ## Requests are served one at a time, so redirecting the output
+        ## of the whole process to the client is safe
+        code = 0
+        with redirect_stdout(out), redirect_stderr(out):
+            try:
+                code = execute(cmd, request.get('args', []))
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except Exception as e:
+                traceback.print_exc()
+                code = 1
+        out.write(f"{END_MARK}{code}\n")
+        out.flush()
+        out.detach()
+
+
+def serve(path=socket_file):
+    if os.path.exists(path):
+        ## Is another daemon already there?
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.connect(path)
+            print("❌ A daemon is already running")
+            exit(4001)
+        except OSError:
+            os.remove(path)
+
+    ## Nothing must wait for a key press
+    interactive.interactive_mode = False
+
+    print("🕓 Warming up...")
+    try:
+        _warm_up()
+        print("🟢 Ready")
+    except SystemExit:
+        print("🟨 Could not load the app, only programs can be run until `reload`")
+
+    with socketserver.UnixStreamServer(path, _Handler) as server:
+        server.running = True
+        print(f"🚀 Listening on {path}")
+        try:
+            while server.running:
+                server.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(path)
+    print("🏁 Done !!")
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,15 +1,21 @@
 #!/usr/bin/python3
 
+import sys
 import shelve
 import timeit
 import os
 import json
 import importlib
+import contextlib
 from   pathlib import Path
 from   base64 import b64decode
+from   concurrent.futures import ThreadPoolExecutor
 
-from algokit_utils import SigningAccount, PaymentParams, AlgoAmount
-from algokit_utils.algorand import AlgorandClient, AlgoClientConfigs, AlgoClientNetworkConfig
+import sdk
+
+from tracing import span
+import network
+import fingerprint
 
 '''
 ----------------------------------------------------------------------------------------------------    
@@ -39,6 +45,11 @@ app_id                  = None
 app_address             = None
 
 abi                     = None
+box_mbr                 = 0
+
+## Deploy results
+app_client              = None
+deploy_response         = None
 
 ## MBR
 # 100_000 for the creator MBR,
@@ -46,6 +57,49 @@ abi                     = None
 # 2_000 for the 2 transactions
 required_balance        = 202_000
 
+## Minimum balance of the application account (boxes excluded)
+app_min_balance         = 100_000
+
+## [(phase, seconds)] of the last deploy
+timings                 = []
+
+
+'''
+----------------------------------------------------------------------------------------------------    
+    Phase timing
+----------------------------------------------------------------------------------------------------    
+'''
+
+"""
+    Time the code in the `with` block as phase `name`
+    (phases run by different threads overlap)
+"""
+@contextlib.contextmanager
+def _phase(name):
+    start_time = timeit.default_timer()
+    try:
+        yield
+    finally:
+        timings.append((name, timeit.default_timer() - start_time))
+
+
+"""
+    Run fn(*args) as phase `name` (used for the functions run in the pool)
+"""
+def _timed(name, fn, *args):
+    with _phase(name):
+        return fn(*args)
+
+
+"""
+    Show how long each phase took
+"""
+def _show_timings(total):
+    print("⏱  Phase                 seconds")
+    for name, seconds in timings:
+        print(f"   {name:<20} {seconds:8.3f}")
+    print(f"   {'total':<20} {total:8.3f}")
+
 
 '''
 ----------------------------------------------------------------------------------------------------    
@@ -53,79 +107,104 @@ required_balance        = 202_000
 ----------------------------------------------------------------------------------------------------    
 '''
 
-## Check if an address is already there
-with shelve.open("shelve.db") as db:
-    if 'private_key' in db and 'address' in db:
-        private_key = db['private_key']
-        address = db['address']
-        print("🟢 Using private key: ", private_key)
-        print("🟢 Using address: ", address)
-    else:
-        print("❌ No account found in shelve.db. Create one first")
-        exit(1001)
+"""
+    Get the account, network and contract name from shelve.db
+    and check that the account is correct
+"""
+def load_config():
+    global private_key
+    global address
+    global algod_address
+    global algod_token
+    global contract_name
+    global lora_link
+    global signer
+    global app_id
+    global app_address
+
+    ## Check if an address is already there
+    with shelve.open("shelve.db") as db:
+        if 'private_key' in db and 'address' in db:
+            private_key = db['private_key']
+            address = db['address']
+            print("🟢 Using private key: ", private_key)
+            print("🟢 Using address: ", address)
+        else:
+            print("❌ No account found in shelve.db. Create one first")
+            exit(1001)
 
-    if 'algod_address' in db:
-        algod_address = db['algod_address']
-        print("🟢 Using net: ", algod_address)
-    else:
-        print("❌ Algorand client address not specified")
-        exit(1002)
+        if 'algod_address' in db:
+            algod_address = db['algod_address']
+            print("🟢 Using net: ", algod_address)
+        else:
+            print("❌ Algorand client address not specified")
+            exit(1002)
+
+        if 'algod_token' in db:
+            algod_token = db['algod_token']
+            print("🟢 Using token: ", algod_token)
+        else:
+            print("❌ Algorand token address not specified")
+            exit(1002)
+
+        if 'contract_name' in db:
+            contract_name = db['contract_name']
+            print("🟢 Using contract name: ", contract_name)
+
+        if 'lora_link' in db:
+            lora_link = db['lora_link']
+
+        ## The app deployed last time (if any)
+        if 'app_id' in db and db['app_id'] != None:
+            app_id = db['app_id']
+            app_address = db.get('app_address')
+
+    ## Check that account is correct
+    signer = sdk.SigningAccount(private_key=private_key)
+    if address != signer.address:
+        print("❌ Private key and address dont' match")
+        exit(1003)
+
+
+"""
+    Get the ABI of the contract and compute the MBR due to boxes use
+"""
+def load_abi():
+    global abi
+    global box_mbr
+
+    ## Get ABI
+    abi = None
+    try:
+        directory = Path('./')
+        abi_file = list(directory.glob(contract_name+'.arc56.json'))
+        if len(abi_file) != 1:
+            print("❌ Exaclty 1 arc56 ABI file expected ! Quitting")
+            exit(2008)
+        else:
+            abi_file = list(map(lambda x: str(x), abi_file))[0]
+    except Exception as e:
+        print("💩 ", e)
+        print("❌ Error finding client file! Quitting")
+        exit(2009)
+
+    with open(abi_file) as f:
+        abi = json.loads(f.read())
+
+    ## Compute MBR due to boxes use
+    box_mbr = 0
+    try :
+        boxes = abi['state']['keys']['box']
+        for bx in boxes.keys():
+            box_mbr += 2500
+            box_mbr += 400 * len(bx)
+            box_mbr += 400 * 1024
+            print("📦 Extimate Box MBR : ", box_mbr)
+    except Exception as e:
+        print("💩 ", e)
+        print("❌ Error computing box(es) MBR")
+        exit(2012)
 
-    if 'algod_token' in db:
-        algod_token = db['algod_token']
-        print("🟢 Using token: ", algod_token)
-    else:
-        print("❌ Algorand token address not specified")
-        exit(1002)
-
-    if 'contract_name' in db:
-        contract_name = db['contract_name']
-        print("🟢 Using contract name: ", contract_name)
-
-    if 'lora_link' in db:
-        lora_link = db['lora_link']
-
-## Check that account is correct
-signer = SigningAccount(private_key=private_key)
-if address != signer.address:
-    print("❌ Private key and address dont' match")
-    exit(1003)
-
-
-## Get ABI
-abi = None
-try:
-    directory = Path('./')
-    abi_file = list(directory.glob(contract_name+'.arc56.json'))
-    if len(abi_file) != 1:
-        print("❌ Exaclty 1 arc56 ABI file expected ! Quitting")
-        exit(2008)
-    else:
-        abi_file = list(map(lambda x: str(x), abi_file))[0]
-except Exception as e:
-    print("💩 ", e)
-    print("❌ Error finding client file! Quitting")
-    exit(2009)
-
-with open(abi_file) as f:
-    abi = json.loads(f.read())
-
-
-## Compute MBR due to boxes use
-box_mbr = 0
-try :
-    boxes = abi['state']['keys']['box']
-    for bx in boxes.keys():
-        box_mbr += 2500
-        box_mbr += 400 * len(bx)
-        box_mbr += 400 * 1024
-        print("📦 Extimate Box MBR : ", box_mbr)
-except Exception as e:
-    print("💩 ", e)
-    print("❌ Error computing box(es) MBR")
-    exit(2012)
-
-required_balance += box_mbr
 
 '''
 ----------------------------------------------------------------------------------------------------    
@@ -133,36 +212,64 @@ required_balance += box_mbr
 ----------------------------------------------------------------------------------------------------    
 '''
 
-## Connect to Algorand net via client
-try:
-    # Define a network endpoint
-    algo_net =AlgoClientNetworkConfig(
-            server=algod_address,
-            token=algod_token
-    )
-    # Use network entpoint to define the client
-    algorand_client = AlgorandClient(AlgoClientConfigs(
-        algod_config = algo_net,
-        indexer_config = algo_net,
-        kmd_config = algo_net
-    ))
-except Exception as e:
-    print("💩 ", e)
-    print("❌ Could not connet! Quitting")
-    exit(2004)
-
-## Get some account info (it's a check that we can speak to the node)
-try:
-    account_info = algorand_client.account.get_information(address)
+"""
+    Create the algorand client
+"""
+def connect():
+    global algorand_client
+
+    ## Connect to Algorand net via client
+    try:
+        algorand_client = network.algorand_client(algod_address, algod_token)
+    except Exception as e:
+        print("💩 ", e)
+        print("❌ Could not connet! Quitting")
+        exit(2004)
+
+
+"""
+    Get some account info (it's a check that we can speak to the node)
+"""
+def fetch_account_info():
+    try:
+        return algorand_client.account.get_information(address)
+    except Exception as e:
+        print("💩 ", e)
+        print("❌ Could not get address info! Quitting")
+        exit(1006)
+
+
+"""
+    Check there are enough funds to spend `required` micro algos
+"""
+def check_balance(account_info, required):
     print("💰 Account balance", account_info.amount.micro_algo/1_000_000, "algos")
     print("🏦 Minimum balance", account_info.min_balance.micro_algo /1_000_000, "algos")
-except Exception as e:
-    print("💩 ", e)
-    print("❌ Could not get address info! Quitting")
-    exit(1006)
-if  (account_info.amount.micro_algo - account_info.min_balance.micro_algo)< required_balance:
-    print("💸 You are too poor! Quitting")
-    exit(1007)
+    if  (account_info.amount.micro_algo - account_info.min_balance.micro_algo) < required:
+        print("💸 You are too poor! Quitting")
+        exit(1007)
+
+
+"""
+    Balance (micro algos) of the application account of the deployed `app_id`
+"""
+def app_balance():
+    try:
+        app_info = algorand_client.account.get_information(sdk.get_application_address(app_id))
+    except Exception as e:
+        print("💩 ", e)
+        print("❌ Could not get application account info! Quitting")
+        exit(1016)
+    return app_info.amount.micro_algo
+
+
+"""
+    Micro algos still missing on the application account to cover its MBR
+    plus the box MBR (0 if it's funded enough)
+    `box_mbr` is computed by load_abi: call it after
+"""
+def app_top_up(balance):
+    return max(0, app_min_balance + box_mbr - balance)
 
 
 '''
@@ -171,34 +278,41 @@ if  (account_info.amount.micro_algo - account_info.min_balance.micro_algo)< requ
 ----------------------------------------------------------------------------------------------------    
 '''
 
-if (contract_name) :
-    client_module = contract_name+"_client"
-    if os.path.exists(client_module+'.py') != True:
-        print("❌ Could not locate contract client! Quitting")
-        exit(2006)
-    client_object = importlib.import_module(contract_name+"_client")
-else:
-    ## Get client module file and contract name
-    try:
-        directory = Path('./')
-        client_module = list(directory.glob('*_client.py'))
-        client_module = list(map(lambda x: str(x), client_module))
-        if len(client_module) != 1:
-            print("❌ Exaclty 1 Client file expected ! Quitting")
-            exit(2008)
-        else:
-            client_module = client_module[0]
-            contract_name = client_module.replace('_client.py','')
-    except Exception as e:
-        print("💩 ", e)
-        print("❌ Error finding client file! Quitting")
-
-    ## Check that the contract client was created using alogkit-client-generator
-    if os.path.exists(client_module) != True:
-        print("❌ Could not locate contract client! Quitting")
-        exit(2006)
+"""
+    Import the client module generated by compile.py
+"""
+def load_client_module():
+    global client_object
+    global contract_name
+
+    if (contract_name) :
+        client_module = contract_name+"_client"
+        if os.path.exists(client_module+'.py') != True:
+            print("❌ Could not locate contract client! Quitting")
+            exit(2006)
+        client_object = importlib.import_module(contract_name+"_client")
     else:
-        client_object = importlib.import_module(client_module.replace('.py',''))
+        ## Get client module file and contract name
+        try:
+            directory = Path('./')
+            client_module = list(directory.glob('*_client.py'))
+            client_module = list(map(lambda x: str(x), client_module))
+            if len(client_module) != 1:
+                print("❌ Exaclty 1 Client file expected ! Quitting")
+                exit(2008)
+            else:
+                client_module = client_module[0]
+                contract_name = client_module.replace('_client.py','')
+        except Exception as e:
+            print("💩 ", e)
+            print("❌ Error finding client file! Quitting")
+
+        ## Check that the contract client was created using alogkit-client-generator
+        if os.path.exists(client_module) != True:
+            print("❌ Could not locate contract client! Quitting")
+            exit(2006)
+        else:
+            client_object = importlib.import_module(client_module.replace('.py',''))
 
 
 '''
@@ -207,43 +321,102 @@ else:
 ----------------------------------------------------------------------------------------------------    
 '''
 
-## Get contract factory from client, use reflection to import factory
-factory_class = getattr(client_object, contract_name+'Factory')
-factory = factory_class(
-    algorand = algorand_client,
-    default_sender = signer.address,
-    default_signer = signer
-)
-
-print("🕓 Creating and Deplying contract...")
-start_time = timeit.default_timer()
-try:
-    app_client, deploy_response = factory.send.create.bare()
-    app_id = app_client.app_id
-    app_address = app_client.app_address
-except Exception as e:
-    print("💩 ", e)
-    print("❌ Could not deploy contract ! Quitting")
-    exit(1013)
-
-print('🟢 Contract Deployed!')
-# wait_for_confirmation(algod_client, tx_id)
-elapsed = timeit.default_timer() - start_time
-print(f"✅ Deploy successful! ({elapsed})")
-
-## Store data into shelve
-with shelve.open("shelve.db") as db:
-    db['contract_name'] = contract_name
-    db['app_address'] = app_address
-    db['app_id'] = app_id
-print("🏁 Done !! ")
-
-print("____________________________________________________________\n")
-print(f"🔥 Application ID:{app_id}")
-print(f"📍 Application Address: {lora_link+'account/'+app_address}")
-print(f"🔗 Lora Link: {lora_link+'application/'+str(app_id)}")
-print(f"🔎 Deploy Transaction ID: {deploy_response.tx_ids[0]}")
-print("____________________________________________________________\n")
+"""
+    Create the app with the factory of the client module
+"""
+def create_app():
+    global app_client
+    global app_id
+    global app_address
+    global deploy_response
+
+    ## Get contract factory from client, use reflection to import factory
+    factory_class = getattr(client_object, contract_name+'Factory')
+    factory = factory_class(
+        algorand = algorand_client,
+        default_sender = signer.address,
+        default_signer = signer
+    )
+
+    print("🕓 Creating and Deplying contract...")
+    try:
+        with span('deploy.create'):
+            app_client, deploy_response = factory.send.create.bare()
+        app_id = app_client.app_id
+        app_address = app_client.app_address
+    except Exception as e:
+        print("💩 ", e)
+        print("❌ Could not deploy contract ! Quitting")
+        exit(1013)
+
+    print('🟢 Contract Deployed!')
+    print("✅ Deploy successful!")
+
+
+"""
+    Update the approval/clear programs of the already deployed `app_id`
+    with the ones of the compiled TEAL files of the contract
+    The contract must allow UpdateApplication
+    If `top_up` > 0 a payment of `top_up` to the application account is sent
+    in the same atomic group (ie: the new version uses more boxes)
+"""
+def update_app(top_up=0):
+    global app_address
+    global deploy_response
+
+    print("🕓 Updating contract...")
+    try:
+        with open(contract_name+'.approval.teal') as f:
+            approval = algorand_client.app.compile_teal(f.read())
+        with open(contract_name+'.clear.teal') as f:
+            clear = algorand_client.app.compile_teal(f.read())
+        app_address = sdk.get_application_address(app_id)
+        group = algorand_client.new_group().add_app_update(
+            sdk.AppUpdateParams(
+                sender=address,
+                signer=signer,
+                app_id=app_id,
+                approval_program=approval.compiled_base64_to_bytes,
+                clear_state_program=clear.compiled_base64_to_bytes,
+            )
+        )
+        if top_up > 0:
+            print(f"🕓 Funding Application account with {top_up} more micro algos in the same group...")
+            group.add_payment(
+                sdk.PaymentParams(
+                    sender=address,
+                    signer=signer,
+                    amount=sdk.AlgoAmount(micro_algo=top_up),
+                    receiver=app_address,
+                )
+            )
+        with span('deploy.update'):
+            deploy_response = group.send()
+    except Exception as e:
+        print("💩 ", e)
+        print("❌ Could not update contract ! Quitting")
+        exit(1015)
+
+    print("✅ Update successful!")
+
+
+"""
+    Store the deployed app into shelve and show the results
+"""
+def store():
+    ## Store data into shelve
+    with shelve.open("shelve.db") as db:
+        db['contract_name'] = contract_name
+        db['app_address'] = app_address
+        db['app_id'] = app_id
+    print("🏁 Done !! ")
+
+    print("____________________________________________________________\n")
+    print(f"🔥 Application ID:{app_id}")
+    print(f"📍 Application Address: {lora_link+'account/'+app_address}")
+    print(f"🔗 Lora Link: {lora_link+'application/'+str(app_id)}")
+    print(f"🔎 Deploy Transaction ID: {deploy_response.tx_ids[0]}")
+    print("____________________________________________________________\n")
 
 
 '''
@@ -252,33 +425,120 @@ print("____________________________________________________________\n")
 ----------------------------------------------------------------------------------------------------    
 '''
 
-## Compute the extra cost due to boxes
-amount = 100_000    # for the contract itsefl
-amount += box_mbr   # for the box storage
+"""
+    Fund the application account with its MBR plus the box MBR
+"""
+def fund_app():
+    ## Compute the extra cost due to boxes
+    amount = app_min_balance    # for the contract itsefl
+    amount += box_mbr   # for the box storage
 
-print("🕓 Funding Application account...")
+    print("🕓 Funding Application account...")
 
-start_time = timeit.default_timer()
-try:
-    fund = algorand_client.send.payment(
-        params=PaymentParams(
-            sender=address,
-            signer=signer,
-            amount=AlgoAmount(micro_algo=amount),
-            receiver=app_client.app_address,
-        )
-    )
-except Exception as e:
-    print("💩 ", e)
-    print("❌ Could not sign payment transaction with private key ! Quitting")
-    exit(1014)
+    try:
+        with span('deploy.fund'):
+            fund = algorand_client.send.payment(
+                params=sdk.PaymentParams(
+                    sender=address,
+                    signer=signer,
+                    amount=sdk.AlgoAmount(micro_algo=amount),
+                    receiver=app_address,
+                )
+            )
+    except Exception as e:
+        print("💩 ", e)
+        print("❌ Could not sign payment transaction with private key ! Quitting")
+        exit(1014)
 
-elapsed = timeit.default_timer() - start_time
-print(f"🔎 Funding Transaction ID: {fund.tx_ids[0]}")
-print(f"🔎 Transaction amount: {fund.confirmation['txn']['txn']['amt']}")
-print(f"🔎 Transaction fee: {fund.confirmation['txn']['txn']['fee']}")
-print(f"🔎 Transaction type: {fund.confirmation['txn']['txn']['type']}")
+    print(f"🔎 Funding Transaction ID: {fund.tx_ids[0]}")
+    print(f"🔎 Transaction amount: {fund.confirmation['txn']['txn']['amt']}")
+    print(f"🔎 Transaction fee: {fund.confirmation['txn']['txn']['fee']}")
+    print(f"🔎 Transaction type: {fund.confirmation['txn']['txn']['type']}")
 
-print(f"✅ Funding confirmed! ({elapsed})")
+    print("✅ Funding confirmed!")
 
 
+'''
+----------------------------------------------------------------------------------------------------    
+    PART7: Choose what to do
+----------------------------------------------------------------------------------------------------    
+'''
+
+"""
+    Compare the fingerprint of the compiled contract with the one of the
+    deployed app (see fingerprint.py) and do only what is needed:
+    - noop: the same programs are already deployed under app_id
+    - update: the app can be updated in place
+    - create: create and fund a new app
+    `force` always creates a new app
+
+    Everything is checked before sending anything. The independent work
+    runs at the same time: the network calls (account info, fingerprint,
+    application account balance) in the pool while this thread loads the
+    ABI and the client module.
+    A new app can't be funded in the same group of its create: the address
+    of the application account depends on the app id, known only after
+    the create is confirmed. An update and its top up are sent together.
+"""
+def deploy(force=False):
+    timings.clear()
+    start_time = timeit.default_timer()
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        account = pool.submit(_timed, 'account info', fetch_account_info)
+        if app_id != None and not force:
+            ## Only the balance: box_mbr is computed by load_abi meanwhile
+            balance = pool.submit(_timed, 'app balance', app_balance)
+        else:
+            balance = None
+        with _phase('abi'):
+            load_abi()
+        planned = pool.submit(_timed, 'fingerprint', fingerprint.plan, algorand_client, contract_name, abi, app_id)
+        with _phase('client module'):
+            load_client_module()
+        ## Wait for the network calls (exits here if one failed)
+        action, compiled = planned.result()
+        account_info = account.result()
+        if force:
+            action = 'create'
+        top_up = app_top_up(balance.result()) if action == 'update' else 0
+
+    ## Preflight: can we pay for what we're going to do?
+    match action:
+        case 'noop':
+            print(f"🟢 {contract_name} is already deployed with the same programs (app id: {app_id})")
+            print("🏁 Nothing to do !! (use --force to create a new app anyway)")
+            _show_timings(timeit.default_timer() - start_time)
+            return action
+        case 'update':
+            check_balance(account_info, top_up + 2_000)
+            with _phase('update'):
+                update_app(top_up)
+        case 'create':
+            check_balance(account_info, required_balance + box_mbr)
+            with _phase('create'):
+                create_app()
+
+    with _phase('store'):
+        fingerprint.remember(app_id, contract_name, compiled, abi)
+        store()
+    if action == 'create':
+        with _phase('fund'):
+            fund_app()
+    _show_timings(timeit.default_timer() - start_time)
+    return action
+
+
+"""________________________________________________________________________
+
+   MAIN
+"""
+
+def main():
+    load_config()
+    connect()
+    deploy(force='--force' in sys.argv[1:])
+
+
+if __name__ == "__main__": 
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Artifact fingerprints: skip redundant deploys
+
+    The fingerprint of a program is the sha256 of its compiled bytes. The one of
+    the compiled TEAL files is compared with the one of the program deployed
+    under the app_id in shelve.db (from `application_info`) to choose:
+
+        noop    same approval and clear programs already deployed
+        update  programs changed but the app can be updated in place
+        create  no app, different contract, or not updatable/compatible
+
+    Cached in shelve.db:
+        teal_hashes     {sha256 of TEAL source: fingerprint of its compiled program}
+                        (skips the compile round trip when the TEAL did not change)
+        fingerprints    {app_id: {'contract_name', 'approval', 'clear', 'methods'}}
+                        what was deployed by us (methods are needed to check compatibility)
+----------------------------------------------------------------------------------------------------
+'''
+
+import shelve
+import base64
+import hashlib
+import threading
+
+## {app_id: approval version} read once per process (see `version`)
+_versions           = {}
+_versions_lock      = threading.Lock()
+
+
+"""
+    sha256 (hex) of some bytes
+"""
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+"""
+    ABI signature of an ARC-56 method
+"""
+def signature(method):
+    return f"{method['name']}({','.join(a['type'] for a in method['args'])}){method['returns']['type']}"
+
+
+"""
+    Signatures of the ABI methods of an ARC-56 spec
+"""
+def signatures(spec):
+    return sorted(signature(m) for m in spec['methods'])
+
+
+"""
+    Fingerprint of the approval and clear programs of a compiled contract
+    {'approval': hex, 'clear': hex}
+    The TEAL is compiled by algod only if its hash is not in the cache
+"""
+def teal_fingerprint(algorand_client, contract_name):
+    result = {}
+    with shelve.open("shelve.db") as db:
+        cache = db.get('teal_hashes', {})
+        for program in ('approval', 'clear'):
+            with open(f"{contract_name}.{program}.teal") as f:
+                teal = f.read()
+            key = _sha(teal.encode())
+            if key not in cache:
+                compiled = algorand_client.app.compile_teal(teal)
+                cache[key] = _sha(compiled.compiled_base64_to_bytes)
+            result[program] = cache[key]
+        db['teal_hashes'] = cache
+    return result
+
+
+"""
+    Fingerprint and schema of the programs deployed under `app_id`
+    {'approval', 'clear', 'global': (ints, bytes), 'local': (ints, bytes)}
+    None if the app does not exist
+"""
+def deployed_fingerprint(algorand_client, app_id):
+    try:
+        params = algorand_client.client.algod.application_info(app_id)['params']
+    except Exception as e:
+        if getattr(e, 'code', None) == 404:
+            return None
+        raise
+    gs = params.get('global-state-schema', {})
+    ls = params.get('local-state-schema', {})
+    return {
+        'approval' : _sha(base64.b64decode(params['approval-program'])),
+        'clear' : _sha(base64.b64decode(params['clear-state-program'])),
+        'global' : (gs.get('num-uint', 0), gs.get('num-byte-slice', 0)),
+        'local' : (ls.get('num-uint', 0), ls.get('num-byte-slice', 0)),
+    }
+
+
+"""
+    Choose what to do to have the compiled `contract_name` deployed
+    `spec` is its ARC-56 spec, `app_id` the app in shelve.db (if any)
+    Returns (action, compiled fingerprint) where action is 'noop', 'update' or 'create'
+"""
+def plan(algorand_client, contract_name, spec, app_id):
+    compiled = teal_fingerprint(algorand_client, contract_name)
+    if app_id == None:
+        return 'create', compiled
+
+    deployed = deployed_fingerprint(algorand_client, app_id)
+    if deployed == None:
+        return 'create', compiled
+    if deployed['approval'] == compiled['approval'] and deployed['clear'] == compiled['clear']:
+        return 'noop', compiled
+
+    ## Programs differ: can we update? It must be the same contract...
+    with shelve.open("shelve.db") as db:
+        known = db.get('fingerprints', {}).get(app_id)
+    if known == None or known['contract_name'] != contract_name:
+        return 'create', compiled
+    ## ...that allows updates...
+    if 'UpdateApplication' not in spec.get('bareActions', {}).get('call', []):
+        return 'create', compiled
+    ## ...with a schema that did not grow (it's fixed at create time)...
+    schema = spec['state']['schema']
+    for scope in ('global', 'local'):
+        if schema[scope]['ints'] > deployed[scope][0] or schema[scope]['bytes'] > deployed[scope][1]:
+            return 'create', compiled
+    ## ...and still has the methods of the deployed version
+    if not set(known['methods']) <= set(signatures(spec)):
+        return 'create', compiled
+    return 'update', compiled
+
+
+"""
+    Remember what has been deployed under `app_id`
+"""
+def remember(app_id, contract_name, compiled, spec):
+    with shelve.open("shelve.db") as db:
+        fingerprints = db.get('fingerprints', {})
+        fingerprints[app_id] = {
+            'contract_name' : contract_name,
+            'approval' : compiled['approval'],
+            'clear' : compiled['clear'],
+            'methods' : signatures(spec),
+        }
+        db['fingerprints'] = fingerprints
+    with _versions_lock:
+        _versions[app_id] = compiled['approval'][:16]
+
+
+"""
+    Short fingerprint of the approval program deployed by us under `app_id`
+    ('' if unknown). Read from shelve.db once, then from memory: it's in the
+    keys of the caches of budget.py and resources.py, computed at every call
+"""
+def version(app_id):
+    with _versions_lock:
+        if app_id not in _versions:
+            with shelve.open("shelve.db") as db:
+                _versions[app_id] = db.get('fingerprints', {}).get(app_id, {}).get('approval', '')[:16]
+        return _versions[app_id]
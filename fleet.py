@@ -0,0 +1,304 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Contract fleet: many app ids of the same contract, sharded by key
+
+    One app has a limited throughput and a limited MBR/box budget. A fleet
+    spreads the state over many instances of the same contract. The registry
+    is in shelve.db:
+
+        'fleet' : {contract_name: {'apps': [app_id, ...], 'routes': {method: arg name}}}
+
+    Each call is routed to one app by the hash of its key: the argument named
+    in 'routes' for the method, the sender otherwise (ie: the depositor of
+    personal_bank, so all the deposits and withdrawals of an account go to the
+    same app). Routing is rendezvous hashing: adding an app moves only the
+    keys that go to the new one.
+
+    interactive.py and test_template.py route their method calls when the
+    fleet of the contract has more than one app. Reads can be fanned out to
+    all the apps at the same time and their results aggregated.
+
+        python fleet.py list
+        python fleet.py add APP_ID | remove APP_ID
+        python fleet.py deploy N                    (N more apps, see deploy.py)
+        python fleet.py route METHOD ARG_NAME       (route METHOD by ARG_NAME)
+        python fleet.py which KEY [METHOD]          (app of a key, of an arg of METHOD)
+        python fleet.py state                       (global state of all the apps)
+----------------------------------------------------------------------------------------------------
+'''
+
+import sys
+import shelve
+import hashlib
+from   concurrent.futures import ThreadPoolExecutor
+
+import sdk
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Apps read at the same time by `fan_out`
+fan_out_workers     = 16
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Registry
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Fleet of `contract_name` {'apps': [...], 'routes': {...}} (empty if none)
+"""
+def load(contract_name):
+    with shelve.open("shelve.db") as db:
+        entry = db.get('fleet', {}).get(contract_name, {})
+    return {'apps': list(entry.get('apps', [])), 'routes': dict(entry.get('routes', {}))}
+
+
+def _save(contract_name, entry):
+    with shelve.open("shelve.db") as db:
+        fleets = db.get('fleet', {})
+        fleets[contract_name] = entry
+        db['fleet'] = fleets
+
+
+def add(contract_name, app_id):
+    entry = load(contract_name)
+    if app_id not in entry['apps']:
+        entry['apps'].append(app_id)
+        _save(contract_name, entry)
+    return entry
+
+
+def remove(contract_name, app_id):
+    entry = load(contract_name)
+    if app_id in entry['apps']:
+        entry['apps'].remove(app_id)
+        _save(contract_name, entry)
+    return entry
+
+
+"""
+    Route the calls of `method` by its argument `arg_name` (None: by sender)
+"""
+def set_route(contract_name, method, arg_name):
+    entry = load(contract_name)
+    if arg_name == None:
+        entry['routes'].pop(method, None)
+    else:
+        entry['routes'][method] = arg_name
+    _save(contract_name, entry)
+    return entry
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Routing
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Bytes of a routing key: the same key always gives the same bytes
+    `arg_type` is the ABI type of the argument the key comes from: an
+    integer typed as a string (command line, interactive.py) is the same
+    key as the integer
+"""
+def key_bytes(key, arg_type=None):
+    if arg_type != None and arg_type.startswith('uint') and isinstance(key, str):
+        key = int(key)
+    if isinstance(key, bytes):
+        return key
+    if isinstance(key, int):
+        return key.to_bytes(8, 'big')
+    return str(key).encode()
+
+
+"""
+    App of `key` among `apps` (rendezvous hashing: the app with the highest
+    hash of key + app id)
+"""
+def shard(apps, key):
+    kb = key_bytes(key)
+    return max(apps, key=lambda a: hashlib.sha256(kb + a.to_bytes(8, 'big')).digest())
+
+
+class Fleet:
+    def __init__(self, algorand_client, contract_name, client_class=None, entry=None):
+        entry = entry or load(contract_name)
+        if not entry['apps']:
+            raise ValueError(f"no app in the fleet of {contract_name}")
+        self.algorand_client = algorand_client
+        self.contract_name = contract_name
+        self.client_class = client_class
+        self.apps = entry['apps']
+        self.routes = entry['routes']
+        self.clients = {}
+
+    def __len__(self):
+        return len(self.apps)
+
+    """
+        Routing key of a call (bytes): the argument of the method named in
+        the routes, the sender otherwise
+        `args` are the method arguments, `arg_names` and `arg_types` their
+        names and types in the ABI
+    """
+    def key(self, method, args, arg_names, sender, arg_types=None):
+        arg_name = self.routes.get(method)
+        if arg_name in arg_names and arg_names.index(arg_name) < len(args):
+            n = arg_names.index(arg_name)
+            return key_bytes(args[n], arg_types[n] if arg_types else None)
+        return key_bytes(sender)
+
+    """
+        App id of a call
+    """
+    def route(self, method, args, arg_names, sender, arg_types=None):
+        return shard(self.apps, self.key(method, args, arg_names, sender, arg_types))
+
+    """
+        Typed app client of `app_id` (created once)
+    """
+    def client(self, app_id):
+        if app_id not in self.clients:
+            self.clients[app_id] = self.algorand_client.client.get_typed_app_client_by_id(self.client_class, app_id=app_id)
+        return self.clients[app_id]
+
+    ## ---------------------------------------------------------------- fan-out
+
+    """
+        fn(app_id) on all the apps at the same time
+        Returns {app_id: result} (the exception if it failed)
+    """
+    def fan_out(self, fn, workers=None):
+        def safe(app_id):
+            try:
+                return fn(app_id)
+            except Exception as e:
+                return e
+        with ThreadPoolExecutor(max_workers=workers or min(fan_out_workers, len(self.apps))) as pool:
+            return dict(zip(self.apps, pool.map(safe, self.apps)))
+
+    """
+        Global state of all the apps, aggregated (see `aggregate`)
+    """
+    def global_state(self):
+        def read(app_id):
+            return {k: v.value for k, v in self.algorand_client.app.get_global_state(app_id).items()}
+        return aggregate(self.fan_out(read))
+
+    """
+        Number of boxes of each app and in total
+    """
+    def box_counts(self):
+        counts = self.fan_out(lambda app_id: len(self.algorand_client.app.get_box_names(app_id)))
+        return aggregate({a: {'boxes': c} if isinstance(c, int) else c for a, c in counts.items()})
+
+
+"""
+    Aggregate {app_id: {key: value}} of the shards:
+    integers are summed, the other values are listed per app
+    Returns ({key: total or {app_id: value}}, {app_id: exception})
+"""
+def aggregate(results):
+    total = {}
+    errors = {}
+    for app_id, values in results.items():
+        if isinstance(values, Exception):
+            errors[app_id] = values
+            continue
+        for k, v in values.items():
+            if isinstance(v, int) and not isinstance(v, bool):
+                total[k] = total.get(k, 0) + v
+            else:
+                total.setdefault(k, {})[app_id] = v
+    return total, errors
+
+
+"""
+    Fleet of the contract if it has more than one app, None otherwise
+    (a single app is the plain `app_id` of shelve.db)
+"""
+def for_contract(algorand_client, contract_name, client_class):
+    entry = load(contract_name)
+    if len(entry['apps']) < 2:
+        return None
+    return Fleet(algorand_client, contract_name, client_class, entry)
+
+
+"""________________________________________________________________________
+
+   MAIN
+"""
+
+def main():
+    with shelve.open("shelve.db") as db:
+        contract_name = db.get('contract_name')
+        app_id = db.get('app_id')
+    if contract_name == None:
+        print("❌ No contract in shelve.db: deploy first")
+        exit(3501)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+
+    ## The app of shelve.db is the first of the fleet
+    if app_id != None and not load(contract_name)['apps']:
+        add(contract_name, app_id)
+
+    match command:
+        case 'list':
+            pass
+        case 'add':
+            add(contract_name, int(sys.argv[2]))
+        case 'remove':
+            remove(contract_name, int(sys.argv[2]))
+        case 'route':
+            set_route(contract_name, sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+        case 'which':
+            ## The key of a method routed by an argument has the type of the argument
+            entry = load(contract_name)
+            arg_type = None
+            if len(sys.argv) > 3 and sys.argv[3] in entry['routes']:
+                import abi_index
+                method = abi_index.load(f"{contract_name}.arc56.json")['methods'][sys.argv[3]]
+                arg_type = method['arg_types'][method['arg_names'].index(entry['routes'][sys.argv[3]])]
+            print(f"🔹 {sys.argv[2]} -> app {shard(entry['apps'], key_bytes(sys.argv[2], arg_type))}")
+            return
+        case 'deploy':
+            import deploy
+            deploy.load_config()
+            deploy.connect()
+            for n in range(int(sys.argv[2])):
+                print(f"\n📦 Fleet app {n + 1}/{sys.argv[2]}")
+                deploy.deploy(force=True)
+                add(contract_name, deploy.app_id)
+        case 'state':
+            import network
+            with shelve.open("shelve.db") as db:
+                algorand_client = network.algorand_client(db['algod_address'], db['algod_token'])
+            fleet = Fleet(algorand_client, contract_name)
+            total, errors = fleet.global_state()
+            for k, v in total.items():
+                print(f"🔹 {k}: {v}")
+            for a, e in errors.items():
+                print(f"🔴 app {a}: {e}")
+            return
+        case _:
+            print("❌ Usage: fleet.py list|add|remove|deploy|route|which|state")
+            exit(3502)
+
+    entry = load(contract_name)
+    print(f"🟢 Fleet of {contract_name}: {len(entry['apps'])} apps")
+    for a in entry['apps']:
+        print(f"🔹 {a}")
+    for method, arg_name in entry['routes'].items():
+        print(f"🔀 {method} routed by {arg_name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,7 @@
 # private_key, address = generate_account()
 
 import shelve
-from   algokit_utils.algorand import AlgorandClient
+import sdk
 
 ## Check if an address is already there
 with shelve.open("shelve.db") as db:
@@ -22,7 +22,7 @@ with shelve.open("shelve.db") as db:
 # Create an algorand client from environment
 # we don't care about a proper client with proper connection
 # since we just want a random account that can work on any net.
-algorand = AlgorandClient.from_environment()
+algorand = sdk.AlgorandClient.from_environment()
 signer = algorand.account.random()
 
 print("🟢 New Private key: ", signer.private_key)
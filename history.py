@@ -0,0 +1,273 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Transaction history and analytics of a deployed app
+
+    Streams all the application calls of the app (the `app_id` of shelve.db
+    by default) from the indexer (see indexer.py), decodes the ABI method of
+    each call from its selector and its return value from its last log, with
+    the method index of the ARC-56 spec (see abi_index.py), and aggregates:
+
+    - per method    : calls, decoded returns, min/max/sum of integer returns
+                      (at most `max_unknown` selectors not in the ABI have
+                      their own entry, the others are counted as `UNKNOWN`)
+    - per sender    : calls (the top `max_senders`, see below)
+    - per round     : calls per bucket of `round_bucket` rounds
+
+    Pages already fetched are cached in `.history_{app_id}/` (per indexer and
+    chain): only the last page and the new ones are asked again to the indexer. Only one page is in
+    memory at a time and the aggregates are bounded: the senders are counted
+    in a table of at most `max_senders` entries (the least active ones are
+    dropped when it's full, so the counts of the top senders are lower
+    bounds), the rounds are grouped in buckets.
+
+        python history.py [app_id] [--min-round N] [--max-round N] [--show] [--top N]
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import json
+import base64
+import shelve
+import hashlib
+import argparse
+from   pathlib import Path
+
+import abi_index
+import indexer
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Max senders counted, the least active are dropped beyond it
+max_senders         = 10_000
+
+## Rounds grouped in one bucket of the per round aggregate
+round_bucket        = 1_000
+
+## Selectors not in the ABI with their own entry: anyone can send any first
+## app arg, one entry each would make the table grow without bound
+max_unknown         = 256
+
+## Method of the calls of the other unknown selectors
+UNKNOWN             = '(unknown)'
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    ABI decoding
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Compact form of the calls to `app_id` in an indexer transaction (inner ones too)
+    [round, sender, first app arg, last log] (base64 or None)
+"""
+def compact(txn, app_id):
+    calls = []
+    appl = txn.get('application-transaction')
+    if appl and (appl['application-id'] or txn.get('created-application-index')) == app_id:
+        args = appl.get('application-args') or [None]
+        logs = txn.get('logs') or [None]
+        calls.append([txn['confirmed-round'], txn['sender'], args[0], logs[-1]])
+    for inner in txn.get('inner-txns', []):
+        inner.setdefault('confirmed-round', txn['confirmed-round'])
+        calls.extend(compact(inner, app_id))
+    return calls
+
+
+"""
+    (method name, decoded return) of a compact call
+    The name is '(bare)' for bare calls, the selector in hex if not in the
+    method index (see abi_index.py). The return is None if there is none
+"""
+def decode(call, index):
+    _, _, arg, log = call
+    if not arg:
+        return '(bare)', None
+    selector = base64.b64decode(arg)[:4]
+    name = index['selectors'].get(selector)
+    if name == None:
+        return selector.hex(), None
+    try:
+        value = abi_index.decode_return(index['methods'][name], base64.b64decode(log) if log else None)
+    except Exception:
+        value = None
+    return name, value
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Page cache
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Cache folder of a query: pages depend on the chain, the app and the round
+    range. App ids are reused across networks and after a localnet reset:
+    the indexer address and the genesis hash of its chain are in the key
+"""
+def cache_dir(app_id, min_round, max_round, chain=''):
+    key = hashlib.sha256(f"{chain}:{min_round}:{max_round}".encode()).hexdigest()[:8]
+    return Path(f".history_{app_id}") / key
+
+
+"""
+    Compact calls of the app, one page at a time
+    Full pages (the ones with a next token) are read from/written to the cache
+"""
+def pages(idx, app_id, min_round=None, max_round=None, refresh=False):
+    folder = cache_dir(app_id, min_round, max_round, f"{idx.address}:{idx.genesis_hash()}")
+    folder.mkdir(parents=True, exist_ok=True)
+    n = 0
+    next_token = None
+    ## Cached pages first
+    while not refresh and (folder / f"{n}.json").exists():
+        with open(folder / f"{n}.json") as f:
+            page = json.load(f)
+        yield page['calls']
+        next_token = page['next']
+        n += 1
+    if n and next_token == None:
+        return
+    ## Then the indexer, from where the cache stops
+    for txns, next_token in idx.app_call_pages(app_id, min_round, max_round, next_token=next_token):
+        calls = [c for t in txns for c in compact(t, app_id)]
+        ## The last page can still grow: it's not cached
+        if next_token != None:
+            tmp = folder / f"{n}.json.tmp"
+            with open(tmp, 'w') as f:
+                json.dump({'calls': calls, 'next': next_token}, f)
+            os.replace(tmp, folder / f"{n}.json")
+        yield calls
+        n += 1
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Aggregates
+----------------------------------------------------------------------------------------------------
+'''
+
+class History:
+    def __init__(self, index):
+        self.index = index
+        self.calls = 0
+        self.per_method = {}
+        self.unknown = 0            ## entries of selectors not in the ABI
+        self.per_sender = {}
+        self.senders_dropped = 0
+        self.per_round = {}
+        self.first_round = None
+        self.last_round = None
+
+    """
+        Keep the most active half of the senders when the table is full
+    """
+    def _trim_senders(self):
+        ranked = sorted(self.per_sender.items(), key=lambda s: s[1], reverse=True)
+        keep = ranked[:max_senders // 2]
+        self.senders_dropped += len(ranked) - len(keep)
+        self.per_sender = dict(keep)
+
+    def add(self, call):
+        rnd, sender = call[0], call[1]
+        name, value = decode(call, self.index)
+        self.calls += 1
+
+        if name not in self.per_method and name != '(bare)' and name not in self.index['methods']:
+            if self.unknown >= max_unknown:
+                name = UNKNOWN
+            else:
+                self.unknown += 1
+        m = self.per_method.setdefault(name, {'calls': 0, 'returns': 0, 'min': None, 'max': None, 'sum': 0})
+        m['calls'] += 1
+        if value != None:
+            m['returns'] += 1
+            if isinstance(value, int) and not isinstance(value, bool):
+                m['min'] = value if m['min'] == None else min(m['min'], value)
+                m['max'] = value if m['max'] == None else max(m['max'], value)
+                m['sum'] += value
+
+        self.per_sender[sender] = self.per_sender.get(sender, 0) + 1
+        if len(self.per_sender) > max_senders:
+            self._trim_senders()
+
+        bucket = rnd - rnd % round_bucket
+        self.per_round[bucket] = self.per_round.get(bucket, 0) + 1
+        self.first_round = rnd if self.first_round == None else min(self.first_round, rnd)
+        self.last_round = rnd if self.last_round == None else max(self.last_round, rnd)
+        return name, value
+
+    def show(self, top=10):
+        print(f"\n🔹 {self.calls} calls, rounds {self.first_round} - {self.last_round}")
+        print(f"\n{'method':<30}{'calls':>10}{'returns':>10}{'min':>14}{'max':>14}{'sum':>16}")
+        for name, m in sorted(self.per_method.items(), key=lambda x: -x[1]['calls']):
+            stats = [f"{m[k]:>14}" if m[k] != None else f"{'-':>14}" for k in ('min', 'max')]
+            print(f"{name:<30}{m['calls']:>10}{m['returns']:>10}{''.join(stats)}{m['sum'] if m['min'] != None else '-':>16}")
+        print(f"\n{'sender':<60}{'calls':>10}")
+        for sender, count in sorted(self.per_sender.items(), key=lambda s: -s[1])[:top]:
+            print(f"{sender:<60}{count:>10}")
+        if self.senders_dropped:
+            print(f"🟨 {self.senders_dropped} less active senders not counted")
+        print(f"\n{'rounds':<30}{'calls':>10}")
+        for bucket in sorted(self.per_round)[-top:]:
+            print(f"{f'{bucket} - {bucket + round_bucket - 1}':<30}{self.per_round[bucket]:>10}")
+
+
+"""________________________________________________________________________
+
+   MAIN
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description="Application calls history of a deployed app")
+    parser.add_argument('app_id', nargs='?', type=int)
+    parser.add_argument('--min-round', type=int)
+    parser.add_argument('--max-round', type=int)
+    parser.add_argument('--show', action='store_true', help="print each call")
+    parser.add_argument('--top', type=int, default=10, help="senders and round buckets shown")
+    parser.add_argument('--refresh', action='store_true', help="ignore the cached pages")
+    opts = parser.parse_args()
+
+    with shelve.open("shelve.db") as db:
+        app_id = opts.app_id or db.get('app_id')
+        contract_name = db.get('contract_name')
+    if app_id == None:
+        print("❌ No app_id in shelve.db: deploy first or give one")
+        exit(3301)
+
+    idx = indexer.connect()
+    if idx == None:
+        print("❌ No indexer for this network: run set_network.py")
+        exit(3302)
+
+    ## Without the spec the calls are still counted, by selector
+    index = {'methods': {}, 'selectors': {}}
+    spec_file = Path(f"{contract_name}.arc56.json")
+    if contract_name and spec_file.exists():
+        index = abi_index.load(spec_file)
+    else:
+        print("🟨 No ARC-56 spec found: methods are not decoded")
+
+    print(f"🕓 History of app {app_id}")
+    history = History(index)
+    try:
+        for calls in pages(idx, app_id, opts.min_round, opts.max_round, opts.refresh):
+            for call in calls:
+                name, value = history.add(call)
+                if opts.show:
+                    print(f"🔹 {call[0]:>10}  {call[1]}  {name}" + (f" -> {value}" if value != None else ''))
+    except indexer.IndexerError as e:
+        print(f"❌ {e}")
+        exit(3303)
+    history.show(opts.top)
+    print("\n🏁 Done")
+
+
+if __name__ == '__main__':
+    main()
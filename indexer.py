@@ -0,0 +1,235 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Indexer query layer
+
+    Heavy historical and range queries (all the calls of an app, its logs,
+    all its boxes...) go to the indexer of the network ('indexer_address' in
+    shelve.db, see set_network.py), not to algod: algod only keeps the
+    current state and the last rounds, and the free nodes throttle long scans.
+
+    Every query is paged with the indexer `next` token: `pages()` yields one
+    page at a time with the token of the next one, so a caller can stop,
+    save the token and go on later, and never holds more than one page.
+    Requests wait for the rate limiter of the indexer (see ratelimit.py) and
+    are sent again when it throttles (429/5xx).
+
+        python indexer.py calls [app_id] [min_round] [max_round]
+        python indexer.py logs  [app_id]
+        python indexer.py boxes [app_id]
+
+    Without app_id the one in shelve.db is used.
+----------------------------------------------------------------------------------------------------
+'''
+
+import sys
+import json
+import time
+import shelve
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import network
+import ratelimit
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Items per page (max allowed by the indexer: 1000)
+page_size           = 1000
+
+## Timeout (seconds) of a request
+request_timeout     = 30
+
+## Times a throttled request is sent again
+max_retries         = 5
+
+## HTTP status codes meaning "slow down and try again"
+RETRY_CODES         = (429, 500, 502, 503, 504)
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Indexer
+----------------------------------------------------------------------------------------------------
+'''
+
+class IndexerError(Exception):
+    def __init__(self, msg, code=None):
+        super().__init__(msg)
+        self.code = code
+
+
+class Indexer:
+    def __init__(self, address, token=''):
+        self.address = address.rstrip('/')
+        self.token = token
+        self.limiter = ratelimit.limiter(self.address)
+
+    def _send(self, url):
+        req = urllib.request.Request(url, headers={'X-Indexer-API-Token': self.token} if self.token else {})
+        with urllib.request.urlopen(req, timeout=request_timeout) as resp:
+            return json.loads(resp.read())
+
+    """
+        GET `path` (ie: '/v2/transactions') with `params`, returns the json answer
+    """
+    def get(self, path, params=None):
+        params = {k: v for k, v in (params or {}).items() if v != None}
+        url = self.address + path + ('?' + urllib.parse.urlencode(params) if params else '')
+        for attempt in range(max_retries + 1):
+            self.limiter.acquire()
+            start_time = time.perf_counter()
+            try:
+                result = self._send(url)
+            except urllib.error.HTTPError as e:
+                throttled = e.code in RETRY_CODES
+                self.limiter.release(throttled=throttled)
+                if not throttled or attempt == max_retries:
+                    raise IndexerError(f"{path}: {e.code} {e.reason}", e.code)
+                continue
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                self.limiter.release(throttled=True)
+                if attempt == max_retries:
+                    raise IndexerError(f"{path}: {e}")
+                continue
+            self.limiter.release(time.perf_counter() - start_time)
+            return result
+
+    """
+        Pages of the `key` list of `path`: yields (items, next token)
+        Starts at `next_token` (one returned before) if given
+        The next token is None on the last page
+    """
+    def pages(self, path, key, params=None, next_token=None):
+        params = dict(params or {}, limit=page_size)
+        while True:
+            page = self.get(path, dict(params, next=next_token))
+            items = page.get(key, [])
+            ## The last page may have a token too: an empty page is the end
+            next_token = page.get('next-token') if items else None
+            yield items, next_token
+            if next_token == None:
+                return
+
+    """
+        All the items of `key` of `path`, one page in memory at a time
+    """
+    def items(self, path, key, params=None):
+        for items, _ in self.pages(path, key, params):
+            yield from items
+
+    ## ---------------------------------------------------------------- queries
+
+    def health(self):
+        return self.get('/health')
+
+    """
+        Genesis hash (base64) of the chain of the indexer, None if it has no
+        transaction yet. It changes with the network and on a localnet reset
+    """
+    def genesis_hash(self):
+        txns = self.get('/v2/transactions', {'limit': 1})['transactions']
+        return txns[0].get('genesis-hash') if txns else None
+
+    """
+        Application call transactions of `app_id` (inner ones included in their parent)
+        Pages of (transactions, next token), oldest first
+    """
+    def app_call_pages(self, app_id, min_round=None, max_round=None, sender=None, next_token=None):
+        params = {
+            'application-id'    : app_id,
+            'tx-type'           : 'appl',
+            'min-round'         : min_round,
+            'max-round'         : max_round,
+            'address'           : sender,
+            'address-role'      : 'sender' if sender else None,
+        }
+        return self.pages('/v2/transactions', 'transactions', params, next_token)
+
+    def app_calls(self, app_id, min_round=None, max_round=None, sender=None):
+        for txns, _ in self.app_call_pages(app_id, min_round, max_round, sender):
+            yield from txns
+
+    """
+        Logs of `app_id`: {'txid', 'logs': [base64]}
+    """
+    def app_logs(self, app_id, min_round=None, max_round=None):
+        params = {'min-round': min_round, 'max-round': max_round}
+        return self.items(f'/v2/applications/{app_id}/logs', 'log-data', params)
+
+    """
+        Names (base64) of all the boxes of `app_id`
+    """
+    def box_names(self, app_id):
+        for box in self.items(f'/v2/applications/{app_id}/boxes', 'boxes'):
+            yield box['name']
+
+    """
+        The application as the indexer knows it (created-at-round, deleted...)
+    """
+    def app_info(self, app_id):
+        return self.get(f'/v2/applications/{app_id}', {'include-all': 'true'})['application']
+
+
+"""
+    The Indexer of the selected network, None if it has none
+"""
+def connect():
+    indexer = network.endpoint('indexer')
+    return Indexer(*indexer) if indexer else None
+
+
+"""________________________________________________________________________
+
+   MAIN
+"""
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('calls', 'logs', 'boxes'):
+        print("❌ Usage: indexer.py calls|logs|boxes [app_id] [min_round] [max_round]")
+        exit(3201)
+
+    idx = connect()
+    if idx == None:
+        print("❌ No indexer for this network: run set_network.py")
+        exit(3202)
+
+    if len(sys.argv) > 2:
+        app_id = int(sys.argv[2])
+    else:
+        with shelve.open("shelve.db") as db:
+            app_id = db.get('app_id')
+        if app_id == None:
+            print("❌ No app_id in shelve.db: deploy first or give one")
+            exit(3203)
+    rounds = [int(r) for r in sys.argv[3:5]] + [None, None]
+
+    count = 0
+    try:
+        match sys.argv[1]:
+            case 'calls':
+                for txn in idx.app_calls(app_id, rounds[0], rounds[1]):
+                    count += 1
+                    print(f"🔹 {txn['confirmed-round']:>10}  {txn['id']}  {txn['sender']}")
+            case 'logs':
+                for log in idx.app_logs(app_id, rounds[0], rounds[1]):
+                    count += 1
+                    print(f"🔹 {log['txid']}  {log['logs']}")
+            case 'boxes':
+                for name in idx.box_names(app_id):
+                    count += 1
+                    print(f"📦 {name}")
+    except IndexerError as e:
+        print(f"❌ {e}")
+        exit(3204)
+    print(f"🏁 {count} {sys.argv[1]} of app {app_id}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,19 +4,16 @@ import shelve
 import os
 import json
 import importlib
+import timeit
 from   pathlib import Path
 
-from   algosdk.v2client.algod import AlgodClient
-from   algokit_utils.algorand import AlgorandClient, \
-                                    AlgoClientConfigs, \
-                                    AlgoClientNetworkConfig
-from   algokit_utils import CommonAppCallParams, \
-                            AlgoAmount, \
-                            SigningAccount
+import sdk
 
 from helpers import print_module_contents, \
                     print_object_contents, \
                     cls
+from tx_archive import record_result_safe
+import network
 
 '''
 ----------------------------------------------------------------------------------------------------    
@@ -121,7 +118,7 @@ else:
     client_object = importlib.import_module(client_module.replace('.py',''))
 
 ## Check that account is correct
-signer = SigningAccount(private_key=private_key)
+signer = sdk.SigningAccount(private_key=private_key)
 if address != signer.address:
     print("❌ Private key and address dont' match")
     exit(2003)
@@ -137,17 +134,7 @@ if address != signer.address:
 
 ## Connect to Algorand net via client
 try:
-    # Define a network endpoint
-    algo_net =AlgoClientNetworkConfig(
-            server=algod_address,
-            token=algod_token
-    )
-    # Use network entpoint to define the client
-    algorand_client = AlgorandClient(AlgoClientConfigs(
-        algod_config = algo_net,
-        indexer_config = algo_net,
-        kmd_config = algo_net
-    ))
+    algorand_client = network.algorand_client(algod_address, algod_token)
 except Exception as e:
     print("💩 ", e)
     print("❌ Could not connet! Quitting")
@@ -214,24 +201,27 @@ app_client = algorand_client.client.get_typed_app_client_by_id(client_object.Hel
 # print_object_contents(app_client)
 
 ## Create the signer that will sign the transaction to the SC
-signer = SigningAccount(private_key=private_key)
+signer = sdk.SigningAccount(private_key=private_key)
 assert signer.address == address
 ## Set the singer into the AccountManager of Algorand Client
 ## this way the outgoing transaction sent by `address` will be authomatically signed
 algorand_client.account.set_signer_from_account(signer)    
 
 ## Send the transaction to the `hello` method of the app
+start_time = timeit.default_timer()
 res = app_client.send.hello(
     # This is the parameter sent to the app method
     client_object.HelloArgs(
         name = "my friend"
     ),
     # These are the parameters needed for the transaction
-    params = CommonAppCallParams(
+    params = sdk.CommonAppCallParams(
             sender= address, 
-            extra_fee=AlgoAmount(micro_algo=0)
+            extra_fee=sdk.AlgoAmount(micro_algo=0)
     )
 )
+## Keep a record of the transaction in the archive (see tx_archive.py)
+record_result_safe(res, method='hello', latency=timeit.default_timer() - start_time)
 
 ## Uncomment the following line to inspect
 # print_object_contents(res)
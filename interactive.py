@@ -8,20 +8,24 @@ import importlib
 import textwrap
 import shutil
 import base64
+import timeit
 from   pathlib import Path
 
-from   algokit_utils.algorand import AlgorandClient, \
-                                    AlgoClientConfigs, \
-                                    AlgoClientNetworkConfig
-from   algokit_utils import CommonAppCallParams, \
-                            SendParams, \
-                            AlgoAmount, \
-                            SigningAccount, \
-                            PaymentParams
+import sdk
 
 from helpers import print_module_contents, \
                     print_object_contents, \
                     cls
+from txn_args import is_txn_arg, \
+                     convert_method_args
+from tx_archive import record_result_safe
+from tracing import span
+import network
+import abi_index
+import budget
+import fleet
+import resources
+import records
 
 '''
 ----------------------------------------------------------------------------------------------------    
@@ -51,6 +55,8 @@ app_address         = None
 signer              = None      ## Account derived from private key that will sign transactions
 abi                 = None      ## ABI object of contract
 methods             = None      ## ABI methods
+method_index        = None      ## Selectors, encoders... of the methods (see abi_index.py)
+shards              = None      ## Fleet of the contract if it has many apps (see fleet.py)
 
 # Generic transactions that can be sent regardless of smart contract methods
 generic_tx          = {
@@ -74,6 +80,9 @@ generic_tx          = {
 # 1_000 for the 1 transactions
 required_balance    = 1_000
 
+## When False the "Press any key" pauses are skipped (ie: when driven by daemon.py)
+interactive_mode    = True
+
 '''
 ----------------------------------------------------------------------------------------------------    
     Helper functions
@@ -93,8 +102,16 @@ def _line():
 def cls():    # Clear console based on the operating system
     if os.name == 'nt':  # For Windows
         os.system('cls')
-    else:  # For Unix/Linux/Mac
-        os.system('clear')
+    else:  # For Unix/Linux/Mac: ANSI clear screen + cursor home, no need to fork `clear`
+        print("\033[2J\033[H", end='', flush=True)
+
+
+"""
+    Wait for the user before going on (only in interactive mode)
+"""
+def _pause(msg="🔻 Press any key to continue"):
+    if interactive_mode:
+        input(msg)
 
 
 '''
@@ -122,6 +139,8 @@ def _init():
     global signer
     global abi
     global methods
+    global method_index
+    global shards
 
     ## Get values from shelves
     with shelve.open("shelve.db") as db:
@@ -188,24 +207,14 @@ def _init():
         client_object = importlib.import_module(client_module.replace('.py',''))
 
     ## Check that account is correct
-    signer = SigningAccount(private_key=private_key)
+    signer = sdk.SigningAccount(private_key=private_key)
     if address != signer.address:
         print("❌ Private key and address dont' match")
         exit(2003)
 
     ## Connect to Algorand net via client
     try:
-        # Define a network endpoint
-        algo_net =AlgoClientNetworkConfig(
-                server=algod_address,
-                token=algod_token
-        )
-        # Use network entpoint to define the client
-        algorand_client = AlgorandClient(AlgoClientConfigs(
-            algod_config = algo_net,
-            indexer_config = algo_net,
-            kmd_config = algo_net
-        ))
+        algorand_client = network.algorand_client(algod_address, algod_token)
     except Exception as e:
         print("💩 ", e)
         print("❌ Could not connet! Quitting")
@@ -227,6 +236,8 @@ def _init():
     with open(abi_file) as f:
         abi = json.loads(f.read())
     methods = abi['methods']
+    ## Built once per version of the ABI file, then read from shelve.db
+    method_index = abi_index.load(abi_file)
 
     ## Check if the app exists
     try:
@@ -240,11 +251,15 @@ def _init():
     ## Get a handler of the deployed HelloWord contract
     client_class = getattr(client_object, contract_name+'Client')
     app_client = algorand_client.client.get_typed_app_client_by_id(client_class , app_id = app_id)
+    ## Many apps of the same contract: the calls are routed by key
+    shards = fleet.for_contract(algorand_client, contract_name, client_class)
+    if shards != None:
+        print(f"🔀 Fleet of {len(shards)} apps: calls are routed by key (see fleet.py)")
     ## Uncomment the following line to inspect
     # print_object_contents(app_client)
 
     ## Create the signer that will sign the transaction to the SC
-    signer = SigningAccount(private_key=private_key)
+    signer = sdk.SigningAccount(private_key=private_key)
     assert signer.address == address
     ## Set the singer into the AccountManager of Algorand Client
     ## this way the outgoing transaction sent by `address` will be authomatically signed
@@ -266,7 +281,6 @@ def _account_info():
 
     account_info = algorand_client.account.get_information(address)
 
-    cls()
     print(f"🚀 Using net:         {algod_address}\tToken: {algod_token}")
     print(f"🔑 Using address:     {address}")
     print(f"   Using private key: {private_key}")
@@ -296,21 +310,22 @@ def _account_info():
 
 
 """
-    Gets the methods of the contract (from the ARC56.json file) and
-    parse them into a dictionary for later convenience
+    Gets the methods of the contract (from the method index of the ARC56.json
+    file) into a dictionary for later convenience
 """
 def _parse_methods():
     global methods
 
     parsed={}
-    for m in methods:
+    for name, entry in method_index['methods'].items():
         signature = {}
-        signature['returns'] = m['returns']['type']
-        signature['args'] = m['args']
-        signature['actions'] = m['actions']
-        parsed[m['name']] = signature
-        if 'desc' in m:
-            signature['desc'] = m['desc']
+        signature['returns'] = entry['returns']
+        signature['args'] = entry['args']
+        signature['actions'] = entry['actions']
+        signature['on_complete'] = entry['on_complete']
+        parsed[name] = signature
+        if entry['desc'] != None:
+            signature['desc'] = entry['desc']
     methods = {**parsed}
 
 
@@ -387,6 +402,8 @@ def _show_methods():
         for a in val['args']:
             if 'desc' in a:
                 print(f"    \t🔹 {a['type']}:{a['name']} {a['desc']}")
+            if is_txn_arg(a['type']):
+                print(f"    \t🔸 {a['name']}: pay=<amount>[,<receiver>] axfer=<asset>,<amount>[,<receiver>] appl=<app_id> txn=<type>,...")
     _line()
     print("🟦 Generic tx:")  
     print(f"  🔹 payment (receiver:address, amount:uint64) -> uint64")
@@ -412,24 +429,25 @@ def _tx_output(res):
         print(f"🟧 Abi return:      {res.abi_return}")
     if res_class_name == 'SendSingleTransactionResult' :
         print(f"🟧 Amount:          {res.transactions[0].payment.amt}")
-    if hasattr(res,'confirmation') and hasattr(res.confirmation, 'confirmed-round'):
-        print(f"🟧 Confirmed round: {res.confirmation['confirmed-round']}")
-    print(f"🟧 Transactions     {len(res.transactions)}")
-    for n in range(len(res.transactions)):
-        print(f" 🔶 Tx{n} tx_id:      {lora_link}transaction/{res.tx_ids[n]}")
-        print(f"  🔸  Sender:       {res.confirmations[n]['txn']['txn']['snd']}")
-        if hasattr(res.confirmations[n]['txn']['txn'], 'rcv'):
-            print(f"  🔸  Receiver:     {res.confirmations[n]['txn']['txn']['rcv']}")
-        print(f"  🔸  Type:         {res.confirmations[n]['txn']['txn']['type']}")
-        print(f"  🔸  Fee:          {res.confirmations[n]['txn']['txn']['fee']}")
-        if 'apid' in res.confirmations[n]['txn']['txn']:
-            print(f"  🔸  App ID:       {res.confirmations[n]['txn']['txn']['apid']}")
-        match (res.confirmations[n]['txn']['txn']['type']) :
+    ## Only the values shown are kept, not the whole result (see records.py)
+    recs = records.records(res)
+    print(f"🟧 Confirmed round: {recs[-1].round}")
+    print(f"🟧 Transactions     {len(recs)}")
+    for n, rec in enumerate(recs):
+        print(f" 🔶 Tx{n} tx_id:      {lora_link}transaction/{rec.txid}")
+        print(f"  🔸  Sender:       {rec.sender}")
+        if rec.receiver != None:
+            print(f"  🔸  Receiver:     {rec.receiver}")
+        print(f"  🔸  Type:         {rec.type}")
+        print(f"  🔸  Fee:          {rec.fee}")
+        if rec.app_id != None:
+            print(f"  🔸  App ID:       {rec.app_id}")
+        match rec.type :
             case 'appl':
-                print(f"  🔸  Note:         {res.transactions[0].application_call.note}")
+                print(f"  🔸  Note:         {res.transactions[n].application_call.note}")
 
     print("\n")
-    input(f"✅ Press any key to continue")
+    _pause("✅ Press any key to continue")
 
 
 
@@ -448,7 +466,7 @@ def do_method_tx(sc_method, method_args, txn_args) :
     ## Turn txn_args into a dictionary to ease the creation of CommonAppCallParams class object
     cacp = {}
     cacp['sender'] = address 
-    cacp['extra_fee'] =AlgoAmount(micro_algo=0)
+    cacp['extra_fee'] =sdk.AlgoAmount(micro_algo=0)
     ## To avoid the "transaction is already in ledger" error we tweak the validity rounds
     ## parameter so to have always new transactions
     cacp['first_valid_round'] = last_round
@@ -464,66 +482,101 @@ def do_method_tx(sc_method, method_args, txn_args) :
             arg_value = int(arg_value)
         cacp[arg_key]=arg_value
 
+    ## The app of the call: the one of shelve.db, or the one of its key in the fleet
+    call_app_id, call_client, call_address = app_id, app_client, app_address
+    if shards != None:
+        abi_args = methods[sc_method]['args']
+        call_app_id = shards.route(sc_method, method_args, [a['name'] for a in abi_args], address, [a['type'] for a in abi_args])
+        call_client = shards.client(call_app_id)
+        call_address = sdk.get_application_address(call_app_id)
+        print(f"🔀 Routed to app {call_app_id}")
+
     # Get the method from the relevant part of the class
     # Cross check with the transaction parameter
     app_method = None
     # NoOp
-    if (hasattr(app_client.send, sc_method) and 
+    if (hasattr(call_client.send, sc_method) and 
         (
             not 'on_complete' in cacp.keys()
             or cacp['on_complete'] == 0
         )
     ):
-        app_method = getattr(app_client.send, sc_method)
+        app_method = getattr(call_client.send, sc_method)
     # DeleteApplication
-    elif (hasattr(app_client.send.delete, sc_method) and
+    elif (hasattr(call_client.send.delete, sc_method) and
           'on_complete' in cacp.keys() and
           cacp['on_complete'] == 5
     ):
-        app_method = getattr(app_client.send.delete, sc_method)
+        app_method = getattr(call_client.send.delete, sc_method)
     # OptIn
-    elif (hasattr(app_client.send.opt_in, sc_method) and
+    elif (hasattr(call_client.send.opt_in, sc_method) and
           'on_complete' in cacp.keys() and
           cacp['on_complete'] == 1
     ):
-        app_method = getattr(app_client.send.opt_in, sc_method)
+        app_method = getattr(call_client.send.opt_in, sc_method)
     ## Got method?
     if app_method == None:
         print(f"❌ Method was not called with proper `on_complete` parameter")
         print(f"   Please specify one of the following: {methods[sc_method]['actions']['call']}")
-        input(f"🔻 Press any key to continue")
+        _pause()
         return False
 
     # These are the parameter sent to the app call
     app_call_params={
-        'params' : CommonAppCallParams(**cacp),
+        'params' : sdk.CommonAppCallParams(**cacp),
         # From algokit-utils >= 4.0.0 the followin line will not be necessary
-        'send_params' : SendParams(populate_app_call_resources=True),
+        'send_params' : sdk.SendParams(populate_app_call_resources=True),
     }
 
-    ## Conditionally add the method_args to app call if any
-    if len(method_args) > 0 :
-        # Convert input to proper type
-        args = methods[sc_method]['args']
-        for n in range(len(method_args)) :
-            # which destination type?
-            match args[n]['type']:
-                case 'uint64':
-                    ## If parameter is uint64 turn string -> int
-                    method_args[n] = int(method_args[n])
-
-    ## The client allows to pass the args as a tuple of strings
-    if len(method_args) > 0:
-        app_call_params['args'] = tuple(method_args)
-
     ## Send the transaction
     try :
+        ## Conditionally add the method_args to app call if any
+        ## Convert input to proper type, transaction arguments (pay, axfer...)
+        ## are built here and sent in the same group of the app call
+        if len(method_args) > 0 :
+            method_args = convert_method_args(
+                algorand_client,
+                methods[sc_method]['args'],
+                method_args,
+                sender=address,
+                app_address=call_address
+            )
+            ## The client allows to pass the args as a tuple
+            app_call_params['args'] = tuple(method_args)
+
+        ## Box/account/app references from the patterns of the method: no
+        ## simulate before each send (see resources.py)
+        refs_key, refs = resources.references(algorand_client, call_client, call_app_id, abi, sc_method, cacp, method_args)
+        if refs != None:
+            cacp.update(refs)
+            app_call_params['params'] = sdk.CommonAppCallParams(**cacp)
+            app_call_params['send_params'] = sdk.SendParams(populate_app_call_resources=False)
+
+        ## Methods needing more than 700 opcodes get padding calls in their
+        ## group, with the fees paid by the method call (see budget.py)
+        key = budget.plan_key(call_app_id, sc_method, method_args)
+        params = budget.call_params(call_client, sc_method, cacp, method_args)
+        pads = budget.plan(algorand_client, key, params)
+
         ## Use the spread operator to expand the object as function parameters
-        res = app_method(**app_call_params)
+        start_time = timeit.default_timer()
+        try:
+            with span('send.app_call'):
+                if pads == 0:
+                    res = app_method(**app_call_params)
+                else:
+                    print(f"🔹 Adding {pads} budget padding call(s)")
+                    res = budget.send_padded(algorand_client, params, pads, populate=refs == None)
+        except Exception:
+            ## The cached plans may be wrong: next time they are computed again
+            budget.forget(key)
+            resources.forget(refs_key)
+            raise
+        record_result_safe(res, method=sc_method, latency=timeit.default_timer() - start_time)
         return res
     except Exception as e:
         print(f"❌ {e}")
-        input(f"🔻 Press any key to continue")
+        _pause()
         return False
 
 
@@ -534,17 +587,20 @@ def do_generic_tx(sc_method, method_args, txn_args) :
     global address
     try:
         if sc_method == 'payment' :
-            res = algorand_client.send.payment (
-                PaymentParams(
-                    sender =  address,
-                    receiver = method_args[0],
-                    amount = AlgoAmount(micro_algo=method_args[1])
+            start_time = timeit.default_timer()
+            with span('send.payment'):
+                res = algorand_client.send.payment (
+                    sdk.PaymentParams(
+                        sender =  address,
+                        receiver = method_args[0],
+                        amount = sdk.AlgoAmount(micro_algo=method_args[1])
+                    )
                 )
-            )
+            record_result_safe(res, method=sc_method, latency=timeit.default_timer() - start_time)
             return res
     except Exception as e:
         print(f"❌ {e.message or e}")
-        input(f"🔻 Press any key to continue")
+        _pause()
     return False
 
 
@@ -572,16 +628,16 @@ def _check_sel(sc_method, method_args, txn_args):
         # Check if supplied parameters are in the right number
         if len(methods[sc_method]['args']) != len(method_args):
             print(f"🔺 Please supply right number of parameters: {len(methods[sc_method]['args'])}")
-            input(f"🔻 Press any key to continue")
+            _pause()
             return False
     elif sc_method in generic_tx.keys():
         if len(generic_tx[sc_method]['args']) != len(method_args):
             print(f"🔺 Please supply right number of parameters: {len(generic_tx[sc_method]['args'])}")
-            input(f"🔻 Press any key to continue")
+            _pause()
             return False
     else :
         print(f"🔺 {sc_method} is not a valid method/transaction")
-        input(f"🔻 Press any key to continue")
+        _pause()
         return False
 
     # Check Txn_params
@@ -591,7 +647,7 @@ def _check_sel(sc_method, method_args, txn_args):
         arg_value = re.sub('^.*:','', txn_a)
         if not arg_key in allowed_params:
             print(f"🔺 {arg_key} is not a valid transaction parameterset_l ")
-            input(f"🔻 Press any key to continue")
+            _pause()
             return False
         
         if arg_key == 'on_complete':
@@ -599,7 +655,12 @@ def _check_sel(sc_method, method_args, txn_args):
             arg_value = int(arg_value)
             if arg_value < 0 or arg_value > 5 :
                 print(f"🔺 {arg_value} is not a valid integer in 0..5 ")
-                input(f"🔻 Press any key to continue")
+                _pause()
+                return False
+            ## Allowed actions of the method, from the method index
+            if sc_method in methods and arg_value not in methods[sc_method]['on_complete']:
+                print(f"🔺 {sc_method} allows on_complete {methods[sc_method]['on_complete']} ({', '.join(methods[sc_method]['actions']['call'])})")
+                _pause()
                 return False
 
     return True
@@ -626,8 +687,10 @@ def _input():
 def _loop():
     sel = True
     while sel != False:
-        _account_info()
-        _show_app_details()
+        cls()
+        with span('ui.refresh'):
+            _account_info()
+            _show_app_details()
         _show_methods()
         sel = _input()
         if not sel:
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Multi-signer key manager
+
+    Holds any number of named signing accounts and registers each of them in
+    the account manager of the AlgorandClient, so transactions sent by any of
+    their addresses are signed automatically.
+
+    Accounts are kept in a tuple (index -> account) plus two dictionaries
+    (name -> index, address -> index). Lookups never take a lock: every change
+    builds new containers and swaps them in one assignment (copy on write), so
+    readers from threads or asyncio tasks always see a consistent snapshot.
+    Resolving a signer is O(1) whatever the number of accounts.
+----------------------------------------------------------------------------------------------------
+'''
+
+import threading
+
+
+class KeyManager:
+    def __init__(self, algorand_client):
+        self._algorand_client = algorand_client
+        self._lock = threading.Lock()
+        ## (accounts, by_name, by_address) replaced as a whole on every change
+        self._index = ((), {}, {})
+
+    """
+        Add a SigningAccount with a name and register it in the AlgorandClient
+        If the name already exists the known account is kept
+        Returns the index of the account
+    """
+    def add(self, name, account):
+        with self._lock:
+            accounts, by_name, by_address = self._index
+            if name in by_name:
+                return by_name[name]
+            self._algorand_client.account.set_signer_from_account(account)
+            n = len(accounts)
+            self._index = (
+                accounts + (account,),
+                {**by_name, name: n},
+                {**by_address, account.address: n},
+            )
+            return n
+
+    """
+        Add many (name, SigningAccount) pairs at once: one single swap
+        instead of one per account (use it to load thousands of actors)
+    """
+    def add_many(self, named_accounts):
+        with self._lock:
+            accounts, by_name, by_address = self._index
+            accounts = list(accounts)
+            by_name = dict(by_name)
+            by_address = dict(by_address)
+            for name, account in named_accounts:
+                if name in by_name:
+                    continue
+                self._algorand_client.account.set_signer_from_account(account)
+                by_name[name] = len(accounts)
+                by_address[account.address] = len(accounts)
+                accounts.append(account)
+            self._index = (tuple(accounts), by_name, by_address)
+
+    """
+        Create a random account with the given name (or return the existing one)
+    """
+    def random(self, name):
+        accounts, by_name, _ = self._index
+        if name in by_name:
+            return accounts[by_name[name]]
+        self.add(name, self._algorand_client.account.random())
+        return self.get(name)
+
+    """
+        Get the SigningAccount by name, address or index
+        Returns None if not found
+    """
+    def get(self, key):
+        accounts, by_name, by_address = self._index
+        if isinstance(key, int):
+            return accounts[key] if 0 <= key < len(accounts) else None
+        n = by_name.get(key)
+        if n == None:
+            n = by_address.get(key)
+        return None if n == None else accounts[n]
+
+    """
+        Address of a named account (None if not found)
+    """
+    def address(self, name):
+        account = self.get(name)
+        return account.address if account else None
+
+    """
+        Transaction signer of an account (None if not found)
+    """
+    def signer(self, key):
+        account = self.get(key)
+        return account.signer if account else None
+
+    def names(self):
+        return list(self._index[1].keys())
+
+    """
+        {name: {'private_key', 'address'}} as stored by test_template.py
+    """
+    def as_dict(self):
+        accounts, by_name, _ = self._index
+        return {
+            name: {'private_key': accounts[n].private_key, 'address': accounts[n].address}
+            for name, n in by_name.items()
+        }
+
+    def __contains__(self, key):
+        return self.get(key) != None
+
+    def __len__(self):
+        return len(self._index[0])
@@ -0,0 +1,353 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Deterministic bulk keystore
+
+    Load tests need thousands of accounts, shelve.db holds one. The keystore
+    derives any number of accounts from one 32 bytes master seed (shown as a
+    25 words mnemonic, like the kmd master derivation key):
+
+        seed(i) = HMAC-SHA512(master, "keystore" + i)[:32]      (ed25519 seed)
+
+    so the same mnemonic always gives the same accounts, and the file can be
+    created again anywhere. Keys are derived (and encrypted) in parallel
+    across the cores, and stored in a compact file of fixed size records:
+
+        header      : MAGIC, version, flags, count, kdf ops, kdf mem, salt (48 bytes)
+        record i    : public key (32) + seed (32)                   plain
+                      public key (32) + nonce (24) + box(seed) (48)  encrypted
+
+    Record `i` is at `header + i * record size`: one account is read without
+    reading the others, and the addresses (public keys) are in clear to fund
+    the accounts without the password. With a password the seeds are
+    encrypted (NaCl SecretBox, key from Argon2id). The seeds in use are kept
+    in a memory locked buffer (mlock, not swapped to disk) zeroed by `close()`.
+    Only this buffer is locked: the plaintext returned by the decryption and
+    the keys given to algosdk (private_key, account) are ordinary Python
+    objects, neither locked nor zeroed.
+
+        python keystore.py create FILE --count N [--mnemonic "..."] [--encrypt] [--workers N]
+        python keystore.py list FILE [--first N] [--count N]
+
+    The password is asked, or read from the ALGO_KEYSTORE_PASSWORD variable.
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import hmac
+import time
+import base64
+import ctypes
+import struct
+import getpass
+import hashlib
+import argparse
+from   concurrent.futures import ProcessPoolExecutor
+
+import nacl.pwhash
+import nacl.secret
+import nacl.signing
+
+import sdk
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+MAGIC               = b'ALGOKEY1'
+FILE_VERSION        = 1
+HEADER              = struct.Struct('>8sHHIQQ16s')
+
+## Flags of the header
+ENCRYPTED           = 1
+
+RECORD_PLAIN        = 64
+RECORD_ENCRYPTED    = 32 + nacl.secret.SecretBox.NONCE_SIZE + 32 + nacl.secret.SecretBox.MACBYTES
+
+## Accounts derived per task sent to the process pool
+chunk_size          = 1_000
+
+PASSWORD_ENV        = 'ALGO_KEYSTORE_PASSWORD'
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Derivation (runs inside the worker processes)
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    ed25519 seed of the account `index` of `master`
+"""
+def derive_seed(master, index):
+    return hmac.new(master, b'keystore' + index.to_bytes(8, 'big'), hashlib.sha512).digest()[:32]
+
+
+"""
+    Records of the accounts from `first` to `first+count`
+    Encrypted with the SecretBox key `box_key` if given
+"""
+def derive_chunk(master, first, count, box_key=None):
+    box = nacl.secret.SecretBox(box_key) if box_key else None
+    records = []
+    for n in range(first, first + count):
+        seed = derive_seed(master, n)
+        public_key = bytes(nacl.signing.SigningKey(seed).verify_key)
+        records.append(public_key + (bytes(box.encrypt(seed)) if box else seed))
+    return b''.join(records)
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Master seed and password
+----------------------------------------------------------------------------------------------------
+'''
+
+def new_master():
+    return os.urandom(32)
+
+
+def to_mnemonic(master):
+    return sdk.mnemonic.from_master_derivation_key(base64.b64encode(master).decode())
+
+
+def from_mnemonic(words):
+    return base64.b64decode(sdk.mnemonic.to_master_derivation_key(words))
+
+
+"""
+    SecretBox key of `password` (Argon2id)
+"""
+def box_key(password, salt, ops, mem):
+    return nacl.pwhash.argon2id.kdf(nacl.secret.SecretBox.KEY_SIZE, password.encode(), salt, opslimit=ops, memlimit=mem)
+
+
+"""
+    Password from the environment or asked (twice if `confirm`)
+"""
+def ask_password(confirm=False):
+    password = os.environ.get(PASSWORD_ENV)
+    if password:
+        return password
+    password = getpass.getpass("🔑 Keystore password: ")
+    if confirm and getpass.getpass("🔑 Again: ") != password:
+        print("❌ Passwords don't match")
+        exit(3401)
+    return password
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Memory locked buffer
+----------------------------------------------------------------------------------------------------
+'''
+
+class LockedBuffer:
+    def __init__(self, size):
+        self.data = bytearray(size)
+        self.locked = False
+        if size == 0:
+            return
+        self._address = ctypes.addressof((ctypes.c_char * size).from_buffer(self.data))
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            self.locked = libc.mlock(ctypes.c_void_p(self._address), ctypes.c_size_t(size)) == 0
+        except (OSError, AttributeError):
+            pass
+
+    """
+        Zero the content and unlock the memory
+    """
+    def close(self):
+        self.data[:] = bytes(len(self.data))
+        if self.locked:
+            ctypes.CDLL(None).munlock(ctypes.c_void_p(self._address), ctypes.c_size_t(len(self.data)))
+            self.locked = False
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Keystore file
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Create the keystore `path` with `count` accounts derived from `master`
+    Encrypted if `password` is given. Returns the seconds it took
+"""
+def create(path, master, count, password=None, workers=None):
+    start_time = time.perf_counter()
+    salt = os.urandom(16)
+    ops, mem = nacl.pwhash.argon2id.OPSLIMIT_INTERACTIVE, nacl.pwhash.argon2id.MEMLIMIT_INTERACTIVE
+    key = box_key(password, salt, ops, mem) if password else None
+    chunks = [(f, min(chunk_size, count - f)) for f in range(0, count, chunk_size)]
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FILE_VERSION, ENCRYPTED if password else 0, count, ops, mem, salt))
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [pool.submit(derive_chunk, master, first, n, key) for first, n in chunks]
+            for fut in futures:
+                f.write(fut.result())
+    os.replace(path + '.tmp', path)
+    return time.perf_counter() - start_time
+
+
+class Keystore:
+    """
+        Open the keystore `path`
+        The addresses are readable without `password`, the keys of an
+        encrypted keystore need it (here or with `unlock`)
+    """
+    def __init__(self, path, password=None):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, flags, self.count, ops, mem, salt = HEADER.unpack_from(data)
+        self.kdf = (salt, ops, mem)
+        if magic != MAGIC or version != FILE_VERSION:
+            raise ValueError(f"{path} is not a keystore file")
+        self.encrypted = bool(flags & ENCRYPTED)
+        self.record_size = RECORD_ENCRYPTED if self.encrypted else RECORD_PLAIN
+        self.records = memoryview(data)[HEADER.size:]
+        if len(self.records) != self.count * self.record_size:
+            raise ValueError(f"{path} is truncated")
+        self.box = None
+        ## Decrypted seeds, decrypted on first use
+        self.seeds = LockedBuffer(32 * self.count)
+        self.ready = bytearray(self.count)
+        if self.encrypted and password != None:
+            self.unlock(password)
+
+    """
+        Give the password of an encrypted keystore
+        Raises nacl.exceptions.CryptoError if it's wrong
+    """
+    def unlock(self, password):
+        box = nacl.secret.SecretBox(box_key(password, *self.kdf))
+        ## Check the password on the first record
+        if self.count:
+            box.decrypt(bytes(self._record(0)[32:]))
+        self.box = box
+
+    def _record(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(f"account {index} not in the keystore ({self.count} accounts)")
+        return self.records[index * self.record_size:(index + 1) * self.record_size]
+
+    def public_key(self, index):
+        return bytes(self._record(index)[:32])
+
+    def address(self, index):
+        return sdk.encoding.encode_address(self.public_key(index))
+
+    def addresses(self, first=0, count=None):
+        count = self.count - first if count == None else count
+        return [self.address(n) for n in range(first, first + count)]
+
+    """
+        Seed of account `index` (a view on the locked buffer)
+        The seed is copied into the buffer: the bytes decrypted by the box
+        are not locked, they're freed (not zeroed) by Python
+    """
+    def seed(self, index):
+        ## Checks the bounds: a negative index would be a view past the buffer
+        record = self._record(index)
+        if not self.ready[index]:
+            secret = record[32:]
+            if self.encrypted and self.box == None:
+                raise ValueError("encrypted keystore: unlock it with the password first")
+            self.seeds.data[32 * index:32 * index + 32] = self.box.decrypt(bytes(secret)) if self.box else secret
+            self.ready[index] = 1
+        return memoryview(self.seeds.data)[32 * index:32 * index + 32]
+
+    """
+        algosdk private key (base64 of seed + public key)
+        Note: Python strings can't be locked or zeroed, keep as few as possible
+    """
+    def private_key(self, index):
+        return base64.b64encode(bytes(self.seed(index)) + self.public_key(index)).decode()
+
+    def account(self, index):
+        return sdk.SigningAccount(private_key=self.private_key(index))
+
+    def accounts(self, first=0, count=None):
+        count = self.count - first if count == None else count
+        return [self.account(n) for n in range(first, first + count)]
+
+    def close(self):
+        self.seeds.close()
+        self.ready = bytearray(self.count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+"""
+    Register the accounts of `keystore` in a KeyManager (see keymanager.py)
+    Named `prefix` + index
+"""
+def load_into(key_manager, keystore, first=0, count=None, prefix='acct'):
+    count = keystore.count - first if count == None else count
+    key_manager.add_many((f"{prefix}{n}", keystore.account(n)) for n in range(first, first + count))
+
+
+"""________________________________________________________________________
+
+   MAIN
+"""
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deterministic bulk keystore")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    cr = sub.add_parser('create', help="derive accounts into a keystore file")
+    cr.add_argument('file')
+    cr.add_argument('--count', type=int, required=True)
+    cr.add_argument('--mnemonic', help="25 words of the master seed (a new one if not given)")
+    cr.add_argument('--encrypt', action='store_true', help="encrypt the keys with a password")
+    cr.add_argument('--workers', type=int, help="processes (default: all the cores)")
+
+    ls = sub.add_parser('list', help="show the addresses of a keystore")
+    ls.add_argument('file')
+    ls.add_argument('--first', type=int, default=0)
+    ls.add_argument('--count', type=int)
+    opts = parser.parse_args(argv)
+
+    if opts.command == 'create':
+        if os.path.exists(opts.file):
+            overwrite = input(f"🟨 {opts.file} exists. Erase and overwrite? (Y/*)")
+            if overwrite != 'Y':
+                print("❌ Exiting")
+                exit(0)
+        try:
+            master = from_mnemonic(opts.mnemonic) if opts.mnemonic else new_master()
+        except Exception as e:
+            print("💩 ", e)
+            print("❌ Wrong mnemonic")
+            exit(3402)
+        password = ask_password(confirm=True) if opts.encrypt else None
+        elapsed = create(opts.file, master, opts.count, password, opts.workers)
+        print(f"✅ {opts.count} accounts in {opts.file} in {elapsed:.2f}s ({opts.count/elapsed:.0f} accounts/s)")
+        if not opts.mnemonic:
+            print("🟨 Master mnemonic (keep it: it derives all the accounts again):")
+            print("🟨 ", to_mnemonic(master))
+
+    else:
+        try:
+            ## Addresses are in clear: no password needed
+            keystore = Keystore(opts.file)
+        except Exception as e:
+            print("💩 ", e)
+            print("❌ Could not open the keystore")
+            exit(3403)
+        for n in range(opts.first, min(keystore.count, opts.first + (opts.count or keystore.count))):
+            print(f"🔹 {n:>8}  {keystore.address(n)}")
+        print(f"🏁 {keystore.count} accounts{' (encrypted)' if keystore.encrypted else ''}")
+
+
+if __name__ == '__main__':
+    main()
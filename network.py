@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Network clients
+
+    Builds the clients for the network selected with set_network.py.
+    The algod client goes through a NodePool (see nodepool.py) of the nodes
+    in shelve.db ('algod_nodes'): fastest healthy node for reads, failover,
+    submits pinned to one node, rate limits per node (ratelimit.py).
+    The indexer and kmd clients use their own endpoints ('indexer_address',
+    'kmd_address'): None if the network has none.
+----------------------------------------------------------------------------------------------------
+'''
+
+import shelve
+
+import sdk
+
+from   nodepool import NodePool, pooled_algod_client
+from   tracing import instrument
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## One pool per set of nodes for the whole process
+_pools              = {}
+
+
+"""
+    Algod nodes [(address, token)] of the selected network
+    Falls back to the single `algod_address`/`algod_token`
+"""
+def algod_nodes(algod_address, algod_token):
+    with shelve.open("shelve.db") as db:
+        nodes = db.get('algod_nodes')
+    if not nodes or nodes[0][0] != algod_address:
+        nodes = [(algod_address, algod_token)]
+    return [tuple(n) for n in nodes]
+
+
+"""
+    The node pool of `nodes`, started on first use
+"""
+def node_pool(nodes):
+    key = tuple(nodes)
+    if key not in _pools:
+        _pools[key] = NodePool(nodes).start()
+    return _pools[key]
+
+
+"""
+    (address, token) of the `name` ('indexer' or 'kmd') endpoint of the selected
+    network, None if there is none (or set_network.py is older than the endpoint)
+"""
+def endpoint(name):
+    with shelve.open("shelve.db") as db:
+        address = db.get(f'{name}_address')
+        token = db.get(f'{name}_token') or ''
+    return (address, token) if address else None
+
+
+"""
+    algosdk IndexerClient / KMDClient of the selected network, None if not set
+"""
+def indexer_client():
+    indexer = endpoint('indexer')
+    return sdk.IndexerClient(indexer[1], indexer[0]) if indexer else None
+
+
+def kmd_client():
+    kmd = endpoint('kmd')
+    return sdk.KMDClient(kmd[1], kmd[0]) if kmd else None
+
+
+"""
+    algosdk AlgodClient of the selected network
+    Always pooled, even with one node: all the requests go through the rate limiter
+"""
+def algod_client(algod_address, algod_token):
+    return pooled_algod_client(node_pool(algod_nodes(algod_address, algod_token)))
+
+
+"""
+    AlgorandClient of the selected network, instrumented by tracing.py
+"""
+def algorand_client(algod_address, algod_token):
+    client = sdk.AlgorandClient.from_clients(
+        algod = algod_client(algod_address, algod_token),
+        indexer = indexer_client(),
+        kmd = kmd_client(),
+    )
+    ## Time the network calls (only when ALGO_TRACE is set)
+    instrument(client)
+    return client
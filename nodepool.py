@@ -0,0 +1,285 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Pool of algod nodes: health checks, latency routing and failover
+
+    set_network.py stores several endpoints per network ('algod_nodes' in
+    shelve.db). A background thread calls /health on each node every
+    `check_interval` seconds and keeps an average of its latency.
+
+    - reads go to the fastest healthy node; if it does not answer (connection
+      error, timeout, 429/5xx) it's marked down and the next one is tried
+    - a submit (POST /transactions, one whole group) goes to one node, and
+      the pending-transaction calls of its txid go to the same node: the
+      transaction pool is local to each node
+    - a node marked down is checked again by the health thread, and used
+      again as soon as it answers
+    - each request waits for the rate limiter of its node (ratelimit.py);
+      when all the nodes throttle, it's sent again up to `max_retries` times
+
+    `NodePool` only uses the standard library (testable with local stand-in
+    servers, see test_nodepool.py). `pooled_algod_client(pool)` builds an
+    algosdk AlgodClient that sends its requests through the pool.
+----------------------------------------------------------------------------------------------------
+'''
+
+import time
+import threading
+import urllib.error
+import urllib.request
+from   collections import OrderedDict
+
+import ratelimit
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Seconds between two health checks of the nodes
+check_interval      = 10.0
+
+## Timeout (seconds) of a health check
+check_timeout       = 2.0
+
+## Weight of a new latency sample in the average
+latency_weight      = 0.3
+
+## HTTP status codes meaning "try another node"
+RETRY_CODES         = (429, 500, 502, 503, 504)
+
+## Submitted txids remembered to route their pending info calls
+max_pinned          = 10_000
+
+## Times a throttled request is sent again (after the limiter backoff)
+max_retries         = 3
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Nodes
+----------------------------------------------------------------------------------------------------
+'''
+
+class Node:
+    def __init__(self, address, token=''):
+        self.address = address.rstrip('/')
+        self.token = token
+        self.healthy = True
+        self.latency = None         ## average seconds, None = not measured yet
+        self.failures = 0
+
+    def __repr__(self):
+        latency = f"{self.latency * 1000:.0f}ms" if self.latency != None else '?'
+        return f"<Node {self.address} {'up' if self.healthy else 'down'} {latency}>"
+
+
+class NodePool:
+    def __init__(self, nodes):
+        self.nodes = [n if isinstance(n, Node) else Node(*n) for n in nodes]
+        if not self.nodes:
+            raise ValueError("a node pool needs at least one node")
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.pinned = OrderedDict()     ## txid -> node
+
+    ## ---------------------------------------------------------------- health
+
+    """
+        Record a successful call to `node`, with its latency if it's a health
+        check (the time of other calls depends on what they do)
+    """
+    def success(self, node, elapsed=None):
+        with self.lock:
+            node.healthy = True
+            node.failures = 0
+            if elapsed == None:
+                return
+            if node.latency == None:
+                node.latency = elapsed
+            else:
+                node.latency += latency_weight * (elapsed - node.latency)
+
+    """
+        Record a failed call to `node`: it's not used until it answers again
+    """
+    def failure(self, node):
+        with self.lock:
+            node.healthy = False
+            node.failures += 1
+
+    """
+        Call /health on `node`, returns True if it answered
+    """
+    def check(self, node):
+        req = urllib.request.Request(node.address + '/health', headers={'X-Algo-API-Token': node.token})
+        start_time = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=check_timeout) as resp:
+                resp.read()
+        except Exception:
+            self.failure(node)
+            return False
+        self.success(node, time.perf_counter() - start_time)
+        return True
+
+    """
+        Check all the nodes at the same time
+    """
+    def check_all(self):
+        threads = [threading.Thread(target=self.check, args=(n,), daemon=True) for n in self.nodes]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def _checker(self):
+        while not self.stopping.wait(check_interval):
+            self.check_all()
+
+    """
+        Check the nodes now, then every `check_interval` seconds in background
+    """
+    def start(self):
+        self.check_all()
+        if self.thread == None and len(self.nodes) > 1:
+            self.thread = threading.Thread(target=self._checker, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+
+    ## ---------------------------------------------------------------- routing
+
+    """
+        Nodes in order of preference: healthy ones by latency, then the others
+        (a node down is still better than no node at all)
+    """
+    def ranked(self):
+        with self.lock:
+            return sorted(
+                self.nodes,
+                key=lambda n: (not n.healthy, n.latency if n.latency != None else float('inf'))
+            )
+
+    def best(self):
+        return self.ranked()[0]
+
+    """
+        Remember that `txid` was submitted to `node`
+    """
+    def pin(self, txid, node):
+        with self.lock:
+            self.pinned[txid] = node
+            self.pinned.move_to_end(txid)
+            while len(self.pinned) > max_pinned:
+                self.pinned.popitem(last=False)
+
+    def pinned_node(self, txid):
+        with self.lock:
+            return self.pinned.get(txid)
+
+    """
+        Run fn(node) on the best node, on the next ones if `retry(exception)` is True
+        Returns (result, node used)
+    """
+    def call(self, fn, retry, nodes=None):
+        error = None
+        for node in nodes or self.ranked():
+            try:
+                result = fn(node)
+            except Exception as e:
+                if not retry(e):
+                    raise
+                self.failure(node)
+                error = e
+                continue
+            self.success(node)
+            return result, node
+        raise error
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    algosdk client
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    True if a failed request is worth sending to another node
+"""
+def retryable(e):
+    code = getattr(e, 'code', None)
+    if code != None:
+        return code in RETRY_CODES
+    return isinstance(e, (urllib.error.URLError, TimeoutError, ConnectionError, OSError))
+
+
+"""
+    Txids of the signed transactions of a submitted group (msgpack stream)
+"""
+def _group_txids(data):
+    import msgpack
+    from algosdk import transaction
+    try:
+        unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+        unpacker.feed(data)
+        return [transaction.SignedTransaction.undictify(stx).get_txid() for stx in unpacker]
+    except Exception:
+        return []
+
+
+"""
+    An algosdk AlgodClient sending its requests to the nodes of `pool`
+    (algod_address/algod_token are the ones of the first node)
+"""
+def pooled_algod_client(pool):
+    from algosdk.v2client.algod import AlgodClient
+
+    class PooledAlgodClient(AlgodClient):
+        def __init__(self, pool):
+            super().__init__(pool.nodes[0].token, pool.nodes[0].address)
+            self.pool = pool
+            self.clients = {id(n): AlgodClient(n.token, n.address, self.headers) for n in pool.nodes}
+
+        def algod_request(self, method, requrl, params=None, data=None, headers=None, response_format="json", timeout=30):
+            ## Every request waits for the limiter of its node (see ratelimit.py)
+            ## A long poll takes a token but no slot, and its time is not a latency
+            long_poll = requrl.startswith('/status/wait-for-block-after')
+            def send(node):
+                limiter = ratelimit.limiter(node.address)
+                limiter.acquire(slot=not long_poll)
+                start_time = time.perf_counter()
+                try:
+                    result = self.clients[id(node)].algod_request(method, requrl, params, data, headers, response_format, timeout)
+                except Exception as e:
+                    limiter.release(throttled=retryable(e), slot=not long_poll)
+                    raise
+                limiter.release(None if long_poll else time.perf_counter() - start_time, slot=not long_poll)
+                return result
+
+            ## Pending info of a submitted transaction: ask the node that got it first
+            nodes = None
+            if requrl.startswith('/transactions/pending/'):
+                node = self.pool.pinned_node(requrl.split('/')[3])
+                if node != None:
+                    nodes = [node] + [n for n in self.pool.ranked() if n is not node]
+
+            ## Throttled by all the nodes: try again, the limiters slow down
+            for attempt in range(max_retries + 1):
+                try:
+                    result, node = self.pool.call(send, retryable, nodes)
+                    break
+                except Exception as e:
+                    if attempt == max_retries or not retryable(e):
+                        raise
+            if method == 'POST' and requrl == '/transactions':
+                for txid in _group_txids(data):
+                    self.pool.pin(txid, node)
+            return result
+
+    return PooledAlgodClient(pool)
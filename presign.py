@@ -0,0 +1,296 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Offline bulk signing and pre-signed transaction files
+
+    Signing is a CPU cost that can be paid ahead of time: this tool builds and
+    signs large batches of payments and/or app calls across a process pool and
+    stores them in a compact msgpack file. A separate `send` step streams the
+    file to algod as fast as the node accepts it.
+
+    Usage:
+        presign.py sign <file> --payments N [--amount 1000] [--receiver ADDR]
+        presign.py sign <file> --calls N --method "set_b(uint64)uint64" [--args 1 ...] [--box KEY ...]
+        presign.py send <file> [--workers 32]
+
+    File layout (msgpack stream):
+        header  : {'v', 'genesis_id', 'first_valid', 'last_valid', 'count'}
+        count x : bytes of one signed transaction
+
+    Notes:
+    - Transactions are valid for 1000 rounds from the moment they are signed,
+      the file must be sent before `last_valid`
+    - Signing uses the account in shelve.db, app calls target the app_id in shelve.db
+    - Resources (boxes) can't be discovered offline: pass them with --box
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import sys
+import shelve
+import base64
+import argparse
+import timeit
+import threading
+from   concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import msgpack
+import sdk
+import network
+import confirm
+import rawcall
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+FILE_VERSION        = 1
+
+## Transactions signed per task sent to the process pool
+chunk_size          = 2_000
+
+## Rounds of validity of the signed transactions (protocol maximum)
+validity_rounds     = 1_000
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Signing (runs inside the worker processes)
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Build and sign the transactions from `first` to `first+count`
+    `spec` describes what to build (see `_spec`), it's a plain dict so that it
+    can be sent to the worker processes
+    Returns a list of msgpack encoded signed transactions (bytes)
+"""
+def sign_chunk(private_key, sp, spec, first, count):
+    sender = spec['sender']
+    signed = []
+
+    if spec['kind'] == 'call':
+        ## Only the note changes between the calls: one template (see rawcall.py)
+        template = rawcall.CallTemplate(rawcall.method_entry(spec['method']), spec['app_id'], sender, sp, boxes=spec['boxes'], fee=sp.fee)
+        key = rawcall.signing_key(private_key)
+
+    for n in range(first, first + count):
+        ## Unique note: the same content can be signed many times
+        note = spec['nonce'] + n.to_bytes(8, 'big')
+        if spec['kind'] == 'pay':
+            txn = sdk.transaction.PaymentTxn(sender, sp, spec['receiver'], spec['amount'], note=note)
+            stxn = txn.sign(private_key)
+            signed.append(base64.b64decode(sdk.encoding.msgpack_encode(stxn)))
+        else:
+            signed.append(rawcall.sign(key, template.pack(spec['args'], sp.first, sp.last, note)))
+    return signed
+
+
+"""
+    Sign `total` transactions across a process pool
+    Yields the signed transactions in order
+"""
+def sign_all(private_key, sp, spec, total, *, workers=None):
+    chunks = [(f, min(chunk_size, total - f)) for f in range(0, total, chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(sign_chunk, private_key, sp, spec, f, c) for f, c in chunks]
+        for fut in futures:
+            yield from fut.result()
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Helper functions
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Get the values needed from shelve.db
+"""
+def _load_shelve():
+    with shelve.open("shelve.db") as db:
+        if not ('private_key' in db and 'address' in db):
+            print("❌ No account found in shelve.db. Create one first")
+            exit(2001)
+        if not 'algod_address' in db:
+            print("❌ Algorand node address not specified")
+            exit(2002)
+        return dict(db)
+
+
+"""
+    Turn the command line options into the description of the transactions to sign
+"""
+def _spec(opts, values):
+    spec = {
+        'sender' : values['address'],
+        'nonce' : os.urandom(8),
+    }
+    if opts.payments:
+        spec['kind'] = 'pay'
+        spec['receiver'] = opts.receiver or values['address']
+        spec['amount'] = opts.amount
+    else:
+        if values.get('app_id') == None:
+            print("❌ No app_id in shelve.db. Deploy the contract first")
+            exit(2005)
+        spec['kind'] = 'call'
+        spec['app_id'] = values['app_id']
+        spec['method'] = opts.method
+        ## uint64 args from the command line must be int
+        method = sdk.abi.Method.from_signature(opts.method)
+        spec['args'] = [int(a) if str(method.args[n].type) == 'uint64' else a for n, a in enumerate(opts.args)]
+        spec['boxes'] = [b.encode() for b in opts.box]
+    return spec
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Commands
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Build, sign and store the transactions into `opts.file`
+"""
+def do_sign(opts):
+    values = _load_shelve()
+    algod_client = network.algod_client(values['algod_address'], values['algod_token'])
+
+    total = opts.payments or opts.calls
+    spec = _spec(opts, values)
+
+    ## Same suggested params for every transaction
+    sp = algod_client.suggested_params()
+    sp.flat_fee = True
+    sp.fee = sp.min_fee
+    sp.last = sp.first + validity_rounds
+
+    print(f"🕓 Signing {total} transactions...")
+    start_time = timeit.default_timer()
+    with open(opts.file, 'wb') as f:
+        f.write(msgpack.packb({
+            'v' : FILE_VERSION,
+            'genesis_id' : sp.gen,
+            'first_valid' : sp.first,
+            'last_valid' : sp.last,
+            'count' : total
+        }))
+        for stxn in sign_all(values['private_key'], sp, spec, total, workers=opts.workers):
+            f.write(msgpack.packb(stxn))
+    elapsed = timeit.default_timer() - start_time
+
+    print(f"✅ Signed {total} transactions in {elapsed:.2f}s ({total/elapsed:.0f} tx/s)")
+    print(f"🟨 Send them before round {sp.last}")
+
+
+"""
+    Stream the signed transactions of `opts.file` to algod
+    `opts.workers` requests are kept in flight at the same time
+"""
+def do_send(opts):
+    values = _load_shelve()
+    algod_client = network.algod_client(values['algod_address'], values['algod_token'])
+
+    with open(opts.file, 'rb') as f:
+        unpacker = msgpack.Unpacker(f, raw=False)
+        header = next(unpacker)
+        if header.get('v') != FILE_VERSION:
+            print("❌ Unknown file format")
+            exit(3001)
+        last_round = algod_client.status()['last-round']
+        if last_round >= header['last_valid']:
+            print(f"❌ Transactions expired at round {header['last_valid']} (now {last_round})")
+            exit(3002)
+
+        sent = 0
+        errors = []
+        confirmations = []
+        watcher = confirm.watcher(algod_client)
+        in_flight = threading.BoundedSemaphore(opts.workers)
+        lock = threading.Lock()
+
+        def _send(stxn):
+            nonlocal sent
+            try:
+                txid = algod_client.send_raw_transaction(base64.b64encode(stxn))
+                with lock:
+                    sent += 1
+                    if not opts.no_wait:
+                        confirmations.append(watcher.watch(txid, header['last_valid']))
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+            finally:
+                in_flight.release()
+
+        print(f"🕓 Sending {header['count']} transactions...")
+        start_time = timeit.default_timer()
+        with ThreadPoolExecutor(max_workers=opts.workers) as pool:
+            for stxn in unpacker:
+                in_flight.acquire()
+                pool.submit(_send, stxn)
+        elapsed = timeit.default_timer() - start_time
+
+    print(f"✅ Sent {sent} transactions in {elapsed:.2f}s ({sent/elapsed:.0f} tx/s)")
+    if errors:
+        print(f"🔴 {len(errors)} transactions failed, first error: {errors[0]}")
+    if opts.no_wait or not confirmations:
+        return
+
+    ## One block watcher for all the transactions (see confirm.py)
+    print(f"🕓 Waiting for {len(confirmations)} confirmations...")
+    rounds = []
+    expired = 0
+    for future in confirmations:
+        try:
+            rounds.append(future.result())
+        except confirm.Expired:
+            expired += 1
+    elapsed = timeit.default_timer() - start_time
+    if rounds:
+        print(f"✅ Confirmed {len(rounds)} transactions in rounds {min(rounds)}-{max(rounds)}, {elapsed:.2f}s after the first send ({watcher.blocks} blocks read)")
+    if expired:
+        print(f"🔴 {expired} transactions not confirmed before round {header['last_valid']}")
+
+
+"""________________________________________________________________________
+
+   MAIN
+"""
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline bulk signing and pre-signed transaction files")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sign = sub.add_parser('sign', help="build and sign transactions into a file")
+    sign.add_argument('file')
+    what = sign.add_mutually_exclusive_group(required=True)
+    what.add_argument('--payments', type=int, help="number of payments to sign")
+    what.add_argument('--calls', type=int, help="number of app calls to sign")
+    sign.add_argument('--amount', type=int, default=1_000, help="payment amount (microalgos)")
+    sign.add_argument('--receiver', help="payment receiver (defaults to the sender)")
+    sign.add_argument('--method', help="ABI signature of the called method")
+    sign.add_argument('--args', nargs='*', default=[], help="method arguments")
+    sign.add_argument('--box', action='append', default=[], help="box reference (repeat)")
+    sign.add_argument('--workers', type=int, default=None, help="signing processes")
+
+    send = sub.add_parser('send', help="stream a pre-signed file to algod")
+    send.add_argument('file')
+    send.add_argument('--workers', type=int, default=32, help="requests in flight")
+    send.add_argument('--no-wait', action='store_true', help="don't wait for the confirmations")
+
+    opts = parser.parse_args(argv)
+    if opts.command == 'sign':
+        if opts.calls and not opts.method:
+            parser.error("--calls requires --method")
+        do_sign(opts)
+    else:
+        do_send(opts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Client-side rate limiter with adaptive concurrency
+
+    Free public nodes throttle (429) or fail (5xx) when they get too many
+    requests. Every node of the NodePool (see nodepool.py) has a Limiter,
+    and every algod request waits for it:
+
+    - token bucket: at most `rate` requests per second (bursts up to `burst`)
+    - concurrency: at most `concurrency` requests in flight
+
+    Both adapt with AIMD (additive increase, multiplicative decrease):
+    every success raises them a little, a 429/5xx halves them and pauses the
+    node for a backoff time (doubling at each throttle in a row). A latency
+    much higher than the best one seen also lowers the concurrency, before
+    the node starts to throttle.
+
+    So batch runs, seeding and load tests can send as fast as they want: they
+    get the highest throughput a node allows without storms of errors.
+    `limits()` returns the current values of all the limiters.
+----------------------------------------------------------------------------------------------------
+'''
+
+import time
+import random
+import threading
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Starting values and bounds of the rate (requests per second)
+start_rate          = 20.0
+min_rate            = 1.0
+max_rate            = 1_000.0
+
+## Starting value and bounds of the concurrency (requests in flight)
+start_concurrency   = 4.0
+max_concurrency     = 64.0
+
+## Rate added at each success (additive increase)
+rate_step           = 0.5
+
+## Factor applied on throttle (multiplicative decrease)
+decrease            = 0.5
+
+## A latency over `latency_factor` times the best one means congestion
+latency_factor      = 3.0
+
+## First and max pause (seconds) of a node after a throttle
+backoff_start       = 0.25
+backoff_max         = 8.0
+
+## All the limiters: {name: Limiter}
+_limiters           = {}
+_registry_lock      = threading.Lock()
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Limiter
+----------------------------------------------------------------------------------------------------
+'''
+
+class Limiter:
+    def __init__(self, name, rate=None, concurrency=None):
+        self.name = name
+        self.rate = rate or start_rate
+        self.burst = max(1.0, self.rate)
+        self.concurrency = concurrency or start_concurrency
+        self.tokens = self.burst
+        self.refilled = time.monotonic()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.backoff = backoff_start
+        self.best_latency = None
+        self.sent = 0
+        self.throttled = 0
+        self.cond = threading.Condition()
+
+    ## ---------------------------------------------------------------- waiting
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    """
+        Wait for a token and a free concurrency slot
+        `slot` False: only a token, not counted in flight (long polls, that
+        would hold a slot for a whole round and block the other requests)
+    """
+    def acquire(self, slot=True):
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(0.0, self.paused_until - now)
+                if wait == 0 and self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate
+                if wait == 0 and (not slot or self.in_flight < int(self.concurrency)):
+                    self.tokens -= 1
+                    self.in_flight += slot
+                    self.sent += 1
+                    return
+                ## Woken up early by `release` when a slot is freed
+                self.cond.wait(wait or None)
+
+    ## ---------------------------------------------------------------- feedback
+
+    """
+        The request is done: `latency` seconds (None = not meaningful, ie long poll)
+        `throttled` True if the node answered 429/5xx or did not answer
+        `slot` as given to `acquire`
+    """
+    def release(self, latency=None, throttled=False, slot=True):
+        with self.cond:
+            self.in_flight -= slot
+            if throttled:
+                self.throttled += 1
+                self.rate = max(min_rate, self.rate * decrease)
+                self.concurrency = max(1.0, self.concurrency * decrease)
+                self.burst = max(1.0, self.rate)
+                self.tokens = min(self.tokens, self.burst)
+                ## Jitter: the threads waiting don't all start again together
+                self.paused_until = time.monotonic() + self.backoff * random.uniform(0.5, 1.0)
+                self.backoff = min(backoff_max, self.backoff * 2)
+            else:
+                self.backoff = backoff_start
+                self.rate = min(max_rate, self.rate + rate_step)
+                self.burst = max(1.0, self.rate)
+                if latency != None:
+                    if self.best_latency == None or latency < self.best_latency:
+                        self.best_latency = latency
+                    if latency > self.best_latency * latency_factor:
+                        ## Getting slower: back off a little before it throttles
+                        self.concurrency = max(1.0, self.concurrency * 0.9)
+                    else:
+                        self.concurrency = min(max_concurrency, self.concurrency + 1 / self.concurrency)
+            self.cond.notify_all()
+
+    """
+        Current values
+    """
+    def limits(self):
+        with self.cond:
+            return {
+                'rate'          : round(self.rate, 2),
+                'concurrency'   : int(self.concurrency),
+                'in_flight'     : self.in_flight,
+                'sent'          : self.sent,
+                'throttled'     : self.throttled,
+                'paused'        : max(0.0, round(self.paused_until - time.monotonic(), 2)),
+            }
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Registry
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    The limiter called `name` (ie a node address), created the first time
+    Local nodes start with the max rate: they don't throttle
+"""
+def limiter(name):
+    with _registry_lock:
+        if name not in _limiters:
+            local = '://localhost' in name or '://127.0.0.1' in name
+            _limiters[name] = Limiter(name, rate=max_rate if local else None)
+        return _limiters[name]
+
+
+"""
+    Current values of all the limiters {name: {'rate', 'concurrency', ...}}
+"""
+def limits():
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    return {l.name: l.limits() for l in limiters}
+
+
+"""
+    One line summary of the limits (for progress reports)
+"""
+def summary():
+    return '  '.join(
+        f"{name.split('://')[-1]}: {l['rate']}/s x{l['concurrency']}" + (f" ({l['throttled']} throttled)" if l['throttled'] else '')
+        for name, l in limits().items()
+    )
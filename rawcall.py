@@ -0,0 +1,247 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Raw ABI calls from transaction templates
+
+    The typed clients build dataclasses, params objects and a composer for
+    every call (about 1ms each). For high volume paths a CallTemplate builds
+    the canonical msgpack bytes of an application call directly:
+
+    - everything that does not change between calls (app id, sender, fee,
+      genesis, boxes...) is encoded once, in canonical key order, into fixed
+      byte segments
+    - each call only encodes its args (selector + ABI codecs of the method
+      index, see abi_index.py), validity rounds, note and group id, and joins
+      them with the fixed segments
+    - the signature is one ed25519 sign of b"TX" + bytes, the txid its hash
+
+    The bytes are the same algosdk would produce (canonical msgpack: sorted
+    keys, no zero values). RawCaller sends them with send_raw_transaction,
+    alone or in groups, and decodes the return values from the pending info.
+
+    bench_rawcall.py compares the calls built per second with the typed path.
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import base64
+import hashlib
+
+import msgpack
+import nacl.signing
+
+import sdk
+
+import abi_index
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Fields set at each call, the others are fixed in the template
+VARIABLE_FIELDS     = ('apaa', 'fv', 'grp', 'lv', 'note')
+
+## Rounds of validity of the calls
+validity_rounds     = 1_000
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Hashing
+----------------------------------------------------------------------------------------------------
+'''
+
+def _sha512_256(data):
+    return hashlib.new('sha512_256', data).digest()
+
+
+"""
+    Txid (base32 string) of the canonical bytes of a transaction
+"""
+def txid(txn_bytes):
+    return base64.b32encode(_sha512_256(b'TX' + txn_bytes)).decode().rstrip('=')
+
+
+"""
+    Group id of the canonical bytes of the transactions of a group
+"""
+def group_id(txns_bytes):
+    digests = [_sha512_256(b'TX' + t) for t in txns_bytes]
+    return _sha512_256(b'TG' + msgpack.packb({'txlist': digests}, use_bin_type=True))
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Templates
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Method index entry of an ABI signature (when there is no ARC-56 file)
+"""
+def method_entry(signature):
+    method = sdk.abi.Method.from_signature(signature)
+    spec = {'methods': [{
+        'name'      : method.name,
+        'args'      : [{'type': str(a.type), 'name': a.name} for a in method.args],
+        'returns'   : {'type': str(method.returns.type)},
+    }]}
+    return abi_index.build(spec)['methods'][method.name]
+
+
+def _map_header(n):
+    return bytes([0x80 | n]) if n < 16 else b'\xde' + n.to_bytes(2, 'big')
+
+
+class CallTemplate:
+    """
+        Template of the calls of the method `entry` (see abi_index.py) of `app_id`
+        by `sender`, with the fee, genesis of `sp` (SuggestedParams) and the
+        references that don't change between calls
+        `boxes` are box names of the app, `fee` is the flat fee (default: the min fee)
+    """
+    def __init__(self, entry, app_id, sender, sp, *, on_complete=0, boxes=(), accounts=(), foreign_apps=(), fee=None):
+        self.entry = entry
+        fixed = {
+            'apid'  : app_id,
+            'apan'  : on_complete,
+            'apbx'  : [{'n': name if isinstance(name, bytes) else name.encode()} for name in boxes],
+            'apat'  : [sdk.encoding.decode_address(a) for a in accounts],
+            'apfa'  : list(foreign_apps),
+            'fee'   : sp.min_fee if fee == None else fee,
+            'gen'   : sp.gen,
+            'gh'    : base64.b64decode(sp.gh),
+            'snd'   : sdk.encoding.decode_address(sender),
+            'type'  : 'appl',
+        }
+        ## Canonical msgpack: no zero values, sorted keys
+        fixed = {k: v for k, v in fixed.items() if v}
+        self.fixed_count = len(fixed)
+        self.segments = []
+        for key in sorted(list(fixed) + list(VARIABLE_FIELDS)):
+            if key in VARIABLE_FIELDS:
+                self.segments.append(key)
+                continue
+            packed = msgpack.packb(key) + msgpack.packb(fixed[key], use_bin_type=True)
+            if self.segments and isinstance(self.segments[-1], bytes):
+                self.segments[-1] += packed
+            else:
+                self.segments.append(packed)
+        self._packed_keys = {k: msgpack.packb(k) for k in VARIABLE_FIELDS}
+
+    """
+        Canonical bytes of a call with `args` (python values of the ABI types)
+    """
+    def pack(self, args, first_valid, last_valid, note=b'', group=None):
+        values = {
+            'apaa'  : abi_index.encode_call(self.entry, args),
+            'fv'    : first_valid,
+            'grp'   : group,
+            'lv'    : last_valid,
+            'note'  : note,
+        }
+        parts = []
+        count = self.fixed_count
+        for segment in self.segments:
+            if isinstance(segment, bytes):
+                parts.append(segment)
+            elif values[segment]:
+                parts.append(self._packed_keys[segment])
+                parts.append(msgpack.packb(values[segment], use_bin_type=True))
+                count += 1
+        return _map_header(count) + b''.join(parts)
+
+
+"""
+    Signed transaction bytes (msgpack {'sig', 'txn'}) of canonical `txn_bytes`
+    `signing_key` is a nacl SigningKey (see `signing_key`)
+"""
+def sign(signing_key, txn_bytes):
+    signature = signing_key.sign(b'TX' + txn_bytes).signature
+    return b'\x82' + msgpack.packb('sig') + msgpack.packb(signature, use_bin_type=True) + msgpack.packb('txn') + txn_bytes
+
+
+"""
+    nacl SigningKey of an algosdk private key (base64)
+"""
+def signing_key(private_key):
+    return nacl.signing.SigningKey(base64.b64decode(private_key)[:32])
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Sending
+----------------------------------------------------------------------------------------------------
+'''
+
+class RawCaller:
+    """
+        Raw calls of the methods of `index` (see abi_index.py) to `app_id`
+        signed with `private_key`. `template_args` go to each CallTemplate
+        (boxes, accounts, foreign_apps, on_complete, fee)
+    """
+    def __init__(self, algod_client, index, app_id, private_key, **template_args):
+        self.algod = algod_client
+        self.index = index
+        self.app_id = app_id
+        self.sender = sdk.account.address_from_private_key(private_key)
+        self.key = signing_key(private_key)
+        self.template_args = template_args
+        self.templates = {}
+        self.nonce = os.urandom(8)
+        self.sent = 0
+        self.refresh()
+
+    """
+        Suggested params and validity rounds (call it again before they expire)
+    """
+    def refresh(self):
+        self.sp = self.algod.suggested_params()
+        self.rounds = (self.sp.first, self.sp.first + validity_rounds)
+        self.templates = {}
+
+    def template(self, method):
+        if method not in self.templates:
+            self.templates[method] = CallTemplate(self.index['methods'][method], self.app_id, self.sender, self.sp, **self.template_args)
+        return self.templates[method]
+
+    def _note(self):
+        ## Unique note: the same call can be sent many times
+        self.sent += 1
+        return self.nonce + self.sent.to_bytes(8, 'big')
+
+    """
+        (signed bytes, txid) of a call to `method`
+    """
+    def build(self, method, args, group=None, note=None):
+        txn = self.template(method).pack(args, *self.rounds, note or self._note(), group)
+        return sign(self.key, txn), txid(txn)
+
+    """
+        Send one call, returns its txid
+    """
+    def send(self, method, args):
+        signed, tx_id = self.build(method, args)
+        self.algod.send_raw_transaction(base64.b64encode(signed))
+        return tx_id
+
+    """
+        Send the calls [(method, args)] in one group, returns their txids
+    """
+    def send_group(self, calls):
+        notes = [self._note() for _ in calls]
+        txns = [self.template(m).pack(a, *self.rounds, n) for (m, a), n in zip(calls, notes)]
+        gid = group_id(txns)
+        txns = [self.template(m).pack(a, *self.rounds, n, gid) for (m, a), n in zip(calls, notes)]
+        self.algod.send_raw_transaction(base64.b64encode(b''.join(sign(self.key, t) for t in txns)))
+        return [txid(t) for t in txns]
+
+    """
+        Decoded return value of a confirmed call (pending info)
+    """
+    def result(self, method, tx_id):
+        logs = self.algod.pending_transaction_info(tx_id).get('logs') or [None]
+        return abi_index.decode_return(self.index['methods'][method], base64.b64decode(logs[-1]) if logs[-1] else None)
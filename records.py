@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Compact transaction records
+
+    A send result of algokit (SendAppTransactionResult...) holds the
+    transactions objects, the full confirmation dicts of algod and the ABI
+    returns: some KB per call. Keeping thousands of them in a load run (ie
+    the results of batch_application_call) exhausts the memory, while the
+    code only reads a few values of them.
+
+    A TxRecord keeps only these values, extracted when the result is received:
+
+        txid, round, fee, sender, receiver, type, app_id, abi_return
+
+    in a `__slots__` object (no per-instance dict). `receiver` is the one of
+    payments and asset transfers (None for the others). `abi_return` is the
+    decoded return value of the method, only on the app call of the group
+    (its last transaction), like the `abi_return` of the send results.
+
+        rec = records.record(res)           -> TxRecord of the app call
+        recs = records.records(res)         -> TxRecord of each transaction
+
+    bench_records.py measures the memory of both with tracemalloc.
+----------------------------------------------------------------------------------------------------
+'''
+
+import dataclasses
+
+import sdk
+
+'''
+----------------------------------------------------------------------------------------------------
+    Records
+----------------------------------------------------------------------------------------------------
+'''
+
+class TxRecord:
+    __slots__ = ('txid', 'round', 'fee', 'sender', 'receiver', 'type', 'app_id', 'abi_return')
+
+    def __init__(self, txid, round, fee, sender, receiver, type, app_id=None, abi_return=None):
+        self.txid = txid
+        self.round = round
+        self.fee = fee
+        self.sender = sender
+        self.receiver = receiver
+        self.type = type
+        self.app_id = app_id
+        self.abi_return = abi_return
+
+    def __repr__(self):
+        return f"TxRecord({', '.join(f'{k}={getattr(self, k)!r}' for k in self.__slots__)})"
+
+    def __eq__(self, other):
+        return isinstance(other, TxRecord) and all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+"""
+    Plain python value of an ABI return: no reference to the algokit objects
+    Arrays and tuples become lists, structs (dataclasses, namedtuples, dicts)
+    become dicts
+    An algokit ABIReturn (ie the abi_return of budget.send_padded) gives its
+    decoded value, not its method and confirmation
+"""
+def plain(value):
+    if value == None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if isinstance(value, sdk.ABIReturn):
+        return plain(value.value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {f.name: plain(getattr(value, f.name)) for f in dataclasses.fields(value)}
+    if isinstance(value, tuple) and hasattr(value, '_asdict'):
+        return {k: plain(v) for k, v in value._asdict().items()}
+    if isinstance(value, dict):
+        return {k: plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    return str(value)
+
+
+def _record(res, n, abi_return=None):
+    confirmation = res.confirmations[n]
+    txn = confirmation['txn']['txn']
+    return TxRecord(
+        res.tx_ids[n],
+        confirmation.get('confirmed-round'),
+        txn.get('fee', 0),
+        txn.get('snd'),
+        ## Payments and asset transfers
+        txn.get('rcv') or txn.get('arcv'),
+        txn.get('type'),
+        txn.get('apid'),
+        abi_return,
+    )
+
+
+"""
+    TxRecord of each transaction of a send result
+    The ABI return is on the last one (the app call)
+"""
+def records(res):
+    last = len(res.tx_ids) - 1
+    abi_return = plain(getattr(res, 'abi_return', None))
+    return [_record(res, n, abi_return if n == last else None) for n in range(last + 1)]
+
+
+"""
+    TxRecord of the last transaction of a send result (the app call of a
+    method call group)
+"""
+def record(res):
+    return _record(res, len(res.tx_ids) - 1, plain(getattr(res, 'abi_return', None)))
@@ -0,0 +1,303 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Resource references (boxes, accounts, apps, assets) of method calls
+
+    `populate_app_call_resources=True` simulates every call before sending it,
+    only to find out the references it needs. The references of a method
+    follow the same pattern at every call: the box of a BoxMap is always
+    prefix + encoded argument, a Box always has the same key...
+
+    The first call of a method is simulated once to get the resources it
+    accessed, each one is turned into a pattern using the ARC-56 spec and
+    the call arguments:
+
+        boxes       ('key', name)               Box with a static key
+                    ('arg', prefix, i, enc)     BoxMap key: prefix + arg i encoded
+                                                as ABI ('abi') or without its
+                                                length prefix ('raw')
+                    ('sender', prefix)          BoxMap keyed by the sender address
+        accounts    ('sender',) ('arg', i) ('literal', address)
+        apps/assets ('arg', i) ('literal', id)
+
+    The patterns are cached per app, program version and method signature
+    (in memory and in shelve.db 'resource_patterns'): the next calls get
+    their references from the arguments, with no simulate. A call failing
+    with the resolved references drops its pattern.
+    Methods needing more references than a transaction can carry keep
+    using `populate_app_call_resources`.
+    Calls are resolved from many threads at the same time: the patterns are
+    read from shelve.db once, used in memory under a lock, and written back
+    at exit (`flush`), never on the send path.
+----------------------------------------------------------------------------------------------------
+'''
+
+import atexit
+import base64
+import shelve
+import threading
+
+import sdk
+import abi_index
+import budget
+import fingerprint
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Max references of an app call (accounts + apps + assets + boxes)
+max_references      = 8
+
+## Extra budget given to simulate so heavy methods run to the end
+simulate_budget     = 320_000
+
+## {key: patterns} loaded from shelve.db on first use, patterns None = use populate
+_patterns           = None
+
+## Patterns changed since they were written to shelve.db
+_dirty              = False
+
+## Guards the patterns and their writes to shelve.db
+_lock               = threading.Lock()
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Cache
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Key of the patterns of a method of `app_id`
+    (the approval fingerprint stored by deploy.py drops the patterns of old versions)
+"""
+def pattern_key(app_id, method, arg_types):
+    return f"{app_id}:{fingerprint.version(app_id)}:{method}({','.join(arg_types)})"
+
+
+"""
+    The patterns, loaded from shelve.db the first time (call it holding `_lock`)
+"""
+def _load():
+    global _patterns
+    if _patterns == None:
+        with shelve.open("shelve.db") as db:
+            _patterns = db.get('resource_patterns', {})
+        atexit.register(flush)
+    return _patterns
+
+
+"""
+    Write the changed patterns to shelve.db (done at exit)
+"""
+def flush():
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        with shelve.open("shelve.db") as db:
+            db['resource_patterns'] = dict(_patterns)
+        _dirty = False
+
+
+"""
+    Patterns cached under `key` (None if they can't be used)
+"""
+def get(key):
+    with _lock:
+        return _load().get(key)
+
+
+"""
+    Forget the patterns of a method (ie: the resolved references were wrong)
+"""
+def forget(key):
+    global _dirty
+    with _lock:
+        if key in _load():
+            del _patterns[key]
+            _dirty = True
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Patterns
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Possible encodings of each argument as {encoding: bytes}
+"""
+def _encodings(arg_types, args):
+    result = []
+    for arg_type, arg in zip(arg_types, args):
+        try:
+            encoded = abi_index.codec(arg_type).encode(arg)
+        except Exception:
+            ## Reference and transaction types
+            result.append({})
+            continue
+        encodings = {'abi': encoded}
+        if arg_type in ('string', 'byte[]'):
+            encodings['raw'] = encoded[2:]
+        result.append(encodings)
+    return result
+
+
+"""
+    Pattern of an accessed box `name` (bytes)
+"""
+def _box_pattern(name, spec, encodings, sender):
+    static_keys = [base64.b64decode(k['key']) for k in spec['state']['keys'].get('box', {}).values()]
+    if name in static_keys:
+        return ('key', name)
+    ## BoxMap: prefix + argument, the prefixes declared in the spec first
+    ## (maps not kept in the contract state are not in the spec)
+    prefixes = [base64.b64decode(m.get('prefix') or '') for m in spec['state']['maps'].get('box', {}).values()]
+    matches = []
+    for i, arg_encodings in enumerate(encodings):
+        for enc, value in arg_encodings.items():
+            if len(value) > 0 and name.endswith(value):
+                prefix = name[:len(name) - len(value)]
+                matches.append((prefix not in prefixes, ('arg', prefix, i, enc)))
+    if matches:
+        return min(matches)[1]
+    sender_key = sdk.encoding.decode_address(sender)
+    if name.endswith(sender_key):
+        return ('sender', name[:-len(sender_key)])
+    return ('key', name)
+
+
+"""
+    Pattern of a referenced value (account address, app id, asset id)
+"""
+def _value_pattern(value, args, sender=None):
+    if sender != None and value == sender:
+        return ('sender',)
+    for i, arg in enumerate(args):
+        if arg == value:
+            return ('arg', i)
+    return ('literal', value)
+
+
+"""
+    Turn the resources accessed by a simulated call into patterns
+    None if they don't fit in the references of a single transaction
+"""
+def learn(accessed, spec, arg_types, args, sender):
+    encodings = _encodings(arg_types, args)
+    boxes = [_box_pattern(base64.b64decode(b['name']), spec, encodings, sender) for b in accessed.get('boxes', [])]
+    ## The sender is always available
+    accounts = set(accessed.get('accounts', [])) - {sender}
+    apps = set(accessed.get('apps', []))
+    assets = set(accessed.get('assets', []))
+    ## Cross-product resources need both their parts
+    for local in accessed.get('app-locals', []):
+        if local['account'] != sender:
+            accounts.add(local['account'])
+        apps.add(local['app'])
+    for holding in accessed.get('asset-holdings', []):
+        if holding['account'] != sender:
+            accounts.add(holding['account'])
+        assets.add(holding['asset'])
+    patterns = {
+        'boxes'         : boxes,
+        'empty_boxes'   : accessed.get('extra-box-refs', 0),
+        'accounts'      : [_value_pattern(a, args, sender) for a in sorted(accounts)],
+        'apps'          : [_value_pattern(a, args) for a in sorted(apps)],
+        'assets'        : [_value_pattern(a, args) for a in sorted(assets)],
+    }
+    total = sum(len(patterns[k]) for k in ('boxes', 'accounts', 'apps', 'assets')) + patterns['empty_boxes']
+    if total > max_references:
+        return None
+    return patterns
+
+
+"""
+    References of a call from the patterns of its method
+    Returns the CommonAppCallParams fields to set
+"""
+def resolve(patterns, arg_types, args, sender):
+    encodings = _encodings(arg_types, args)
+
+    def value(pattern):
+        match pattern:
+            case ('sender',):
+                return sender
+            case ('arg', i):
+                return args[i]
+            case ('literal', v):
+                return v
+
+    boxes = []
+    for pattern in patterns['boxes']:
+        match pattern:
+            case ('key', name):
+                boxes.append(name)
+            case ('arg', prefix, i, enc):
+                boxes.append(prefix + encodings[i][enc])
+            case ('sender', prefix):
+                boxes.append(prefix + sdk.encoding.decode_address(sender))
+    boxes += [b''] * patterns['empty_boxes']
+    return {
+        'box_references'        : [sdk.BoxReference(app_id=0, name=b) for b in boxes],
+        'account_references'    : [value(p) for p in patterns['accounts']],
+        'app_references'        : [value(p) for p in patterns['apps']],
+        'asset_references'      : [value(p) for p in patterns['assets']],
+    }
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Main entry point
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Resources accessed by `params` (AppCallMethodCallParams), simulating it
+"""
+def simulate_accessed(algorand_client, params):
+    res = algorand_client.new_group().add_app_call_method_call(params).simulate(
+        allow_unnamed_resources=True,
+        skip_signatures=True,
+        extra_opcode_budget=simulate_budget,
+    )
+    group = res.simulate_response['txn-groups'][0]
+    accessed = {}
+    for part in [group] + [group['txn-results'][-1]]:
+        for kind, items in part.get('unnamed-resources-accessed', {}).items():
+            if kind == 'extra-box-refs':
+                accessed[kind] = accessed.get(kind, 0) + items
+            else:
+                accessed.setdefault(kind, []).extend(items)
+    return accessed
+
+
+"""
+    References of a call of `method` with `args` (converted by convert_method_args)
+    `cacp` are the CommonAppCallParams values of the call, `spec` the ARC-56 spec
+    Returns (key, CommonAppCallParams fields to set), the fields are None when
+    `populate_app_call_resources` must be used
+"""
+def references(algorand_client, app_client, app_id, spec, method, cacp, args):
+    arg_types = [a['type'] for m in spec['methods'] if m['name'] == method for a in m['args']]
+    global _dirty
+    key = pattern_key(app_id, method, arg_types)
+    with _lock:
+        known = key in _load()
+        patterns = _patterns.get(key)
+    if not known:
+        ## Simulate without the lock: the other calls don't wait for it
+        params = budget.call_params(app_client, method, cacp, args)
+        accessed = simulate_accessed(algorand_client, params)
+        patterns = learn(accessed, spec, arg_types, args, cacp['sender'])
+        with _lock:
+            _patterns[key] = patterns
+            _dirty = True
+    if patterns == None:
+        return key, None
+    return key, resolve(patterns, arg_types, args, cacp['sender'])
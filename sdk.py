@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Lazy import facade for algokit_utils / algosdk
+
+    Importing algokit_utils takes around half a second, algosdk a quarter.
+    Programs import this module instead and use the names through it:
+
+        import sdk
+        ...
+        algorand_client = sdk.AlgorandClient(sdk.AlgoClientConfigs(...))
+
+    A name is imported the first time it is used (then cached in this module),
+    so a program only pays for what its code path actually touches: ie
+    generate_account.py showing the stored account never loads the SDK.
+
+    Use `bench_startup.py` to measure the difference.
+----------------------------------------------------------------------------------------------------
+'''
+
+import importlib
+
+
+## Name -> (module, attribute). attribute None means the module itself
+_NAMES = {
+    ## algokit_utils
+    'AlgorandClient'            : ('algokit_utils.algorand', 'AlgorandClient'),
+    'AlgoClientConfigs'         : ('algokit_utils.algorand', 'AlgoClientConfigs'),
+    'AlgoClientNetworkConfig'   : ('algokit_utils.algorand', 'AlgoClientNetworkConfig'),
+    'SigningAccount'            : ('algokit_utils', 'SigningAccount'),
+    'AlgoAmount'                : ('algokit_utils', 'AlgoAmount'),
+    'CommonAppCallParams'       : ('algokit_utils', 'CommonAppCallParams'),
+    'SendParams'                : ('algokit_utils', 'SendParams'),
+    'PaymentParams'             : ('algokit_utils', 'PaymentParams'),
+    'AssetTransferParams'       : ('algokit_utils', 'AssetTransferParams'),
+    'AppCallParams'             : ('algokit_utils', 'AppCallParams'),
+    'AppUpdateParams'           : ('algokit_utils', 'AppUpdateParams'),
+    'BoxReference'              : ('algokit_utils.models.state', 'BoxReference'),
+    'AppCreateParams'           : ('algokit_utils', 'AppCreateParams'),
+    'AppCallMethodCallParams'   : ('algokit_utils', 'AppCallMethodCallParams'),
+    'AppClientMethodCallParams' : ('algokit_utils', 'AppClientMethodCallParams'),
+    'AppClient'                 : ('algokit_utils', 'AppClient'),
+    'AppClientParams'           : ('algokit_utils', 'AppClientParams'),
+    'Arc56Contract'             : ('algokit_utils', 'Arc56Contract'),
+    'SendAppTransactionResult'  : ('algokit_utils.transactions.transaction_sender', 'SendAppTransactionResult'),
+    'ABIReturn'                 : ('algokit_utils.applications.abi', 'ABIReturn'),
+    ## algosdk
+    'AlgodClient'               : ('algosdk.v2client.algod', 'AlgodClient'),
+    'IndexerClient'             : ('algosdk.v2client.indexer', 'IndexerClient'),
+    'KMDClient'                 : ('algosdk.kmd', 'KMDClient'),
+    'TransactionWithSigner'     : ('algosdk.atomic_transaction_composer', 'TransactionWithSigner'),
+    'get_application_address'   : ('algosdk.logic', 'get_application_address'),
+    'SourceMap'                 : ('algosdk.source_map', 'SourceMap'),
+    'SimulateRequest'           : ('algosdk.v2client.models', 'SimulateRequest'),
+    'SimulateRequestTransactionGroup' : ('algosdk.v2client.models', 'SimulateRequestTransactionGroup'),
+    'SimulateTraceConfig'       : ('algosdk.v2client.models', 'SimulateTraceConfig'),
+    'abi'                       : ('algosdk.abi', None),
+    'account'                   : ('algosdk.account', None),
+    'encoding'                  : ('algosdk.encoding', None),
+    'mnemonic'                  : ('algosdk.mnemonic', None),
+    'transaction'               : ('algosdk.transaction', None),
+    ## other dependencies of algosdk
+    'msgpack'                   : ('msgpack', None),
+}
+
+
+"""
+    Called by Python for names not (yet) defined in this module
+"""
+def __getattr__(name):
+    if name not in _NAMES:
+        raise AttributeError(f"module 'sdk' has no attribute '{name}'")
+    module_name, attr = _NAMES[name]
+    value = importlib.import_module(module_name)
+    if attr != None:
+        value = getattr(value, attr)
+    ## Next time the name is found directly, no more __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_NAMES.keys()))
@@ -0,0 +1,418 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Bulk state seeding
+
+    Calls a "setter" method of the deployed app (the one in shelve.db) once
+    per row of arguments, ie box_map_set(key, value) of sample_contracts/boxes.py,
+    to fill a BoxMap with many entries:
+
+    1. rows come from a CSV file (one row = the method arguments, as typed in
+       interactive.py) or are generated (uint64 args = row number, string/bytes
+       args = a value of --value-size chars)
+    2. the box MBR of all the entries still to write is computed from the
+       ARC-56 map definition (2500 + 400 * (prefix + key + value) each) and
+       the app account is funded with what's missing, in one payment
+    3. rows are packed 16 calls per group (the max), the box references come
+       from resources.py (one simulate for the first row only), and
+       `--workers` groups are in flight at the same time
+    4. the groups done are saved in a checkpoint file: running the same
+       command again goes on from where it stopped (failed groups are retried)
+    5. progress and throughput are shown while running
+
+    Usage:
+        seed.py <method> --csv rows.csv [--header]
+        seed.py <method> --generate 100000 [--start 0] [--value-size 16]
+        options: [--map name] [--key-arg 0] [--value-arg 1] [--workers 8] [--no-fund]
+                 [--restart]
+
+    Methods taking transaction arguments (ie deposit of personal_bank.py)
+    are not supported: their box keys depend on the sender, not on the
+    arguments.
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import csv
+import json
+import time
+import base64
+import argparse
+from   concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import sdk
+
+import abi_index
+import confirm
+import interactive
+import ratelimit
+import resources
+from   txn_args import is_txn_arg, convert_method_args
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Max transactions in a group
+group_size          = 16
+
+## Groups sent at the same time
+workers             = 8
+
+## Seconds between two checkpoint saves / progress lines
+report_interval     = 2.0
+
+## Seconds after which the validity rounds are refreshed
+validity_refresh    = 30.0
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Rows
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Rows of a CSV file (each row is a list of strings)
+"""
+def rows_from_csv(path, header=False):
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        if header:
+            next(reader, None)
+        for row in reader:
+            if row:
+                yield row
+
+
+"""
+    `count` generated rows for a method with `arg_types`, starting from `start`
+"""
+def rows_generated(arg_types, count, start=0, value_size=16):
+    for n in range(start, start + count):
+        row = []
+        for arg_type in arg_types:
+            if arg_type.startswith('uint'):
+                row.append(str(n))
+            elif arg_type in ('string', 'byte[]'):
+                row.append(f"{n:0{value_size}d}"[-value_size:])
+            else:
+                raise ValueError(f"can't generate values of type {arg_type}")
+        yield row
+
+
+"""
+    Split `rows` into numbered groups: (group index, [rows])
+"""
+def groups(rows, size):
+    chunk = []
+    index = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield index, chunk
+            chunk = []
+            index += 1
+    if chunk:
+        yield index, chunk
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Box MBR
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Size of `value` (user input string) stored as ARC-56 type `avm_type`
+"""
+def _encoded_size(avm_type, value):
+    match avm_type:
+        case 'AVMUint64':
+            return 8
+        case 'AVMString' | 'AVMBytes':
+            return len(str(value).encode())
+    if avm_type.startswith('uint'):
+        return abi_index.codec(avm_type).byte_len()
+    return len(abi_index.codec(avm_type).encode(str(value)))
+
+
+"""
+    The BoxMap written by the seeded method: `name` or the only one of the spec
+"""
+def box_map(spec, name=None):
+    maps = spec['state']['maps'].get('box', {})
+    if name == None:
+        if len(maps) != 1:
+            raise ValueError(f"the contract has {len(maps)} box maps, choose one with --map")
+        name = next(iter(maps))
+    return maps[name]
+
+
+"""
+    MBR of the boxes written by `rows` (and their number)
+"""
+def boxes_mbr(rows, bmap, key_arg, value_arg):
+    prefix = len(base64.b64decode(bmap.get('prefix') or ''))
+    total = 0
+    count = 0
+    for row in rows:
+        size = prefix + _encoded_size(bmap['keyType'], row[key_arg]) + _encoded_size(bmap['valueType'], row[value_arg])
+        total += 2500 + 400 * size
+        count += 1
+    return total, count
+
+
+"""
+    Fund the app account with the part of `mbr` its spare balance does not cover
+"""
+def fund(algorand_client, sender, app_address, mbr):
+    info = algorand_client.account.get_information(app_address)
+    missing = mbr - (info.amount.micro_algo - info.min_balance.micro_algo)
+    if missing <= 0:
+        print(f"🟢 App account already has enough funds for the boxes ({mbr} micro algos)")
+        return
+    res = algorand_client.send.payment(
+        sdk.PaymentParams(sender=sender, receiver=app_address, amount=sdk.AlgoAmount(micro_algo=missing))
+    )
+    print(f"💰 Funded app account with {missing} micro algos ({res.tx_ids[0]})")
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Checkpoint
+    {'watermark': all the groups before it are done, 'done': groups done after it}
+----------------------------------------------------------------------------------------------------
+'''
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return 0, set()
+    with open(path) as f:
+        data = json.load(f)
+    return data['watermark'], set(data['done'])
+
+
+def save_checkpoint(path, watermark, done):
+    while watermark in done:
+        done.discard(watermark)
+        watermark += 1
+    with open(path+'.tmp', 'w') as f:
+        json.dump({'watermark': watermark, 'done': sorted(done)}, f)
+    os.replace(path+'.tmp', path)
+    return watermark
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Sending
+----------------------------------------------------------------------------------------------------
+'''
+
+class Seeder:
+    def __init__(self, method):
+        self.algorand_client = interactive.algorand_client
+        self.sender = interactive.address
+        self.app_id = interactive.app_id
+        self.spec = interactive.abi
+        ## Method, args and types from the method index (see abi_index.py)
+        entry = interactive.method_index['methods'][method]
+        self.method_name = method
+        self.abi_method = entry['method']
+        self.abi_args = entry['args']
+        self.arg_types = entry['arg_types']
+        self.refs_key = None
+        self.rounds = None
+        self.rounds_time = 0
+
+    """
+        Validity rounds of the transactions, refreshed every `validity_refresh` seconds
+    """
+    def _validity(self):
+        if time.monotonic() - self.rounds_time > validity_refresh:
+            last_round = self.algorand_client.client.algod.status()['last-round']
+            self.rounds = (last_round, last_round + 1000)
+            self.rounds_time = time.monotonic()
+        return self.rounds
+
+    def _cacp(self):
+        first, last = self._validity()
+        return {'sender': self.sender, 'first_valid_round': first, 'last_valid_round': last}
+
+    def _args(self, row):
+        return convert_method_args(
+            self.algorand_client, self.abi_args, row,
+            sender=self.sender, app_address=interactive.app_address
+        )
+
+    """
+        Learn the references of the method from the first row (one simulate)
+    """
+    def prepare(self, row):
+        self.refs_key, _ = resources.references(
+            self.algorand_client, interactive.app_client, self.app_id,
+            self.spec, self.method_name, self._cacp(), self._args(row)
+        )
+
+    """
+        Send one group with a call per row
+    """
+    def send_group(self, rows):
+        patterns = resources.get(self.refs_key)
+        group = self.algorand_client.new_group()
+        for row in rows:
+            args = self._args(row)
+            refs = resources.resolve(patterns, self.arg_types, args, self.sender) if patterns else {}
+            group.add_app_call_method_call(
+                sdk.AppCallMethodCallParams(
+                    **self._cacp(),
+                    app_id=self.app_id,
+                    method=self.abi_method,
+                    args=args,
+                    **refs,
+                )
+            )
+        if patterns == None:
+            group.send(sdk.SendParams(populate_app_call_resources=True))
+            return len(rows)
+        ## References known: submit, and wait with the shared block watcher
+        ## (see confirm.py) instead of polling the pending info of each group
+        built = group.build()
+        txids = built.atc.submit(self.algorand_client.client.algod)
+        last_valid = built.transactions[0].txn.last_valid_round
+        confirm.watcher(self.algorand_client.client.algod).watch(txids[0], last_valid).result()
+        return len(rows)
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Progress
+----------------------------------------------------------------------------------------------------
+'''
+
+def _progress(done_rows, total_rows, failed, start_time):
+    elapsed = time.monotonic() - start_time
+    rate = done_rows / elapsed if elapsed > 0 else 0
+    eta = (total_rows - done_rows) / rate if rate > 0 and total_rows else 0
+    print(f"🕓 {done_rows}/{total_rows} rows  {rate:8.1f} rows/s  {failed} failed groups  ETA {eta:6.0f}s", flush=True)
+    print(f"   🔹 limits  {ratelimit.summary()}", flush=True)
+
+
+"""________________________________________________________________________
+
+   MAIN
+"""
+
+def main():
+    global workers
+
+    parser = argparse.ArgumentParser(description="Fill the boxes of the deployed app calling a method once per row")
+    parser.add_argument('method', help="the setter method, ie box_map_set")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--csv', help="CSV file, a row per call with the method arguments")
+    source.add_argument('--generate', type=int, metavar='N', help="generate N rows")
+    parser.add_argument('--header', action='store_true', help="the CSV file has a header line")
+    parser.add_argument('--start', type=int, default=0, help="first generated row number")
+    parser.add_argument('--value-size', type=int, default=16, help="length of the generated string values")
+    parser.add_argument('--map', help="BoxMap written by the method (default: the only one)")
+    parser.add_argument('--key-arg', type=int, default=0, help="argument used as map key")
+    parser.add_argument('--value-arg', type=int, default=1, help="argument used as map value")
+    parser.add_argument('--workers', type=int, default=workers, help="groups sent at the same time")
+    parser.add_argument('--no-fund', action='store_true', help="don't fund the app account for the boxes")
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint and start again")
+    opts = parser.parse_args()
+    workers = opts.workers
+
+    interactive._init()
+    interactive.interactive_mode = False
+    if opts.method not in [m['name'] for m in interactive.abi['methods']]:
+        print(f"❌ {opts.method} is not a method of {interactive.contract_name}")
+        exit(3101)
+    seeder = Seeder(opts.method)
+    if any(is_txn_arg(t) for t in seeder.arg_types):
+        print(f"❌ Methods with transaction arguments can't be seeded")
+        exit(3102)
+
+    def rows():
+        if opts.csv:
+            return rows_from_csv(opts.csv, opts.header)
+        return rows_generated(seeder.arg_types, opts.generate, opts.start, opts.value_size)
+
+    checkpoint = f".seed_{seeder.app_id}_{opts.method}.ckpt"
+    if opts.restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    watermark, done = load_checkpoint(checkpoint)
+
+    def pending(all_groups):
+        return ((i, g) for i, g in all_groups if i >= watermark and i not in done)
+
+    ## Box MBR of the rows still to write, one payment
+    bmap = box_map(interactive.abi, opts.map)
+    mbr, total_rows = boxes_mbr(
+        (row for _, g in pending(groups(rows(), group_size)) for row in g),
+        bmap, opts.key_arg, opts.value_arg
+    )
+    if total_rows == 0:
+        print("🏁 Nothing to do !! (all rows already written, use --restart to start again)")
+        return
+    print(f"📦 {total_rows} rows to write, box MBR {mbr / 1_000_000} algos")
+    if not opts.no_fund:
+        fund(interactive.algorand_client, seeder.sender, interactive.app_address, mbr)
+
+    first_row = next(row for _, g in pending(groups(rows(), group_size)) for row in g)
+    seeder.prepare(first_row)
+
+    stats = {'rows': 0, 'failed': 0}
+    errors = {}
+
+    def collect(future, index):
+        try:
+            stats['rows'] += future.result()
+            done.add(index)
+        except Exception as e:
+            stats['failed'] += 1
+            error = str(e).splitlines()[0][:120]
+            errors[error] = errors.get(error, 0) + 1
+
+    start_time = time.monotonic()
+    last_report = start_time
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for index, chunk in pending(groups(rows(), group_size)):
+                ## Keep a bounded number of groups in flight (rows are streamed)
+                while len(in_flight) >= workers * 2:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        collect(future, in_flight.pop(future))
+                if time.monotonic() - last_report > report_interval:
+                    watermark = save_checkpoint(checkpoint, watermark, done)
+                    _progress(stats['rows'], total_rows, stats['failed'], start_time)
+                    last_report = time.monotonic()
+                in_flight[pool.submit(seeder.send_group, chunk)] = index
+        except KeyboardInterrupt:
+            print("\n🟨 Interrupted, waiting for the groups in flight...")
+            for future in in_flight:
+                future.cancel()
+        finally:
+            for future, index in in_flight.items():
+                if not future.cancelled():
+                    collect(future, index)
+            watermark = save_checkpoint(checkpoint, watermark, done)
+
+    elapsed = time.monotonic() - start_time
+    _progress(stats['rows'], total_rows, stats['failed'], start_time)
+    print("____________________________________________________________\n")
+    print(f"✅ Written {stats['rows']} rows in {elapsed:.1f}s ({stats['rows'] / elapsed if elapsed else 0:.1f} rows/s)")
+    if stats['failed']:
+        print(f"🔴 {stats['failed']} groups failed (run again to retry them):")
+        for error, count in errors.items():
+            print(f"   {count} x {error}")
+    print("🏁 Done !! ")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ with shelve.open("shelve.db") as db:
         print("🟨 The following network is already defined:")
         print("🟨 Address: ", db['algod_address'])
         print("🟨 Token: ", db['algod_token'])
+        print("🟨 Indexer: ", db.get('indexer_address'))
+        print("🟨 Kmd: ", db.get('kmd_address'))
         overwrite = input("Erase and overwrite network? (Y/*)")
         if overwrite != 'Y' :
             print("❌ Exiting")
@@ -27,16 +29,32 @@ match net:
     case 1 :
         algod_address = 'http://localhost:4001'
         algod_token = 'aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa'
+        algod_nodes = [(algod_address, algod_token)]
+        indexer_address = 'http://localhost:8980'
+        indexer_token = algod_token
+        kmd_address = 'http://localhost:4002'
+        kmd_token = algod_token
         lora_link = 'https://lora.algokit.io/localnet/'
     # Testnet
     case 2 :
         algod_address = 'https://testnet-api.4160.nodely.dev'
         algod_token = ''
+        algod_nodes = [(algod_address, algod_token), ('https://testnet-api.algonode.cloud', '')]
+        indexer_address = 'https://testnet-idx.4160.nodely.dev'
+        indexer_token = ''
+        ## No public kmd: accounts are in shelve.db
+        kmd_address = None
+        kmd_token = None
         lora_link = 'https://lora.algokit.io/testnet/'
     # Mainnet
     case 3 :
         algod_address = 'https://mainnet-api.4160.nodely.dev'
         algod_token = ''
+        algod_nodes = [(algod_address, algod_token), ('https://mainnet-api.algonode.cloud', '')]
+        indexer_address = 'https://mainnet-idx.4160.nodely.dev'
+        indexer_token = ''
+        kmd_address = None
+        kmd_token = None
         lora_link = 'https://lora.algokit.io/mainnet/'
     case _ :
         print("❌ Wrong selection, aborting")
@@ -46,6 +64,13 @@ match net:
 with shelve.open("shelve.db") as db:
     db['algod_address'] = algod_address
     db['algod_token'] = algod_token
+    ## All the nodes of the network: the programs use the fastest one (see nodepool.py)
+    db['algod_nodes'] = algod_nodes
+    ## Indexer (history and range queries, see indexer.py) and kmd have their own endpoints
+    db['indexer_address'] = indexer_address
+    db['indexer_token'] = indexer_token
+    db['kmd_address'] = kmd_address
+    db['kmd_token'] = kmd_token
     db['lora_link'] = lora_link
 
 print("\n🏁 Network set")
\ No newline at end of file
@@ -0,0 +1,132 @@
+'''
+----------------------------------------------------------------------------------------------------
+    Tests of the confirmation watcher of confirm.py with a stand-in chain
+
+    The stand-in answers status, status_after_block and get_block_txids from
+    blocks added by the tests, so no node is needed. Run with:
+
+        pytest -v test_confirm.py
+----------------------------------------------------------------------------------------------------
+'''
+
+import time
+import threading
+from   concurrent.futures import Future
+
+import pytest
+
+import confirm
+from   confirm import Watcher, Expired
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Stand-in chain
+----------------------------------------------------------------------------------------------------
+'''
+
+class Chain:
+    def __init__(self, last_round=10):
+        self.last_round = last_round
+        self.blocks = {}
+        self.cond = threading.Condition()
+
+    """
+        Add a block with `txids`, returns its round
+    """
+    def add_block(self, txids=()):
+        with self.cond:
+            self.last_round += 1
+            self.blocks[self.last_round] = list(txids)
+            self.cond.notify_all()
+            return self.last_round
+
+    def status(self):
+        return {'last-round': self.last_round}
+
+    def status_after_block(self, rnd):
+        with self.cond:
+            self.cond.wait_for(lambda: self.last_round > rnd, timeout=1)
+            return {'last-round': self.last_round}
+
+    def get_block_txids(self, rnd):
+        return {'blockTxids': self.blocks.get(rnd, [])}
+
+
+@pytest.fixture
+def chain():
+    return Chain()
+
+
+def _wait_idle(watcher, timeout=2):
+    deadline = time.monotonic() + timeout
+    while watcher.thread != None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return watcher.thread == None
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Tests
+----------------------------------------------------------------------------------------------------
+'''
+
+def test_block_resolves_and_expires():
+    ## _block alone, no thread
+    watcher = Watcher(Chain())
+    found, late, waiting = Future(), Future(), Future()
+    watcher.pending = {'A': (found, 20), 'B': (late, 15), 'C': (waiting, 30)}
+    watcher._block(15, ['A'])
+    assert found.result(0) == 15
+    ## Not in a block up to its last valid round
+    with pytest.raises(Expired):
+        late.result(0)
+    assert not waiting.done()
+    assert list(watcher.pending) == ['C']
+
+
+def test_resolves_txids_of_new_blocks(chain):
+    watcher = Watcher(chain)
+    futures = {txid: watcher.watch(txid, 100) for txid in ('A', 'B', 'C')}
+    chain.add_block(['X', 'A'])
+    rnd = chain.add_block(['B', 'C'])
+    assert futures['A'].result(2) == rnd - 1
+    assert futures['B'].result(2) == rnd and futures['C'].result(2) == rnd
+    assert watcher.outstanding() == 0
+
+
+def test_finds_txids_confirmed_just_before(chain):
+    ## Confirmed before it was watched: found in the last `lookback_rounds` blocks
+    rnd = chain.add_block(['A'])
+    assert Watcher(chain).watch('A', 100).result(2) == rnd
+
+
+def test_expires_at_last_valid(chain):
+    watcher = Watcher(chain)
+    last_valid = chain.last_round + 2
+    future = watcher.watch('A', last_valid)
+    chain.add_block()
+    assert not future.done()
+    chain.add_block()
+    with pytest.raises(Expired):
+        future.result(2)
+
+
+def test_restarts_after_idle(chain):
+    watcher = Watcher(chain)
+    first = watcher.watch('A', 100)
+    chain.add_block(['A'])
+    first.result(2)
+    ## Nothing outstanding: the thread stops...
+    assert _wait_idle(watcher)
+    ## ...and starts again from the last blocks for the next txid
+    second = watcher.watch('B', 200)
+    assert watcher.thread != None
+    rnd = chain.add_block(['B'])
+    assert second.result(2) == rnd
+
+
+def test_one_watcher_per_client(chain, monkeypatch):
+    monkeypatch.setattr(confirm, '_watchers', {})
+    assert confirm.watcher(chain) is confirm.watcher(chain)
+    assert confirm.watcher(chain) is not confirm.watcher(Chain())
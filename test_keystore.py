@@ -0,0 +1,75 @@
+'''
+----------------------------------------------------------------------------------------------------
+    Tests of the bulk keystore of keystore.py
+
+    Small keystores are created in a temporary folder, no node is needed.
+    Run with:
+
+        pytest -v test_keystore.py
+----------------------------------------------------------------------------------------------------
+'''
+
+import nacl.exceptions
+import pytest
+
+import sdk
+import keystore
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Fixtures
+----------------------------------------------------------------------------------------------------
+'''
+
+COUNT               = 5
+MASTER              = bytes(range(32))
+
+
+@pytest.fixture
+def plain(tmp_path):
+    path = str(tmp_path / 'plain.ks')
+    keystore.create(path, MASTER, COUNT, workers=1)
+    with keystore.Keystore(path) as ks:
+        yield ks
+
+
+@pytest.fixture
+def encrypted(tmp_path):
+    path = str(tmp_path / 'encrypted.ks')
+    keystore.create(path, MASTER, COUNT, password='secret', workers=1)
+    return path
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Tests
+----------------------------------------------------------------------------------------------------
+'''
+
+def test_accounts_are_derived(plain):
+    for n in range(COUNT):
+        seed = keystore.derive_seed(MASTER, n)
+        assert bytes(plain.seed(n)) == seed
+        assert plain.address(n) == sdk.account.address_from_private_key(plain.private_key(n))
+
+
+def test_seed_out_of_bounds(plain):
+    ## Even once all the seeds are loaded
+    plain.accounts()
+    for index in (-1, -COUNT, COUNT):
+        with pytest.raises(IndexError):
+            plain.seed(index)
+
+
+def test_encrypted(encrypted):
+    with keystore.Keystore(encrypted) as ks:
+        assert ks.address(0) == keystore.Keystore(encrypted, 'secret').address(0)
+        with pytest.raises(ValueError):
+            ks.seed(0)
+        with pytest.raises(nacl.exceptions.CryptoError):
+            ks.unlock('wrong')
+        ks.unlock('secret')
+        assert bytes(ks.seed(COUNT - 1)) == keystore.derive_seed(MASTER, COUNT - 1)
+        ks.close()
+        assert bytes(ks.seeds.data) == bytes(32 * COUNT)
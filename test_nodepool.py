@@ -0,0 +1,218 @@
+'''
+----------------------------------------------------------------------------------------------------
+    Tests of nodepool.py with local stand-in algod servers
+
+    Each stand-in answers /health, /v2/status, POST /v2/transactions and
+    /v2/transactions/pending/<txid> with its own name, so the tests can tell
+    which node got each request. Run with:
+
+        pytest -v test_nodepool.py
+----------------------------------------------------------------------------------------------------
+'''
+
+import json
+import time
+import base64
+import threading
+from   http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import nodepool
+import ratelimit
+from   nodepool import NodePool, pooled_algod_client
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Stand-in algod server
+----------------------------------------------------------------------------------------------------
+'''
+
+class StandIn:
+    def __init__(self, name, delay=0.0):
+        self.name = name
+        self.delay = delay          ## seconds before each answer
+        self.status_code = 200      ## answer of the API calls (not /health)
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _answer(self, code, body):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                time.sleep(stand_in.delay)
+                stand_in.requests.append(('GET', self.path))
+                if self.path == '/health':
+                    return self._answer(200, {})
+                if stand_in.status_code != 200:
+                    return self._answer(stand_in.status_code, {'message': 'unavailable'})
+                if self.path.startswith('/v2/status'):
+                    return self._answer(200, {'last-round': 1, 'node': stand_in.name})
+                if self.path.startswith('/v2/transactions/pending/'):
+                    return self._answer(200, {'pool-error': '', 'node': stand_in.name})
+                return self._answer(404, {'message': 'not found'})
+
+            def do_POST(self):
+                time.sleep(stand_in.delay)
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                stand_in.requests.append(('POST', self.path))
+                if stand_in.status_code != 200:
+                    return self._answer(stand_in.status_code, {'message': 'unavailable'})
+                return self._answer(200, {'txId': 'X'})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.address = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_ins():
+    servers = {'fast': StandIn('fast'), 'slow': StandIn('slow', delay=0.15)}
+    yield servers
+    for s in servers.values():
+        s.close()
+
+
+"""
+    A port nobody listens on
+"""
+def _dead_address():
+    s = StandIn('dead')
+    address = s.address
+    s.close()
+    return address
+
+
+"""
+    A signed payment (the stand-ins don't check it)
+"""
+def _signed_payment():
+    from algosdk import account, transaction
+    private_key, address = account.generate_account()
+    sp = transaction.SuggestedParams(fee=1000, first=1, last=1000, gh=base64.b64encode(b'\0' * 32).decode(), flat_fee=True)
+    return transaction.PaymentTxn(address, sp, address, 0).sign(private_key)
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Tests
+----------------------------------------------------------------------------------------------------
+'''
+
+def test_routes_reads_to_fastest_node(stand_ins):
+    pool = NodePool([(stand_ins['slow'].address, ''), (stand_ins['fast'].address, '')]).start()
+    assert pool.best().address == stand_ins['fast'].address
+    algod = pooled_algod_client(pool)
+    assert algod.status()['node'] == 'fast'
+    pool.stop()
+
+
+def test_fails_over_when_node_errors(stand_ins):
+    pool = NodePool([(stand_ins['fast'].address, ''), (stand_ins['slow'].address, '')]).start()
+    stand_ins['fast'].status_code = 503
+    algod = pooled_algod_client(pool)
+    assert algod.status()['node'] == 'slow'
+    ## The failing node is not the first choice anymore
+    assert pool.best().address == stand_ins['slow'].address
+    ## Until it answers again
+    stand_ins['fast'].status_code = 200
+    pool.check_all()
+    assert pool.best().address == stand_ins['fast'].address
+    pool.stop()
+
+
+def test_skips_unreachable_node(stand_ins):
+    pool = NodePool([(_dead_address(), ''), (stand_ins['slow'].address, '')]).start()
+    assert not pool.nodes[0].healthy
+    assert pooled_algod_client(pool).status()['node'] == 'slow'
+    pool.stop()
+
+
+def test_does_not_fail_over_on_client_errors(stand_ins):
+    pool = NodePool([(stand_ins['fast'].address, ''), (stand_ins['slow'].address, '')]).start()
+    algod = pooled_algod_client(pool)
+    with pytest.raises(Exception) as e:
+        algod.algod_request('GET', '/not-there')
+    assert getattr(e.value, 'code', None) == 404
+    assert ('GET', '/v2/not-there') not in stand_ins['slow'].requests
+    pool.stop()
+
+
+def test_pending_info_goes_to_submit_node(stand_ins, monkeypatch):
+    pool = NodePool([(stand_ins['fast'].address, ''), (stand_ins['slow'].address, '')]).start()
+    algod = pooled_algod_client(pool)
+    stx = _signed_payment()
+    algod.send_transaction(stx)
+    assert ('POST', '/v2/transactions') in stand_ins['fast'].requests
+
+    ## The other node becomes the fastest: the pending info still goes to the submit node
+    stand_ins['fast'].delay, stand_ins['slow'].delay = 0.15, 0.0
+    monkeypatch.setattr(nodepool, 'latency_weight', 1.0)
+    pool.check_all()
+    assert pool.best().address == stand_ins['slow'].address
+    assert algod.pending_transaction_info(stx.get_txid())['node'] == 'fast'
+    assert algod.status()['node'] == 'slow'
+    pool.stop()
+
+
+def test_limiter_slows_down_when_throttled(stand_ins, monkeypatch):
+    monkeypatch.setattr(ratelimit, '_limiters', {})
+    monkeypatch.setattr(ratelimit, 'backoff_start', 0.01)
+    pool = NodePool([(stand_ins['fast'].address, '')]).start()
+    algod = pooled_algod_client(pool)
+    algod.status()
+    before = ratelimit.limiter(stand_ins['fast'].address).limits()
+    assert before['sent'] == 1 and before['throttled'] == 0
+
+    ## Throttled at each try: sent again `max_retries` times, then the error is raised
+    stand_ins['fast'].status_code = 429
+    with pytest.raises(Exception) as e:
+        algod.status()
+    assert getattr(e.value, 'code', None) == 429
+    after = ratelimit.limiter(stand_ins['fast'].address).limits()
+    assert after['throttled'] == nodepool.max_retries + 1
+    assert after['rate'] < before['rate'] and after['concurrency'] <= before['concurrency']
+    assert after['in_flight'] == 0
+    pool.stop()
+
+
+def test_limiter_caps_requests_in_flight():
+    limiter = ratelimit.Limiter('test', rate=1000, concurrency=2)
+    limiter.acquire()
+    limiter.acquire()
+    third = threading.Thread(target=limiter.acquire, daemon=True)
+    third.start()
+    third.join(0.1)
+    assert third.is_alive()
+    limiter.release(0.01)
+    third.join(1)
+    assert not third.is_alive()
+
+
+def test_long_poll_does_not_take_a_slot():
+    limiter = ratelimit.Limiter('test', rate=1000, concurrency=1)
+    ## A long poll in flight (ie the block watcher of confirm.py)...
+    limiter.acquire(slot=False)
+    ## ...does not block the other requests
+    other = threading.Thread(target=limiter.acquire, daemon=True)
+    other.start()
+    other.join(1)
+    assert not other.is_alive()
+    assert limiter.limits()['in_flight'] == 1
+    limiter.release(None, slot=False)
+    limiter.release(0.01)
+    assert limiter.limits()['in_flight'] == 0
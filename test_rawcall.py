@@ -0,0 +1,150 @@
+'''
+----------------------------------------------------------------------------------------------------
+    Tests of the raw ABI calls of rawcall.py
+
+    The bytes of the templates must be the ones algosdk makes for the same
+    call: each test builds the call both ways and compares them byte for
+    byte. No node is needed. Run with:
+
+        pytest -v test_rawcall.py
+----------------------------------------------------------------------------------------------------
+'''
+
+import base64
+
+import pytest
+
+import sdk
+import rawcall
+import presign
+
+from   algosdk import atomic_transaction_composer as atc
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Fixtures
+----------------------------------------------------------------------------------------------------
+'''
+
+APP_ID              = 1_000
+
+CALLS               = [
+    ('set_b(uint64)uint64', [7]),
+    ('hello(string,byte[])string', ['hi', b'\x01\x02']),
+    ('noargs()void', []),
+    ('pair((uint64,bool),address)void', None),
+]
+
+
+@pytest.fixture
+def account():
+    return sdk.account.generate_account()
+
+
+@pytest.fixture
+def sp():
+    return sdk.transaction.SuggestedParams(
+        fee=1_000, first=1_234, last=2_234,
+        gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", gen="testnet-v1.0",
+        flat_fee=True, min_fee=1_000
+    )
+
+
+def _args(signature, args, address):
+    return args if args != None else [[5, True], address]
+
+
+"""
+    The same call built by algosdk
+"""
+def _sdk_txn(signature, args, sender, sp, note, **refs):
+    method = sdk.abi.Method.from_signature(signature)
+    app_args = [method.get_selector()] + [a.type.encode(v) for a, v in zip(method.args, args)]
+    return sdk.transaction.ApplicationCallTxn(
+        sender, sp, APP_ID,
+        on_complete=refs.get('on_complete', 0),
+        app_args=app_args,
+        boxes=[(0, b) for b in refs.get('boxes', [])],
+        accounts=refs.get('accounts'),
+        foreign_apps=refs.get('foreign_apps'),
+        note=note,
+    )
+
+
+def _bytes(txn):
+    return base64.b64decode(sdk.encoding.msgpack_encode(txn))
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Tests
+----------------------------------------------------------------------------------------------------
+'''
+
+@pytest.mark.parametrize('signature,args', CALLS)
+def test_pack_is_algosdk_bytes(signature, args, account, sp):
+    private_key, address = account
+    args = _args(signature, args, address)
+    other = sdk.account.generate_account()[1]
+    refs = {'boxes': [b'st_box', b'bal\x00'], 'accounts': [other], 'foreign_apps': [55], 'on_complete': 1}
+    template = rawcall.CallTemplate(rawcall.method_entry(signature), APP_ID, address, sp, **refs)
+    for note in (b'', b'note 1', b'note 2'):
+        packed = template.pack(args, sp.first, sp.last, note)
+        txn = _sdk_txn(signature, args, address, sp, note or None, **refs)
+        assert packed == _bytes(txn)
+        assert rawcall.txid(packed) == txn.get_txid()
+
+
+def test_template_without_references(account, sp):
+    private_key, address = account
+    template = rawcall.CallTemplate(rawcall.method_entry('set_b(uint64)uint64'), APP_ID, address, sp)
+    assert template.pack([1], sp.first, sp.last, b'n') == _bytes(_sdk_txn('set_b(uint64)uint64', [1], address, sp, b'n'))
+
+
+def test_sign_is_algosdk_bytes(account, sp):
+    private_key, address = account
+    template = rawcall.CallTemplate(rawcall.method_entry('set_b(uint64)uint64'), APP_ID, address, sp, boxes=[b'st_box'])
+    signed = rawcall.sign(rawcall.signing_key(private_key), template.pack([7], sp.first, sp.last, b'x'))
+    txn = _sdk_txn('set_b(uint64)uint64', [7], address, sp, b'x', boxes=[b'st_box'])
+    assert signed == _bytes(txn.sign(private_key))
+
+
+def test_group_is_algosdk_bytes(account, sp):
+    private_key, address = account
+    calls = [('set_b(uint64)uint64', [1]), ('hello(string,byte[])string', ['a', b'b']), ('set_b(uint64)uint64', [2])]
+    templates = [rawcall.CallTemplate(rawcall.method_entry(s), APP_ID, address, sp, boxes=[b'st_box']) for s, _ in calls]
+    notes = [f"n{n}".encode() for n in range(len(calls))]
+    packed = [t.pack(a, sp.first, sp.last, n) for t, (_, a), n in zip(templates, calls, notes)]
+    gid = rawcall.group_id(packed)
+
+    txns = [_sdk_txn(s, a, address, sp, n, boxes=[b'st_box']) for (s, a), n in zip(calls, notes)]
+    sdk.transaction.assign_group_id(txns)
+    assert gid == txns[0].group
+
+    key = rawcall.signing_key(private_key)
+    grouped = [t.pack(a, sp.first, sp.last, n, gid) for t, (_, a), n in zip(templates, calls, notes)]
+    assert [rawcall.sign(key, g) for g in grouped] == [_bytes(t.sign(private_key)) for t in txns]
+    assert [rawcall.txid(g) for g in grouped] == [t.get_txid() for t in txns]
+
+
+def test_many_args_are_packed_in_a_tuple(account, sp):
+    ## 16 args: the 15th app arg is the tuple of the 15th and 16th
+    private_key, address = account
+    signature = f"many({','.join(['uint64'] * 16)})void"
+    args = list(range(16))
+    composer = atc.AtomicTransactionComposer()
+    composer.add_method_call(APP_ID, sdk.abi.Method.from_signature(signature), address, sp, atc.AccountTransactionSigner(private_key), method_args=args, note=b'm')
+    txn = composer.txn_list[0].txn
+    template = rawcall.CallTemplate(rawcall.method_entry(signature), APP_ID, address, sp)
+    assert template.pack(args, sp.first, sp.last, b'm') == _bytes(txn)
+
+
+def test_presign_chunk_is_algosdk_bytes(account, sp):
+    ## The app calls signed by the worker processes
+    private_key, address = account
+    spec = {'kind': 'call', 'sender': address, 'method': 'set_b(uint64)uint64', 'app_id': APP_ID,
+            'boxes': [b'st_box'], 'args': [7], 'nonce': b'\x00' * 8}
+    signed = presign.sign_chunk(private_key, sp, spec, 3, 2)
+    notes = [spec['nonce'] + n.to_bytes(8, 'big') for n in (3, 4)]
+    assert signed == [_bytes(_sdk_txn('set_b(uint64)uint64', [7], address, sp, n, boxes=[b'st_box']).sign(private_key)) for n in notes]
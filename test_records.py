@@ -0,0 +1,88 @@
+'''
+----------------------------------------------------------------------------------------------------
+    Tests of the compact records of records.py
+
+    The send results are built by hand like in bench_records.py, no node is
+    needed. Run with:
+
+        pytest -v test_records.py
+----------------------------------------------------------------------------------------------------
+'''
+
+import dataclasses
+from   collections import namedtuple
+
+import pytest
+
+import sdk
+import records
+import bench_records
+
+from   algosdk.atomic_transaction_composer import ABIResult
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Fixtures
+----------------------------------------------------------------------------------------------------
+'''
+
+@pytest.fixture
+def result():
+    private_key, address = sdk.account.generate_account()
+    sp = sdk.transaction.SuggestedParams(
+        fee=1_000, first=1, last=1_001,
+        gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", gen="testnet-v1.0",
+        flat_fee=True, min_fee=1_000
+    )
+    return bench_records._result(3, sp, private_key, address, sdk.abi.Method.from_signature(bench_records.METHOD))
+
+
+"""
+    The ABIReturn of `res` as built by SendAppTransactionResult.from_composer_result
+    (ie budget.send_padded): the method and the whole confirmation with the value
+"""
+def _abi_return(res, value):
+    result = ABIResult(tx_id=res.tx_id, raw_value=b'', return_value=value, decode_error=None,
+                       tx_info=res.confirmation, method=sdk.abi.Method.from_signature(bench_records.METHOD))
+    return sdk.ABIReturn(result)
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Tests
+----------------------------------------------------------------------------------------------------
+'''
+
+def test_plain_values():
+    Point = namedtuple('Point', 'x y')
+    @dataclasses.dataclass
+    class Pair:
+        a: int
+        b: list
+
+    assert records.plain((1, [b'x', 'y'])) == [1, [b'x', 'y']]
+    assert records.plain(Point(1, 2)) == {'x': 1, 'y': 2}
+    assert records.plain(Pair(1, [Point(3, 4)])) == {'a': 1, 'b': [{'x': 3, 'y': 4}]}
+
+
+def test_plain_abi_return_is_its_value(result):
+    assert records.plain(_abi_return(result, 300_000)) == 300_000
+    assert records.plain(_abi_return(result, (1, 'a'))) == [1, 'a']
+    assert records.plain(_abi_return(result, None)) == None
+
+
+def test_record_of_padded_call(result):
+    ## The abi_return of budget.send_padded is an ABIReturn: only its value is kept
+    padded = dataclasses.replace(result, abi_return=_abi_return(result, 300_000))
+    rec = records.record(padded)
+    assert rec == records.record(result)
+    assert rec.abi_return == 300_000
+    assert [r.abi_return for r in records.records(padded)] == [None, 300_000]
+
+
+def test_records_of_the_group(result):
+    pay, call = records.records(result)
+    assert pay.type == 'pay' and pay.receiver == sdk.get_application_address(bench_records.APP_ID)
+    assert call.type == 'appl' and call.app_id == bench_records.APP_ID and call.receiver == None
+    assert (pay.txid, call.txid) == tuple(result.tx_ids)
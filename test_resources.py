@@ -0,0 +1,141 @@
+'''
+----------------------------------------------------------------------------------------------------
+    Tests of the reference patterns of resources.py
+
+    Pure logic: the resources accessed by a call (as reported by simulate)
+    are given by hand, no node is needed. Run with:
+
+        pytest -v test_resources.py
+----------------------------------------------------------------------------------------------------
+'''
+
+import base64
+import threading
+
+import pytest
+
+import sdk
+import resources
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Fixtures
+----------------------------------------------------------------------------------------------------
+'''
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+## ARC-56 state of a contract with a Box 'st_box' and a BoxMap prefixed 'bal'
+SPEC = {
+    'state': {
+        'keys': {'box': {'st_box': {'key': _b64(b'st_box'), 'keyType': 'AVMString', 'valueType': 'uint64'}}},
+        'maps': {'box': {'balances': {'keyType': 'uint64', 'valueType': 'uint64', 'prefix': _b64(b'bal')}}},
+    },
+}
+
+
+@pytest.fixture
+def accounts():
+    return [sdk.account.generate_account()[1] for _ in range(3)]
+
+
+def _encodings(arg_types, args):
+    return resources._encodings(arg_types, args)
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Tests
+----------------------------------------------------------------------------------------------------
+'''
+
+def test_box_pattern_static_key(accounts):
+    pattern = resources._box_pattern(b'st_box', SPEC, _encodings(['uint64'], [7]), accounts[0])
+    assert pattern == ('key', b'st_box')
+
+
+def test_box_pattern_map_key_from_arg(accounts):
+    name = b'bal' + (7).to_bytes(8, 'big')
+    pattern = resources._box_pattern(name, SPEC, _encodings(['string', 'uint64'], ['x', 7]), accounts[0])
+    assert pattern == ('arg', b'bal', 1, 'abi')
+
+
+def test_box_pattern_prefers_declared_prefix(accounts):
+    ## 'bob' matches both encodings of the string: the one leaving the declared prefix wins
+    abi_name = b'bal' + b'\x00\x03bob'
+    assert resources._box_pattern(abi_name, SPEC, _encodings(['string'], ['bob']), accounts[0]) == ('arg', b'bal', 0, 'abi')
+    ## Without the length prefix only the raw encoding matches
+    raw_name = b'usr' + b'bob'
+    assert resources._box_pattern(raw_name, SPEC, _encodings(['string'], ['bob']), accounts[0]) == ('arg', b'usr', 0, 'raw')
+
+
+def test_box_pattern_sender_and_unknown(accounts):
+    sender = accounts[0]
+    name = b'acct' + sdk.encoding.decode_address(sender)
+    assert resources._box_pattern(name, SPEC, _encodings(['uint64'], [7]), sender) == ('sender', b'acct')
+    assert resources._box_pattern(b'other', SPEC, _encodings(['uint64'], [7]), sender) == ('key', b'other')
+
+
+def test_learn_and_resolve(accounts):
+    sender, receiver, other = accounts
+    arg_types = ['uint64', 'address', 'uint64']
+    args = [7, receiver, 1234]
+    accessed = {
+        'boxes'         : [{'app': 1000, 'name': _b64(b'bal' + (7).to_bytes(8, 'big'))}, {'app': 1000, 'name': _b64(b'st_box')}],
+        'accounts'      : [sender, receiver],
+        'apps'          : [1234],
+        'app-locals'    : [{'account': other, 'app': 55}],
+        'extra-box-refs': 1,
+    }
+    patterns = resources.learn(accessed, SPEC, arg_types, args, sender)
+    assert patterns == {
+        'boxes'         : [('arg', b'bal', 0, 'abi'), ('key', b'st_box')],
+        'empty_boxes'   : 1,
+        ## Sorted by address / id
+        'accounts'      : [('arg', 1) if a == receiver else ('literal', other) for a in sorted([receiver, other])],
+        'apps'          : [('literal', 55), ('arg', 2)],
+        'assets'        : [],
+    }
+
+    ## Other call of the same method: the references follow its arguments
+    new_receiver = sdk.account.generate_account()[1]
+    refs = resources.resolve(patterns, arg_types, [9, new_receiver, 4321], sender)
+    assert [b.name for b in refs['box_references']] == [b'bal' + (9).to_bytes(8, 'big'), b'st_box', b'']
+    assert all(b.app_index == 0 for b in refs['box_references'])
+    assert sorted(refs['account_references']) == sorted([new_receiver, other])
+    assert refs['app_references'] == [55, 4321]
+    assert refs['asset_references'] == []
+
+
+def test_learn_too_many_references(accounts):
+    sender = accounts[0]
+    accessed = {'boxes': [{'app': 1000, 'name': _b64(f"box{n}".encode())} for n in range(resources.max_references + 1)]}
+    assert resources.learn(accessed, SPEC, [], [], sender) == None
+
+
+def test_cache_stays_in_memory(monkeypatch):
+    ## Loaded once: get/forget don't open shelve.db again, from any thread
+    monkeypatch.setattr(resources, '_patterns', {'k': None, 'j': {'boxes': []}})
+    monkeypatch.setattr(resources, '_dirty', False)
+    def no_shelve(*args, **kwargs):
+        raise AssertionError("shelve.db opened on the send path")
+    monkeypatch.setattr(resources.shelve, 'open', no_shelve)
+
+    errors = []
+    def run():
+        try:
+            for _ in range(200):
+                resources.get('j')
+                resources.forget('k')
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert 'k' not in resources._patterns and resources._dirty
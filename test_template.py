@@ -20,6 +20,9 @@
     - `application_call`: helps you submitting a transaction
         You need to pass it the SharedState object, name of the method, optional 
         method parameters, optional transaction parameters (on_complete etc)
+    - `batch_application_call`: sends many `application_call` at the same time
+        each one in its own group (useful for methods with a pay argument)
+        and returns compact records of the calls (see records.py)
     - `dump_state`      : dumps the SharedState
         You can provide an extra key parameter if you want to dump just that key
     - `new_signer`      : adds a new signer to the SharedState and optionally
@@ -43,16 +46,22 @@ import  json
 from    pprint import pprint
 import  importlib
 import  base64
+import  timeit
 from    pathlib import Path
 
-from    algokit_utils.algorand import AlgorandClient, \
-                            AlgoClientConfigs, \
-                            AlgoClientNetworkConfig
-from    algokit_utils import CommonAppCallParams, \
-                            PaymentParams, \
-                            SendParams, \
-                            AlgoAmount, \
-                            SigningAccount
+import  sdk
+
+from    txn_args import convert_method_args, \
+                        send_groups
+from    keymanager import KeyManager
+from    tx_archive import record_result_safe
+from    tracing import span
+import  network
+import  abi_index
+import  budget
+import  fleet
+import  resources
+import  records
 
 
 '''
@@ -134,17 +143,7 @@ def init(shared_state):
         shared_state.set('client_object', module)
 
     ## Connect to Algorand net via client
-    # Define a network endpoint
-    algo_net =AlgoClientNetworkConfig(
-            server=shared_state.get('algod_address'),
-            token=shared_state.get('algod_token')
-    )
-    # Use network entpoint to define the client
-    algorand_client = AlgorandClient(AlgoClientConfigs(
-            algod_config = algo_net,
-            indexer_config = algo_net,
-            kmd_config = algo_net
-    ))
+    algorand_client = network.algorand_client(shared_state.get('algod_address'), shared_state.get('algod_token'))
     shared_state.set('algorand_client',algorand_client)
     
 
@@ -154,19 +153,26 @@ def init(shared_state):
         abi_file = list(map(lambda x: str(x), abi_file))[0]
         with open(abi_file) as f:
             shared_state.set('abi', json.loads(f.read()))
+        ## Selectors, encoders... of the methods, cached by file hash (see abi_index.py)
+        shared_state.set('method_index', abi_index.load(abi_file))
 
     ## Get a handler of the deployed HelloWord contract
     client_class = getattr(shared_state.get('client_object'), shared_state.get('contract_name')+'Client')
     app_client = algorand_client.client.get_typed_app_client_by_id(client_class , app_id = shared_state.get('app_id'))
     shared_state.set('client_class', client_class)
     shared_state.set('app_client', app_client)
+    ## Many apps of the same contract: `application_call` routes the calls by key (see fleet.py)
+    shared_state.set('fleet', fleet.for_contract(algorand_client, shared_state.get('contract_name'), client_class))
 
     ## Create the signer that will sign the transaction to the SC
-    signer = SigningAccount(private_key=shared_state.get('private_key'))
+    signer = sdk.SigningAccount(private_key=shared_state.get('private_key'))
     algorand_client.account.set_signer_from_account(signer)
     shared_state.set('algorand_client', algorand_client)
     shared_state.set('signer', signer)
 
+    ## Secondary signers (see `new_signer`) are kept and registered by the KeyManager
+    shared_state.set('keys', KeyManager(algorand_client))
+
     print(shared_state)
 
 
@@ -263,14 +269,14 @@ def signer_balance(shared_state, name=None):
     if name == None:
         pass
     else:
-        signers = shared_state.get('signers')
-        if signers == None:
+        keys = shared_state.get('keys')
+        if len(keys) == 0:
             print("No signers defined")
             return False
-        if not name in signers:
+        if not name in keys:
             print(f"No such signer: {name}")
             return False
-        signer_address = signers[name]['address']
+        signer_address = keys.address(name)
 
     algorand_client = shared_state.get('algorand_client')
     account_info = algorand_client.account.get_information(signer_address)
@@ -282,14 +288,24 @@ def signer_balance(shared_state, name=None):
    Makes a transaction
    Create and send the transaction to the application method
 """
-def application_call(shared_state, sc_method, method_args = [], *, txn_args = [], signer = None) :
+def application_call(shared_state, sc_method, method_args = [], *, txn_args = [], signer = None, compact = False) :
     address = shared_state.get('address')
     app_client = shared_state.get('app_client')
     algorand_client = shared_state.get('algorand_client')
 
     ## Use a non-default signer if specified
     if signer:
-        address = shared_state.get('signers')[signer]['address']
+        address = shared_state.get('keys').address(signer)
+
+    ## The app of the call: the one of shelve.db, or the one of its key in the fleet
+    app_id = shared_state.get('app_id')
+    app_address = shared_state.get('app_address')
+    shards = shared_state.get('fleet')
+    if shards != None:
+        entry = shared_state.get('method_index')['methods'][sc_method]
+        app_id = shards.route(sc_method, method_args, entry['arg_names'], address, entry['arg_types'])
+        app_client = shards.client(app_id)
+        app_address = sdk.get_application_address(app_id)
 
     app_method = getattr(app_client.send, sc_method)
 
@@ -299,11 +315,13 @@ def application_call(shared_state, sc_method, method_args = [], *, txn_args = []
     ## Turn txn_args into a dictionary to ease the creation of CommonAppCallParams class object
     cacp = {}
     cacp['sender'] = address 
-    cacp['extra_fee'] =AlgoAmount(micro_algo=0)
+    cacp['extra_fee'] =sdk.AlgoAmount(micro_algo=0)
     ## To avoid the "transaction is already in ledger" error we tweak the validity rounds
     ## parameter so to have always new transactions
     cacp['first_valid_round'] = last_round
     cacp['last_valid_round'] = last_round +1000
+    if signer:
+        cacp['signer'] = shared_state.get('keys').signer(signer)
 
 
     ## Parse the transactions parameters like
@@ -318,21 +336,73 @@ def application_call(shared_state, sc_method, method_args = [], *, txn_args = []
 
     # These are the parameter sent to the app call
     app_call_params={
-        'params' : CommonAppCallParams(**cacp),
+        'params' : sdk.CommonAppCallParams(**cacp),
         # From algokit-utils >= 4.0.0 the followin line will not be necessary
-        'send_params' : SendParams(populate_app_call_resources=True),
+        'send_params' : sdk.SendParams(populate_app_call_resources=True),
     }
 
-    ## The client allows to pass the args as a tuple of strings
+    ## Convert the args following the ABI types: transaction arguments 
+    ## (pay, axfer...) are built and sent in the same group of the app call
+    ## ex: application_call(shared_state, 'deposit', ['100000'])
     if len(method_args) > 0:
+        abi_args = shared_state.get('method_index')['methods'][sc_method]['args']
+        method_args = convert_method_args(
+            algorand_client,
+            abi_args,
+            method_args,
+            sender=address,
+            app_address=app_address
+        )
         app_call_params['args'] = tuple(method_args)
 
+    ## Box/account/app references from the patterns of the method (see resources.py)
+    refs_key, refs = resources.references(algorand_client, app_client, app_id, shared_state.get('abi'), sc_method, cacp, method_args)
+    if refs != None:
+        cacp.update(refs)
+        app_call_params['params'] = sdk.CommonAppCallParams(**cacp)
+        app_call_params['send_params'] = sdk.SendParams(populate_app_call_resources=False)
+
+    ## Add budget padding calls if the method needs more than 700 opcodes (see budget.py)
+    key = budget.plan_key(app_id, sc_method, method_args)
+    params = budget.call_params(app_client, sc_method, cacp, method_args)
+    pads = budget.plan(algorand_client, key, params)
+
     ## Send the transaction
     ## Use the spread operator to expand the object as function parameters
-    res = app_method(**app_call_params)
+    start_time = timeit.default_timer()
+    try:
+        with span('send.app_call'):
+            if pads == 0:
+                res = app_method(**app_call_params)
+            else:
+                res = budget.send_padded(algorand_client, params, pads, populate=refs == None)
+    except Exception:
+        budget.forget(key)
+        resources.forget(refs_key)
+        raise
+    record_result_safe(res, method=sc_method, latency=timeit.default_timer() - start_time)
+    ## Compact: only the values read by the tests, not the whole result (see records.py)
+    if compact:
+        return records.record(res)
     return res
 
 
+"""
+   Makes many transactions at the same time
+   `calls` is a list of dictionaries with the parameters of `application_call`
+   ex: [{'sc_method':'deposit', 'method_args':['100000'], 'signer':'alice'}, ...]
+   Each call is sent as its own group, results are returned in the same order
+   (a failed call returns its exception)
+   Results are TxRecord (txid, round, fee, sender, type, app_id, abi_return)
+   of the app calls, not the whole send results (see records.py)
+"""
+def batch_application_call(shared_state, calls, *, workers=None) :
+    return send_groups(
+        [lambda c=c: application_call(shared_state, compact=True, **c) for c in calls],
+        workers=workers
+    )
+
+
 """
     Adds a signer to the SharedState
     The signer has a name, can then later be used to sign transactions
@@ -340,23 +410,16 @@ def application_call(shared_state, sc_method, method_args = [], *, txn_args = []
     `balance` is expressed in microalgos
 """
 def new_signer(shared_state, name, *, balance=0):
-    # ensure signer is not already present in SharedState
+    # create a random signer unless already present in the KeyManager
+    # the KeyManager also registers it in the algorand_client
     algorand_client = shared_state.get('algorand_client')
-    signers = shared_state.get('signers')
-    if signers == None:
-        signers = {}
-    if not name in signers:
-        # create a random signer
-        signer = algorand_client.account.random()
-        # store into SharedState
-        signers[name] = {
-            'private_key' : signer.private_key,
-            'address' : signer.address
-        }
-        shared_state.set('signers', signers)
+    keys = shared_state.get('keys')
+    keys.random(name)
+    # store a copy into SharedState (see `dump_state`)
+    shared_state.set('signers', keys.as_dict())
 
     # fund account from primary account
-    new_address = signers[name]['address']
+    new_address = keys.address(name)
     account_info = algorand_client.account.get_information(new_address)
     has_balance = account_info.amount.micro_algo
     if has_balance < balance:
@@ -376,16 +439,18 @@ def fund_signer(shared_state, signer, amount):
         print(f"Main signer is too poor for that {pot} < {amount}" )
         return False
     
-    to_address = signers = shared_state.get('signers')[signer]['address']
+    to_address = shared_state.get('keys').address(signer)
     algorand_client = shared_state.get('algorand_client')
+    start_time = timeit.default_timer()
     fund = algorand_client.send.payment(
-        params=PaymentParams(
+        params=sdk.PaymentParams(
             sender=shared_state.get('address'),
             signer=shared_state.get('signer'),
-            amount=AlgoAmount(micro_algo=amount),
+            amount=sdk.AlgoAmount(micro_algo=amount),
             receiver=to_address,
         )
     )
+    record_result_safe(fund, method='payment', latency=timeit.default_timer() - start_time)
 
 
 
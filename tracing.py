@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Lightweight tracing of the network calls
+
+    Enable it with the ALGO_TRACE environment variable:
+
+        ALGO_TRACE=1            python interactive.py     -> trace.json
+        ALGO_TRACE=run.json     python deploy.py          -> run.json
+        ALGO_TRACE=run.prom     pytest -s test_XXX.py     -> run.prom (Prometheus text format)
+
+    Count and latency histogram of each endpoint are written at exit.
+
+    When ALGO_TRACE is not set nothing is wrapped: `instrument()` returns
+    immediately and `span()` returns a shared do-nothing context manager, so
+    the cost is a function call and an `if`.
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import json
+import time
+import atexit
+import threading
+from   contextlib import nullcontext
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+_setting            = os.environ.get('ALGO_TRACE', '')
+enabled             = _setting not in ('', '0')
+output_file         = _setting if enabled and _setting != '1' else 'trace.json'
+
+## Latency histogram buckets upper bounds (seconds)
+BUCKETS             = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+## Methods wrapped by `instrument()`
+## endpoint name -> method of the algod client
+ALGOD_METHODS       = {
+    'algod.status'                  : 'status',
+    'algod.status_after_block'      : 'status_after_block',
+    'algod.suggested_params'        : 'suggested_params',
+    'algod.account_info'            : 'account_info',
+    'algod.account_application_info': 'account_application_info',
+    'algod.application_info'        : 'application_info',
+    'algod.application_boxes'       : 'application_boxes',
+    'algod.application_box_by_name' : 'application_box_by_name',
+    'algod.send_raw_transaction'    : 'send_raw_transaction',
+    'algod.pending_transaction_info': 'pending_transaction_info',
+    'algod.simulate_transactions'   : 'simulate_transactions',
+    'algod.block_info'              : 'block_info',
+}
+## endpoint name -> (attribute of the AlgorandClient, method)
+CLIENT_METHODS      = {
+    'account.get_information'       : ('account', 'get_information'),
+    'app.get_box_names'             : ('app', 'get_box_names'),
+    'app.get_box_value'             : ('app', 'get_box_value'),
+    'app.get_global_state'          : ('app', 'get_global_state'),
+    'app.get_local_state'           : ('app', 'get_local_state'),
+}
+
+_NULL               = nullcontext()
+_lock               = threading.Lock()
+_stats              = {}
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Recording
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Add one observation of `elapsed` seconds to `endpoint`
+"""
+def observe(endpoint, elapsed, error=False):
+    with _lock:
+        st = _stats.get(endpoint)
+        if st == None:
+            st = _stats[endpoint] = {'count': 0, 'errors': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS)}
+        st['count'] += 1
+        st['errors'] += 1 if error else 0
+        st['sum'] += elapsed
+        st['max'] = max(st['max'], elapsed)
+        for n in range(len(BUCKETS)):
+            if elapsed <= BUCKETS[n]:
+                st['buckets'][n] += 1
+                break
+
+
+class _Span:
+    __slots__ = ('endpoint', 'start')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.endpoint, time.perf_counter() - self.start, exc_type != None)
+        return False
+
+
+"""
+    Time a block of code:
+        with span('deploy.create'):
+            ...
+"""
+def span(endpoint):
+    return _Span(endpoint) if enabled else _NULL
+
+
+"""
+    Return `fn` wrapped so that every call is timed under `endpoint`
+    (or `fn` itself when tracing is disabled)
+"""
+def wrap(endpoint, fn):
+    if not enabled:
+        return fn
+    def traced(*args, **kwargs):
+        start = time.perf_counter()
+        error = True
+        try:
+            res = fn(*args, **kwargs)
+            error = False
+            return res
+        finally:
+            observe(endpoint, time.perf_counter() - start, error)
+    traced.__wrapped__ = fn
+    return traced
+
+
+"""
+    Wrap the network calls of an AlgorandClient (and of its algod client)
+    Only the given instances are changed, not the classes
+"""
+def instrument(algorand_client):
+    if not enabled:
+        return algorand_client
+    algod = algorand_client.client.algod
+    for endpoint, method in ALGOD_METHODS.items():
+        fn = getattr(algod, method)
+        if not hasattr(fn, '__wrapped__'):
+            setattr(algod, method, wrap(endpoint, fn))
+    for endpoint, (attr, method) in CLIENT_METHODS.items():
+        obj = getattr(algorand_client, attr)
+        fn = getattr(obj, method)
+        if not hasattr(fn, '__wrapped__'):
+            setattr(obj, method, wrap(endpoint, fn))
+    return algorand_client
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Export
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Copy of the collected statistics
+    {endpoint: {'count', 'errors', 'sum', 'max', 'avg', 'buckets': {upper bound: cumulative count}}}
+"""
+def report():
+    out = {}
+    with _lock:
+        for endpoint, st in sorted(_stats.items()):
+            cumulative = 0
+            buckets = {}
+            for n in range(len(BUCKETS)):
+                cumulative += st['buckets'][n]
+                buckets['+Inf' if BUCKETS[n] == float('inf') else str(BUCKETS[n])] = cumulative
+            out[endpoint] = {
+                'count' : st['count'],
+                'errors' : st['errors'],
+                'sum' : st['sum'],
+                'max' : st['max'],
+                'avg' : st['sum'] / st['count'],
+                'buckets' : buckets,
+            }
+    return out
+
+
+"""
+    Statistics in Prometheus text exposition format
+"""
+def prometheus():
+    lines = [
+        '# HELP algo_call_seconds Latency of the network calls',
+        '# TYPE algo_call_seconds histogram',
+    ]
+    for endpoint, st in report().items():
+        for le, count in st['buckets'].items():
+            lines.append(f'algo_call_seconds_bucket{{endpoint="{endpoint}",le="{le}"}} {count}')
+        lines.append(f'algo_call_seconds_sum{{endpoint="{endpoint}"}} {st["sum"]}')
+        lines.append(f'algo_call_seconds_count{{endpoint="{endpoint}"}} {st["count"]}')
+    lines.append('# HELP algo_call_errors_total Network calls that raised an exception')
+    lines.append('# TYPE algo_call_errors_total counter')
+    for endpoint, st in report().items():
+        lines.append(f'algo_call_errors_total{{endpoint="{endpoint}"}} {st["errors"]}')
+    return '\n'.join(lines) + '\n'
+
+
+"""
+    Write the statistics to `path` (.prom -> Prometheus text, otherwise JSON)
+"""
+def export(path=None):
+    path = path or output_file
+    with open(path, 'w') as f:
+        if path.endswith('.prom'):
+            f.write(prometheus())
+        else:
+            json.dump(report(), f, indent=2)
+
+
+if enabled:
+    atexit.register(export)
@@ -0,0 +1,289 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Non-blocking terminal UI for interactive.py
+
+    Same panels and commands of interactive.py, but:
+    - account and app panels are refreshed by a background thread, the
+      prompt never waits for the network
+    - the screen is redrawn only when what is shown changes
+    - transactions are sent in background: many can be in flight at the same
+      time and each one shows its live status
+    - no "Press any key" waits
+
+    The panels use the top of the terminal, the prompt scrolls in the bottom
+    lines (ANSI scroll region). Usage:
+
+        tui.py [refresh seconds]
+----------------------------------------------------------------------------------------------------
+'''
+
+import io
+import re
+import sys
+import queue
+import shutil
+import threading
+import timeit
+from   concurrent.futures import ThreadPoolExecutor
+
+import interactive
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Seconds between two refreshes of the account/app panels
+refresh_interval    = 5
+
+## Lines at the bottom of the screen used by the prompt
+prompt_lines        = 4
+
+## Transactions shown in the transactions panel
+shown_txs           = 6
+
+## Transactions sent at the same time
+max_in_flight       = 8
+
+ESC                 = '\x1b'
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Output capture
+    The functions of interactive.py print their output: each thread can ask
+    to capture what it prints into its own buffer, the main thread keeps
+    writing to the terminal
+----------------------------------------------------------------------------------------------------
+'''
+
+class _ThreadOut(io.TextIOBase):
+    def __init__(self, real):
+        self.real = real
+        self.local = threading.local()
+
+    def write(self, text):
+        buf = getattr(self.local, 'buf', None)
+        return (buf or self.real).write(text)
+
+    def flush(self):
+        self.real.flush()
+
+    """
+        Run fn(*args) capturing its output, returns (result, output)
+    """
+    def capture(self, fn, *args):
+        self.local.buf = io.StringIO()
+        try:
+            res = fn(*args)
+        finally:
+            out = self.local.buf.getvalue()
+            self.local.buf = None
+        return res, out
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Terminal UI
+----------------------------------------------------------------------------------------------------
+'''
+
+class Tui:
+    def __init__(self, out):
+        self.out = out
+        self.events = queue.Queue()
+        self.refresh_now = threading.Event()
+        self.stopping = threading.Event()
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.lock = threading.Lock()
+        ## Panels text (set by the background threads)
+        self.account_panel = '🕓 Loading account...\n'
+        self.app_panel = ''
+        self.methods_panel = out.capture(interactive._show_methods)[1]
+        self.status = ''
+        self.txs = []           ## [{'n', 'cmd', 'state', 'start', 'info'}]
+        self.tx_count = 0
+        self.last_detail = ''
+        self.drawn = None
+
+    ## ---------------------------------------------------------------- background threads
+
+    """
+        Fetch account and app details every `refresh_interval` seconds
+        (or as soon as a transaction is done), post an event if they changed
+    """
+    def _refresher(self):
+        while not self.stopping.is_set():
+            try:
+                _, account = self.out.capture(interactive._account_info)
+                _, app = self.out.capture(interactive._show_app_details)
+            except Exception as e:
+                account, app = f"🔴 Refresh failed: {e}\n", self.app_panel
+            if account != self.account_panel or app != self.app_panel:
+                self.account_panel, self.app_panel = account, app
+                self.events.put(('redraw',))
+            self.refresh_now.wait(refresh_interval)
+            self.refresh_now.clear()
+
+    """
+        Read the user input lines (blocking) and post them as events
+    """
+    def _reader(self):
+        for line in sys.stdin:
+            self.events.put(('line', line.strip()))
+        self.events.put(('line', 'Q'))
+
+    """
+        Send one transaction (runs in the pool)
+    """
+    def _send(self, tx, sc_method, method_args, txn_args):
+        try:
+            res, output = self.out.capture(interactive.dotx, sc_method, method_args, txn_args)
+        except Exception as e:
+            res, output = False, f"❌ {e}"
+        elapsed = timeit.default_timer() - tx['start']
+        with self.lock:
+            if res:
+                rnd = res.confirmation.get('confirmed-round') if hasattr(res, 'confirmation') else None
+                ret = getattr(res, 'abi_return', None)
+                tx['state'] = '✅'
+                tx['info'] = f"round {rnd}  return {ret}  ({elapsed:.1f}s)"
+                self.last_detail = self.out.capture(interactive._tx_output, res)[1]
+            else:
+                error = output.strip().splitlines()[0] if output.strip() else 'failed'
+                tx['state'] = '❌'
+                tx['info'] = f"{error}  ({elapsed:.1f}s)"
+        self.refresh_now.set()
+        self.events.put(('redraw',))
+
+    ## ---------------------------------------------------------------- commands
+
+    """
+        Handle one line typed by the user
+    """
+    def _command(self, sel):
+        if sel == '':
+            return True
+        if sel == 'Q' or sel == 'q':
+            return False
+
+        sel = re.sub(r'\s+', ' ', sel).split(' ')
+        sc_method = sel[0]
+        method_args = list(filter(lambda a : False if ':' in a else True, sel[1:]))
+        txn_args = list(filter (lambda a : True if ':' in a else False, sel[1:]))
+        ok, msg = self.out.capture(interactive._check_sel, sc_method, method_args, txn_args)
+        if not ok:
+            self.status = msg.strip().splitlines()[0] if msg.strip() else ''
+            return True
+
+        with self.lock:
+            self.tx_count += 1
+            tx = {'n': self.tx_count, 'cmd': ' '.join(sel), 'state': '⏳', 'start': timeit.default_timer(), 'info': 'sending'}
+            self.txs.append(tx)
+        self.status = f"Sent #{tx['n']}"
+        self.pool.submit(self._send, tx, sc_method, method_args, txn_args)
+        return True
+
+    ## ---------------------------------------------------------------- drawing
+
+    """
+        Text of the panels area
+    """
+    def _screen(self, width, height):
+        line = '_' * width + '\n'
+        with self.lock:
+            txs = ''.join(f"  {t['state']} #{t['n']} {t['cmd']}  {t['info']}\n" for t in self.txs[-shown_txs:])
+            detail = self.last_detail
+        text = (
+            self.account_panel + line + self.app_panel + self.methods_panel + line +
+            "🟧 Transactions\n" + (txs or "  none yet\n") + detail
+        )
+        lines = [l[:width] for l in text.replace('\t', '    ').splitlines()]
+        lines = lines[:height - 1] + [f"{self.status}"[:width]]
+        return lines
+
+    """
+        Draw the panels above the prompt area, only if something changed
+        The cursor is saved/restored so what the user is typing is not touched
+    """
+    def _draw(self, force=False):
+        width, height = shutil.get_terminal_size()
+        panel_height = height - prompt_lines
+        lines = self._screen(width, panel_height)
+        if lines == self.drawn and not force:
+            return
+        self.drawn = lines
+        buf = [f"{ESC}7"]
+        for n in range(panel_height):
+            text = lines[n] if n < len(lines) else ''
+            buf.append(f"{ESC}[{n+1};1H{text}{ESC}[K")
+        buf.append(f"{ESC}8")
+        self.out.real.write(''.join(buf))
+        self.out.real.flush()
+
+    """
+        Prepare the screen: clear it, keep the scroll region for the prompt
+    """
+    def _setup_screen(self):
+        width, height = shutil.get_terminal_size()
+        self.out.real.write(f"{ESC}[2J{ESC}[{height - prompt_lines + 1};{height}r{ESC}[{height};1H")
+        self.out.real.write(f"Insert name of method and parameters, [Q] to exit\n▶ ")
+        self.out.real.flush()
+
+    def _restore_screen(self):
+        self.out.real.write(f"{ESC}[r{ESC}[2J{ESC}[H")
+        self.out.real.flush()
+
+    ## ---------------------------------------------------------------- main loop
+
+    def run(self):
+        self._setup_screen()
+        threading.Thread(target=self._refresher, daemon=True).start()
+        threading.Thread(target=self._reader, daemon=True).start()
+        self._draw(force=True)
+        try:
+            while True:
+                event = self.events.get()
+                if event[0] == 'line':
+                    if not self._command(event[1]):
+                        break
+                    self.out.real.write("▶ ")
+                    self.out.real.flush()
+                self._draw()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopping.set()
+            self.refresh_now.set()
+            self._restore_screen()
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+"""________________________________________________________________________
+
+   MAIN
+"""
+
+def main():
+    global refresh_interval
+    if len(sys.argv) > 1:
+        refresh_interval = float(sys.argv[1])
+
+    interactive._init()
+    interactive._parse_methods()
+    ## Nothing must wait for a key press
+    interactive.interactive_mode = False
+
+    out = _ThreadOut(sys.stdout)
+    sys.stdout = out
+    try:
+        Tui(out).run()
+    finally:
+        sys.stdout = out.real
+
+
+if __name__ == "__main__":
+    main()
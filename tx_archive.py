@@ -0,0 +1,255 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Transaction result archive
+
+    Every transaction sent by the tools is recorded (txid, method, sender, fee,
+    confirmed round, submit->confirm latency, abi return...) into an append-only
+    columnar file, so that results of long/load runs can be analysed later
+    without querying the chain again.
+
+    File layout:
+        MAGIC
+        chunk*      : [header length: 4 bytes][header][column 1]...[column N]
+        header      : msgpack {'n': rows, 'cols': {name: [offset, length]}}
+        column      : msgpack list with the `n` values of the column
+
+    Chunks are written every `chunk_rows` records (and at exit). Reading a
+    column only decodes that column's blob of each chunk, the others are skipped.
+
+    Usage:
+        tx_archive.py [file] [--by method|sender|type|round]
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+import sys
+import time
+import atexit
+import struct
+import argparse
+import threading
+
+import msgpack
+
+import records
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+MAGIC               = b'TXARCH1\n'
+
+## Recorded columns, in order
+COLUMNS             = ('ts', 'txid', 'method', 'type', 'sender', 'app_id', 'fee', 'round', 'latency', 'abi_return')
+
+## Default archive file (in the same folder of shelve.db)
+archive_file        = 'tx_archive.bin'
+
+## Records buffered in memory before a chunk is written
+chunk_rows          = 4_096
+
+_default            = None
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Writer
+----------------------------------------------------------------------------------------------------
+'''
+
+class TxArchive:
+    def __init__(self, path=archive_file, *, rows=chunk_rows):
+        self.path = path
+        self.rows = rows
+        self._lock = threading.Lock()
+        self._buffer = {c: [] for c in COLUMNS}
+        self._count = 0
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as f:
+                f.write(MAGIC)
+
+    """
+        Add one record (a dict with some/all of the COLUMNS)
+    """
+    def append(self, record):
+        with self._lock:
+            for c in COLUMNS:
+                self._buffer[c].append(record.get(c))
+            self._count += 1
+            if self._count >= self.rows:
+                self._flush()
+
+    """
+        Write the buffered records as a new chunk
+    """
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._count == 0:
+            return
+        blobs = []
+        cols = {}
+        offset = 0
+        for c in COLUMNS:
+            blob = msgpack.packb(self._buffer[c])
+            cols[c] = [offset, len(blob)]
+            offset += len(blob)
+            blobs.append(blob)
+        header = msgpack.packb({'n': self._count, 'cols': cols})
+        with open(self.path, 'ab') as f:
+            f.write(struct.pack('>I', len(header)))
+            f.write(header)
+            for blob in blobs:
+                f.write(blob)
+        self._buffer = {c: [] for c in COLUMNS}
+        self._count = 0
+
+
+"""
+    The archive shared by the tools (created on first use, flushed at exit)
+"""
+def default_archive():
+    global _default
+    if _default == None:
+        _default = TxArchive(archive_file)
+        atexit.register(_default.flush)
+    return _default
+
+
+"""
+    Record all the transactions of a send result (SendAppTransactionResult,
+    SendSingleTransactionResult...) into the archive
+    `method` is the name of the called method (or generic transaction)
+    `latency` is the time (seconds) between the submission and the confirmation
+"""
+def record_result(res, *, method, latency, archive=None):
+    archive = archive or default_archive()
+    now = time.time()
+    recs = records.records(res)
+    for rec in recs:
+        ## Only the app call (last txn of the group) carries the method and return
+        last = rec is recs[-1]
+        archive.append({
+            'ts' : now,
+            'txid' : rec.txid,
+            'method' : method if last else None,
+            'type' : rec.type,
+            'sender' : rec.sender,
+            'app_id' : rec.app_id,
+            'fee' : rec.fee,
+            'round' : rec.round,
+            'latency' : latency,
+            'abi_return' : rec.abi_return,
+        })
+
+
+"""
+    `record_result` for the send paths: the transactions are already
+    confirmed, an archive that can't be written is only a warning
+"""
+def record_result_safe(res, *, method, latency, archive=None):
+    try:
+        record_result(res, method=method, latency=latency, archive=archive)
+    except Exception as e:
+        print(f"🟨 Transaction not archived: {e}")
+
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Reader
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Read the archive one chunk at a time decoding only `columns`
+    Yields {column: list of values} for each chunk
+"""
+def iter_chunks(path=archive_file, columns=COLUMNS):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a transaction archive")
+        while True:
+            size = f.read(4)
+            if len(size) < 4:
+                return
+            header = msgpack.unpackb(f.read(struct.unpack('>I', size)[0]))
+            start = f.tell()
+            chunk = {}
+            for c in columns:
+                offset, length = header['cols'][c]
+                f.seek(start + offset)
+                chunk[c] = msgpack.unpackb(f.read(length))
+            f.seek(start + sum(l for _, l in header['cols'].values()))
+            yield chunk
+
+
+"""
+    Select records from the archive
+    - columns: columns to return
+    - where: {column: value or function(value) -> bool}, all must match
+    Returns {column: list of values} (columnar)
+"""
+def query(path=archive_file, columns=COLUMNS, where=None):
+    where = where or {}
+    tests = {c: (w if callable(w) else (lambda v, w=w: v == w)) for c, w in where.items()}
+    needed = tuple(dict.fromkeys(list(columns) + list(tests.keys())))
+    result = {c: [] for c in columns}
+    for chunk in iter_chunks(path, needed):
+        for n in range(len(chunk[needed[0]])):
+            if all(test(chunk[c][n]) for c, test in tests.items()):
+                for c in columns:
+                    result[c].append(chunk[c][n])
+    return result
+
+
+"""
+    Count, fees and latency statistics grouped by a column
+    Returns {value of `by`: {'count', 'fees', 'latency_avg', 'latency_p50', 'latency_p95'}}
+"""
+def summary(path=archive_file, by='method'):
+    groups = {}
+    for chunk in iter_chunks(path, (by, 'fee', 'latency')):
+        for key, fee, latency in zip(chunk[by], chunk['fee'], chunk['latency']):
+            g = groups.setdefault(key, {'count': 0, 'fees': 0, 'latencies': []})
+            g['count'] += 1
+            g['fees'] += fee or 0
+            if latency != None:
+                g['latencies'].append(latency)
+    for g in groups.values():
+        lat = sorted(g.pop('latencies'))
+        g['latency_avg'] = sum(lat) / len(lat) if lat else None
+        g['latency_p50'] = lat[len(lat) // 2] if lat else None
+        g['latency_p95'] = lat[int(len(lat) * 0.95)] if lat else None
+    return groups
+
+
+"""________________________________________________________________________
+
+   MAIN
+"""
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summary of the transaction archive")
+    parser.add_argument('file', nargs='?', default=archive_file)
+    parser.add_argument('--by', default='method', choices=['method', 'sender', 'type', 'round', 'app_id'])
+    opts = parser.parse_args(argv)
+
+    if not os.path.exists(opts.file):
+        print(f"❌ {opts.file} not found")
+        exit(1)
+
+    print(f"{opts.by:<60}{'count':>10}{'fees':>12}{'avg s':>9}{'p50 s':>9}{'p95 s':>9}")
+    for key, g in summary(opts.file, opts.by).items():
+        lat = [f"{g[k]:>9.3f}" if g[k] != None else f"{'-':>9}" for k in ('latency_avg', 'latency_p50', 'latency_p95')]
+        print(f"{str(key):<60}{g['count']:>10}{g['fees']:>12}{''.join(lat)}")
+
+
+if __name__ == "__main__":
+    main()
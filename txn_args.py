@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Transaction arguments composer
+
+    Some ABI methods take a whole transaction as argument, ie:
+
+        def deposit(self, pay_txn: gtxn.PaymentTransaction) -> UInt64
+
+    In the ARC-56 file these arguments have one of the transaction types
+    (`txn`, `pay`, `axfer`, `appl` ...). The transaction must be sent in the same
+    group of the application call, right before it.
+    This module turns the user input for those arguments into transactions that
+    the typed client puts in the group together with the app call, so that the
+    whole group is signed and sent in one single submission.
+
+    Input format of a transaction argument (no spaces, fields separated by `,`):
+    - pay    : <amount>[,<receiver>]                receiver defaults to the app address
+    - axfer  : <asset_id>,<amount>[,<receiver>]     receiver defaults to the app address
+    - appl   : <app_id>                             a NoOp bare call to the app
+    - txn    : <type>,<fields of that type>         ie: pay,100000
+----------------------------------------------------------------------------------------------------
+'''
+
+import os
+from   concurrent.futures import ThreadPoolExecutor
+
+import sdk
+
+
+## ARC-56 argument types that are transactions
+TXN_ARG_TYPES       = ('txn', 'pay', 'axfer', 'appl')
+
+## Default number of groups sent at the same time by `send_groups`
+max_workers         = 8
+
+
+"""
+    True if the ARC-56 argument type is a transaction
+"""
+def is_txn_arg(arg_type):
+    return arg_type in TXN_ARG_TYPES
+
+
+"""
+    Build the transaction for a transaction argument of type `arg_type`
+    starting from the user input `value` (see format above)
+    The returned TransactionWithSigner can be passed as argument to the typed
+    client method: the client will add it to the group right before the app call
+"""
+def build_txn_arg(algorand_client, arg_type, value, *, sender, app_address):
+    fields = str(value).split(',')
+
+    ## Generic transaction: first field tells the actual type
+    if arg_type == 'txn':
+        arg_type = fields.pop(0)
+        if not is_txn_arg(arg_type) or arg_type == 'txn':
+            raise ValueError(f"{arg_type} is not a supported transaction type")
+
+    ## A random note makes every built transaction unique so that
+    ## many groups with the same content can be sent in the same rounds
+    note = os.urandom(8)
+
+    match arg_type:
+        case 'pay':
+            txn = algorand_client.create_transaction.payment(
+                sdk.PaymentParams(
+                    sender = sender,
+                    receiver = fields[1] if len(fields) > 1 else app_address,
+                    amount = sdk.AlgoAmount(micro_algo=int(fields[0])),
+                    note = note
+                )
+            )
+        case 'axfer':
+            txn = algorand_client.create_transaction.asset_transfer(
+                sdk.AssetTransferParams(
+                    sender = sender,
+                    asset_id = int(fields[0]),
+                    amount = int(fields[1]),
+                    receiver = fields[2] if len(fields) > 2 else app_address,
+                    note = note
+                )
+            )
+        case 'appl':
+            txn = algorand_client.create_transaction.app_call(
+                sdk.AppCallParams(
+                    sender = sender,
+                    app_id = int(fields[0]),
+                    note = note
+                )
+            )
+        case _:
+            raise ValueError(f"{arg_type} is not a supported transaction type")
+
+    return sdk.TransactionWithSigner(txn, algorand_client.account.get_signer(sender))
+
+
+"""
+    Convert the user input (list of strings) into the values expected by the
+    typed client, following the ARC-56 types of the method arguments `abi_args`
+    Transaction arguments are built with `build_txn_arg`
+"""
+def convert_method_args(algorand_client, abi_args, method_args, *, sender, app_address):
+    converted = []
+    for n in range(len(method_args)):
+        arg_type = abi_args[n]['type']
+        value = method_args[n]
+        if is_txn_arg(arg_type):
+            value = build_txn_arg(
+                algorand_client,
+                arg_type,
+                value,
+                sender=sender,
+                app_address=app_address
+            )
+        elif arg_type == 'uint64':
+            ## If parameter is uint64 turn string -> int
+            value = int(value)
+        converted.append(value)
+    return converted
+
+
+"""
+    Send many groups at the same time
+    `calls` is a list of functions with no arguments, each one builds and sends
+    one group (ie: a lambda wrapping `application_call`).
+    Returns the results in the same order of `calls`. A failed group does not
+    stop the others: its exception is returned in place of the result
+"""
+def send_groups(calls, *, workers=None):
+    def _run(call):
+        try:
+            return call()
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=workers or max_workers) as pool:
+        return list(pool.map(_run, calls))
@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+
+'''
+----------------------------------------------------------------------------------------------------
+    Watch mode: hot redeploy on contract change
+
+    Polls contract.py and sample_contracts/*.py for changes. When a contract
+    source changes:
+    1. only that contract is compiled again (compile.py)
+    2. the compiled programs are compared with the deployed ones (see
+       fingerprint.py): nothing is done if they are the same
+    3. if it's the contract deployed in shelve.db, its ABI is still compatible
+       and it allows UpdateApplication, the deployed app is updated in place
+    4. otherwise a new app is created and funded (deploy.py)
+    5. shelve.db is updated, so interactive.py & co. use the new app
+
+    The SDK is imported and the network client is built once at start.
+    A contract is "compatible" when all the methods of the deployed version
+    are still there and the state schema did not grow (the schema can't be
+    changed by an update).
+
+    Usage:
+        watch.py [poll seconds]
+----------------------------------------------------------------------------------------------------
+'''
+
+import sys
+import time
+import importlib
+from   pathlib import Path
+
+import deploy
+from   compile import compile_contract, CompileError
+
+'''
+----------------------------------------------------------------------------------------------------
+    Global variables
+----------------------------------------------------------------------------------------------------
+'''
+
+## Seconds between two checks of the sources
+poll_interval       = 0.5
+
+## Watched contract sources (test files are skipped)
+SOURCES             = ['contract.py', 'sample_contracts/*.py']
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Helper functions
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    {source file: modification time} of the watched sources
+"""
+def _scan():
+    found = {}
+    for pattern in SOURCES:
+        for p in Path('./').glob(pattern):
+            if p.name.startswith('test'):
+                continue
+            found[str(p)] = p.stat().st_mtime
+    return found
+
+
+"""
+    The client module of a contract was generated again: import the new one
+"""
+def _reload_client(contract_name):
+    sys.modules.pop(contract_name+'_client', None)
+    importlib.invalidate_caches()
+
+
+'''
+----------------------------------------------------------------------------------------------------
+    Redeploy
+----------------------------------------------------------------------------------------------------
+'''
+
+"""
+    Compile `source` and update or create its app
+"""
+def redeploy(source):
+    start_time = time.perf_counter()
+
+    print(f"🔧 Compiling {source}...")
+    try:
+        contract_name = compile_contract(source)
+    except CompileError as e:
+        ## The artifacts of the previous compile are stale: don't deploy them
+        print(f"❌ {e}, not redeployed")
+        return
+    _reload_client(contract_name)
+
+    ## Same choice of deploy.py: noop, update in place or create
+    deploy.contract_name = contract_name
+    action = deploy.deploy()
+
+    print(f"✅ {contract_name}: {action} in {time.perf_counter() - start_time:.1f}s")
+
+
+"""________________________________________________________________________
+
+   MAIN
+"""
+
+def main():
+    global poll_interval
+    if len(sys.argv) > 1:
+        poll_interval = float(sys.argv[1])
+
+    ## Done once for the whole session
+    deploy.load_config()
+    deploy.connect()
+
+    known = _scan()
+    print(f"👀 Watching {len(known)} contracts, Ctrl+C to exit")
+    try:
+        while True:
+            time.sleep(poll_interval)
+            current = _scan()
+            changed = [s for s, mtime in current.items() if known.get(s) != mtime]
+            known = current
+            for source in changed:
+                try:
+                    redeploy(source)
+                except SystemExit:
+                    ## deploy.py functions exit on errors: keep watching
+                    print(f"🔴 Redeploy of {source} failed, waiting for the next change")
+            if changed:
+                print(f"👀 Watching...")
+    except KeyboardInterrupt:
+        print("\n🏁 Done !!")
+
+
+if __name__ == "__main__":
+    main()